@@ -1,67 +1,145 @@
-import json
-import os
-
-INPUT_FILE = 'final_data_for_powerbi.json'
-OUTPUT_FILE = 'final_data_for_powerbi.json'
-
-def is_in_holiday_period(date_str):
-    if not date_str:
-        return "Onbekend"
-    
-    dt = date_str[:10] # Pak het YYYY-MM-DD deel
-    
-    # Gecombineerde vakantieperiodes NL, BE, DE (NRW) 2017-2025
-    holidays = [
-        # 2017
-        ('2017-02-18', '2017-03-05'), ('2017-04-03', '2017-04-30'), ('2017-07-01', '2017-09-03'),
-        ('2017-10-14', '2017-11-05'), ('2017-12-23', '2018-01-07'),
-        # 2018
-        ('2018-02-10', '2018-02-25'), ('2018-03-26', '2018-05-06'), ('2018-07-01', '2018-09-02'),
-        ('2018-10-13', '2018-11-04'), ('2018-12-21', '2019-01-06'),
-        # 2019
-        ('2019-02-16', '2019-03-10'), ('2019-04-08', '2019-05-05'), ('2019-07-01', '2019-09-01'),
-        ('2019-10-12', '2019-11-03'), ('2019-12-21', '2020-01-06'),
-        # 2020
-        ('2020-02-15', '2020-03-01'), ('2020-04-06', '2020-05-03'), ('2020-06-29', '2020-08-31'),
-        ('2020-10-10', '2020-11-15'), ('2020-12-19', '2021-01-06'),
-        # 2021
-        ('2021-02-13', '2021-02-28'), ('2021-03-29', '2021-05-14'), ('2021-07-01', '2021-09-05'),
-        ('2021-10-11', '2021-11-07'), ('2021-12-24', '2022-01-09'),
-        # 2022
-        ('2022-02-19', '2022-03-06'), ('2022-04-04', '2022-05-08'), ('2022-06-27', '2022-09-04'),
-        ('2022-10-04', '2022-11-06'), ('2022-12-23', '2023-01-08'),
-        # 2023
-        ('2023-02-18', '2023-03-05'), ('2023-04-03', '2023-05-07'), ('2023-06-22', '2023-09-03'),
-        ('2023-10-02', '2023-11-05'), ('2023-12-21', '2024-01-07'),
-        # 2024
-        ('2024-02-10', '2024-02-25'), ('2024-04-27', '2024-05-05'), ('2024-07-06', '2024-09-01'),
-        ('2024-10-14', '2024-11-03'), ('2024-12-21', '2025-01-05'),
-        # 2025
-        ('2025-02-15', '2025-03-09'), ('2025-04-07', '2025-05-04'), ('2025-07-01', '2025-08-31'),
-        ('2025-10-11', '2025-11-02'), ('2025-12-20', '2026-01-06')
-    ]
-    
-    for start, end in holidays:
-        if start <= dt <= end:
-            return "Vakantie"
-    return "Buiten vakantie"
-
-def add_holiday_data():
-    print("Vakantiegegevens toevoegen aan dataset...")
-    if not os.path.exists(INPUT_FILE):
-        print(f"ERROR: {INPUT_FILE} niet gevonden.")
-        return
-
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    for review in data['reviews']:
-        review['periode_type'] = is_in_holiday_period(review.get('createTime'))
-
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    print(f"Check voltooid. Vakantie-labels toegevoegd aan {len(data['reviews'])} zinnen.")
-
-if __name__ == "__main__":
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pipeline_config import MERGED_FILE, FINAL_STORE, FINAL_FILE, EXPORT_JSON, atomic_output
+from dataset_store import write_dataset, dataset_lock
+from stage_metrics import phase, set_rows
+
+# De zinnen met weer krijgen hier hun vakantie-labels en worden daarna als
+# eindopslag (per jaar/maand gepartitioneerd, zie dataset_store.py) geschreven,
+# met per segment de woordtellingen voor de woordwolk. Alleen partities met
+# andere zinnen krijgen een nieuw segment; veranderen alleen de vakantie-labels
+# (bijv. na een aanvulling van de kalender), dan worden per segment alleen die
+# kolommen toegevoegd of vervangen.
+INPUT_FILE = MERGED_FILE
+OUTPUT_STORE = FINAL_STORE
+EXPORT_FILE = FINAL_FILE
+
+# Vakantiekalender per land/regio (NL, BE, DE-NRW) vanaf 2017. De periodes per
+# land zijn opgesplitst uit de eerdere gecombineerde periodes; samen beslaan ze
+# precies dezelfde dagen, dus 'periode_type' verandert daardoor niet.
+HOLIDAY_CALENDAR_FILE = 'holiday_calendar.csv'
+
+# Kolommen die deze stap aan de zinnen toevoegt
+HOLIDAY_COLUMNS = ['periode_type', 'vakantie_land']
+
+def load_holiday_calendar(path=HOLIDAY_CALENDAR_FILE):
+    """
+    Laadt de vakantiekalender (kolommen: land, naam, start, eind; 'eind' is inclusief).
+    Nieuwe jaren of landen toevoegen kan door regels aan het CSV-bestand toe te voegen.
+    """
+    calendar = pd.read_csv(path, dtype=str)
+    calendar['start'] = pd.to_datetime(calendar['start'], format='%Y-%m-%d')
+    calendar['eind'] = pd.to_datetime(calendar['eind'], format='%Y-%m-%d')
+    return calendar
+
+def build_holiday_index(calendar):
+    """
+    Bouwt een gesorteerde interval-index over de kalender.
+    Alle begin- en einddatums worden grenzen; tussen twee opeenvolgende grenzen
+    is de set van landen met vakantie constant. Per segment wordt die set (als
+    tekst, bijv. 'NL,BE', in de volgorde van de kalender) vooraf bepaald, zodat
+    een datum met één binaire zoekactie ('searchsorted') aan een segment
+    gekoppeld kan worden.
+    """
+    starts = calendar['start'].values.astype('datetime64[D]')
+    # 'eind' is inclusief, de grens ligt dus een dag later
+    ends = calendar['eind'].values.astype('datetime64[D]') + np.timedelta64(1, 'D')
+    bounds = np.unique(np.concatenate([starts, ends]))
+
+    landen = list(dict.fromkeys(calendar['land']))
+    segment_landen = np.zeros((len(bounds), len(landen)), dtype=bool)
+    for start, end, land in zip(starts, ends, calendar['land']):
+        first, last = np.searchsorted(bounds, [start, end])
+        segment_landen[first:last, landen.index(land)] = True
+    labels = np.array([','.join(l for l, aan in zip(landen, rij) if aan) or None for rij in segment_landen],
+                      dtype=object)
+
+    # De kalender beschrijft de jaren waarin periodes beginnen; de rest van een
+    # vakantie die over de jaargrens loopt (kerst) valt binnen zijn eigen periode
+    years = np.unique(calendar['start'].dt.year.values)
+    return {'bounds': bounds, 'labels': labels, 'years': years}
+
+def lookup_holidays(dates, index):
+    """
+    Zoekt voor een hele kolom datums tegelijk op of ze in een vakantie vallen.
+    Geeft drie arrays terug: 'periode_type' (Vakantie / Buiten vakantie /
+    Onbekend zonder datum), het land of de landen waarvan de vakantie
+    overeenkwam (bijv. 'NL,BE'; None buiten de vakanties) en of de kalender het
+    jaar van de datum beschrijft.
+    """
+    days = dates.values.astype('datetime64[D]')
+    known = ~np.isnat(days)
+
+    # Segment van elke datum; -1 betekent vóór de eerste grens
+    seg = np.searchsorted(index['bounds'], days, side='right') - 1
+    landen = np.full(len(days), None, dtype=object)
+    in_range = known & (seg >= 0)
+    landen[in_range] = index['labels'][seg[in_range]]
+
+    periode = np.where(pd.notna(landen), 'Vakantie', 'Buiten vakantie').astype(object)
+    periode[~known] = 'Onbekend'
+    # Een datum binnen een vakantie die over de jaargrens loopt is ook beschreven
+    covered = known & (pd.notna(landen) | np.isin(dates.dt.year.values, index['years']))
+    return periode, landen, covered
+
+def add_holiday_labels(df, index=None):
+    """
+    Voegt de kolommen 'periode_type' (Vakantie / Buiten vakantie / Onbekend)
+    en 'vakantie_land' toe aan een DataFrame met zinnen. De hele datumkolom
+    wordt in één keer opgezocht in de interval-index.
+    """
+    if index is None:
+        index = build_holiday_index(load_holiday_calendar())
+
+    df = df.copy()
+    # Pak het YYYY-MM-DD deel
+    dates = pd.to_datetime(df['createTime'].astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    df['periode_type'], df['vakantie_land'], covered = lookup_holidays(dates, index)
+
+    unknown = int((df['periode_type'] == 'Onbekend').sum())
+    if unknown:
+        print(f"WAARSCHUWING: {unknown} zinnen hebben geen datum; label 'Onbekend'.")
+    # Zoals voorheen worden die als 'Buiten vakantie' gelabeld; vul de kalender aan
+    uncovered = int((~covered & (df['periode_type'] == 'Buiten vakantie')).sum())
+    if uncovered:
+        print(f"WAARSCHUWING: {uncovered} zinnen vallen in jaren die niet in '{HOLIDAY_CALENDAR_FILE}' "
+              f"staan; label 'Buiten vakantie'.")
+    set_rows(rows_in=len(df), rows_out=len(df))
+    return df
+
+def export_json(df, path=EXPORT_FILE):
+    """Schrijft de volledige dataset als JSON-export (voor Power BI)."""
+    df = df.astype(object).where(df.notna(), None)
+    output_data = {"reviews": df.to_dict('records')}
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+def add_holiday_data():
+    print("Vakantiegegevens toevoegen aan dataset...")
+    if not os.path.exists(INPUT_FILE):
+        print(f"ERROR: '{INPUT_FILE}' niet gevonden. Run eerst 'merge_with_weather.py'.")
+        sys.exit(1)
+
+    with phase('io'):
+        df = pd.read_feather(INPUT_FILE)
+    df = add_holiday_labels(df)
+    print(f"Check voltooid. Vakantie-labels toegevoegd aan {len(df)} zinnen.")
+
+    # Pas hier importeren: de woordtellingen gebruiken de stopwoorden van wordcloud
+    from term_index import write_segment_terms
+    with phase('io'), dataset_lock(OUTPUT_STORE):
+        manifest = write_dataset(df, OUTPUT_STORE, on_segment=write_segment_terms, added_columns=HOLIDAY_COLUMNS)
+    print(f"Eindopslag '{OUTPUT_STORE}/' geschreven: {manifest['num_rows']} zinnen in "
+          f"{len(manifest['partitions'])} partities (jaar/maand).")
+
+    if EXPORT_JSON:
+        print(f"JSON-export schrijven naar '{EXPORT_FILE}'...")
+        with phase('io'):
+            export_json(df)
+
+if __name__ == "__main__":
     add_holiday_data()
\ No newline at end of file
@@ -1,78 +1,345 @@
-import json
-import pandas as pd
-from transformers import pipeline
-import os
-import nltk
-from nltk.tokenize import sent_tokenize
-
-# Zorg dat de benodigde data voor zinssegmentatie aanwezig is
-nltk.download('punkt')
-nltk.download('punkt_tab')
-
-INPUT_FILE = 'cleaned_reviews.json'
-OUTPUT_FILE = 'reviews_met_sentiment.json'
-
-def split_reviews_to_sentences(df):
-    """Splitst volledige reviews op in losse zinnen met behoud van metadata."""
-    zinnen_data = []
-    print("Reviews opsplitsen in zinnen...")
-    for _, row in df.iterrows():
-        review_text = str(row['comment']) if row['comment'] else ""
-        zinnen = sent_tokenize(review_text)
-        for zin in zinnen:
-            if len(zin.strip()) > 5:  # Filter zeer korte fragmenten
-                zinnen_data.append({
-                    'reviewId': row.get('reviewId'),
-                    'zin_tekst': zin,
-                    'originele_rating': row.get('rating'),
-                    'createTime': row.get('createTime'),
-                    'reviewerName': row.get('reviewerName')
-                })
-    return pd.DataFrame(zinnen_data)
-
-def analyze_sentiment():
-    print("Stap 1: Data laden...")
-    if not os.path.exists(INPUT_FILE):
-        print(f"ERROR: '{INPUT_FILE}' niet gevonden.")
-        return
-
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    df = pd.DataFrame.from_records(data['reviews'])
-    
-    # Filter reviews met tekst
-    df_comments = df.dropna(subset=['comment']).copy()
-    
-    # Nieuw: Opsplitsen naar zinnen voor nauwkeuriger sentiment per aspect
-    df_zinnen = split_reviews_to_sentences(df_comments)
-    print(f"{len(df_zinnen)} zinnen gegenereerd uit {len(df_comments)} reviews.")
-
-    print("Stap 2: Sentiment model laden...")
-    model_name = "DTAI-KULeuven/robbert-v2-dutch-sentiment"
-    sentiment_pipeline = pipeline("sentiment-analysis", model=model_name, tokenizer=model_name)
-
-    print("Stap 3: Sentiment per zin analyseren...")
-    zinnen_lijst = df_zinnen['zin_tekst'].tolist()
-    
-    # We analyseren de zinnen nu één voor één in een loop met een voortgangsbalk
-    from tqdm import tqdm
-    sentiments = []
-    for zin in tqdm(zinnen_lijst, desc="Analyseren"):
-        res = sentiment_pipeline(zin, truncation=True, max_length=512)
-        sentiments.append(res[0])
-
-    df_zinnen['sentiment_label'] = [s['label'] for s in sentiments]
-    df_zinnen['sentiment_score'] = [s['score'] for s in sentiments]
-
-    print(f"Stap 4: Resultaten opslaan naar '{OUTPUT_FILE}'...")
-    output_data = {
-        "metadata": {"total_sentences": len(df_zinnen)},
-        "zinnen": df_zinnen.to_dict('records')
-    }
-
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
-    print("Klaar!")
-
-if __name__ == "__main__":
-    analyze_sentiment()
\ No newline at end of file
+import argparse
+import json
+import pandas as pd
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from sentence_segmenter import segment_texts
+from sentiment_cache import SentimentCache
+from pipeline_config import (
+    CLEANED_FILE, SENTIMENT_FILE, SENTIMENT_BACKEND, SENTIMENT_WORKERS, SENTIMENT_THREADS, atomic_output
+)
+from clean_reviews import read_cleaned
+from stage_metrics import phase, set_rows
+from model_store import resolve_model
+
+# transformers wordt pas geladen als er echt zinnen gescoord moeten worden
+# (zie load_sentiment_pipeline); de punkt-data voor de zinssegmentatie komt
+# uit de lokale modelcache (zie model_store.py).
+
+INPUT_FILE = CLEANED_FILE
+OUTPUT_FILE = SENTIMENT_FILE
+
+# Batch-instellingen voor het sentiment model.
+# Zinnen worden op tokenlengte in buckets van BUCKET_WIDTH tokens gegroepeerd,
+# zodat een batch alleen zinnen van vergelijkbare lengte bevat (weinig padding).
+# BATCH_SIZE = 1 geeft het oude gedrag: één forward pass per zin.
+BATCH_SIZE = 32
+BUCKET_WIDTH = 8
+MAX_LENGTH = 512
+
+MODEL_NAME = "DTAI-KULeuven/robbert-v2-dutch-sentiment"
+# Modelversie (branch, tag of commit-hash op de Hugging Face Hub).
+# Maakt deel uit van de cache-sleutel: pin een commit-hash om de cache
+# automatisch te laten vervallen zodra het model verandert.
+MODEL_REVISION = "main"
+
+# Inferentie-backends: 'torch' (het originele model via transformers) of
+# 'onnx-int8' (geëxporteerde, geoptimaliseerde graaf met int8 dynamische
+# kwantisatie via onnxruntime, zie onnx_sentiment.py). Standaard uit
+# pipeline_config (PIPELINE_SENTIMENT_BACKEND), per run te kiezen met --backend.
+BACKENDS = ('torch', 'onnx-int8')
+
+# Scoren over meerdere processen (SENTIMENT_WORKERS > 1): de nieuwe zinnen worden
+# in blokken van SHARD_SIZE verdeeld; elke worker laadt het model één keer en
+# gebruikt een vast aantal threads, zodat de workers niet om cores vechten.
+SHARD_SIZE = 1024
+# Thread-aantallen van de OpenMP/BLAS-pools. Die pools worden opgezet bij het importeren
+# van numpy/torch, en een 'spawn'-worker importeert deze module (en dus numpy) al vóór
+# de initializer: de waarden moeten daarom al in de omgeving staan als de worker start.
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# Het model van dit worker-proces (zie _init_worker)
+_worker_pipeline = None
+
+def split_reviews_to_sentences(df):
+    """
+    Splitst volledige reviews op in losse zinnen met behoud van metadata.
+    De segmentatie draait in blokken over een process pool en levert per zin
+    alleen een review-index en tekstposities op; de metadata wordt daarna in
+    één keer per kolom overgenomen.
+    """
+    print("Reviews opsplitsen in zinnen...")
+    teksten = [str(t) if t else "" for t in df['comment']]
+    review_idx, starts, ends = segment_texts(teksten)
+
+    df_zinnen = pd.DataFrame({
+        'reviewId': df['reviewId'].to_numpy()[review_idx],
+        'zin_tekst': [teksten[r][s:e] for r, s, e in zip(review_idx, starts, ends)],
+        'originele_rating': df['rating'].to_numpy()[review_idx],
+        'createTime': df['createTime'].to_numpy()[review_idx],
+        'reviewerName': df['reviewerName'].to_numpy()[review_idx],
+    })
+    # Locatie van de review (ontbreekt in schoonbestanden van vóór de meerdere-locaties-ondersteuning)
+    if 'locationId' in df.columns:
+        df_zinnen['locationId'] = df['locationId'].to_numpy()[review_idx]
+    if 'duplicateOf' in df.columns:
+        df_zinnen['duplicateOf'] = df['duplicateOf'].to_numpy()[review_idx]
+    return df_zinnen
+
+def fan_out_duplicates(df_zinnen, df_duplicates):
+    """
+    Geeft elke near-duplicate review (zie near_duplicates.py) een kopie van de zinnen
+    en het sentiment van zijn canonieke review, met de eigen metadata van de
+    duplicaat (reviewId, rating, tijdstip, naam en locatie).
+    """
+    if not len(df_duplicates):
+        return df_zinnen
+
+    eigen = pd.DataFrame({
+        'reviewId': df_duplicates['reviewId'].to_numpy(),
+        'duplicateOf': df_duplicates['duplicateOf'].to_numpy(),
+        'originele_rating': df_duplicates['rating'].to_numpy(),
+        'createTime': df_duplicates['createTime'].to_numpy(),
+        'reviewerName': df_duplicates['reviewerName'].to_numpy(),
+    })
+    if 'locationId' in df_zinnen.columns:
+        eigen['locationId'] = df_duplicates['locationId'].to_numpy()
+
+    gedeeld = [col for col in df_zinnen.columns if col not in eigen.columns]
+    zinnen = df_zinnen[['reviewId'] + gedeeld].rename(columns={'reviewId': 'duplicateOf'})
+    kopieen = eigen.merge(zinnen, on='duplicateOf', how='inner')
+    return pd.concat([df_zinnen, kopieen[df_zinnen.columns]], ignore_index=True)
+
+def make_length_buckets(token_lengths, batch_size=BATCH_SIZE, bucket_width=BUCKET_WIDTH):
+    """
+    Groepeert zin-indices op tokenlengte en deelt elke bucket op in batches.
+    Geeft een lijst met batches terug; elke batch is een lijst met indices.
+    """
+    buckets = {}
+    for i, length in enumerate(token_lengths):
+        buckets.setdefault(length // bucket_width, []).append(i)
+
+    batches = []
+    for key in sorted(buckets):
+        indices = buckets[key]
+        for start in range(0, len(indices), batch_size):
+            batches.append(indices[start:start + batch_size])
+    return batches
+
+def score_sentences(sentiment_pipeline, zinnen_lijst, batch_size=BATCH_SIZE, bucket_width=BUCKET_WIDTH, verbose=True):
+    """
+    Scoort zinnen in batches van vergelijkbare lengte.
+    De resultaten komen terug in dezelfde volgorde als 'zinnen_lijst'.
+    """
+    from tqdm import tqdm
+
+    if not zinnen_lijst:
+        return []
+
+    token_lengths = [
+        len(ids) for ids in sentiment_pipeline.tokenizer(
+            zinnen_lijst, truncation=True, max_length=MAX_LENGTH
+        )['input_ids']
+    ]
+    batches = make_length_buckets(token_lengths, batch_size, bucket_width)
+
+    sentiments = [None] * len(zinnen_lijst)
+    start_time = time.time()
+    with tqdm(total=len(zinnen_lijst), desc="Analyseren", disable=not verbose) as progress:
+        for batch in batches:
+            batch_zinnen = [zinnen_lijst[i] for i in batch]
+            results = sentiment_pipeline(
+                batch_zinnen, batch_size=len(batch), truncation=True, max_length=MAX_LENGTH
+            )
+            for i, res in zip(batch, results):
+                sentiments[i] = res
+            progress.update(len(batch))
+    elapsed = time.time() - start_time
+
+    if verbose:
+        print(f"{len(zinnen_lijst)} zinnen gescoord in {len(batches)} batches "
+              f"in {elapsed:.1f} seconden ({len(zinnen_lijst) / max(elapsed, 1e-9):.1f} zinnen/sec).")
+    return sentiments
+
+@contextmanager
+def _worker_environment(threads):
+    """
+    Zet de thread-variabelen in de omgeving van dit proces zolang het blok loopt,
+    zodat worker-processen die dan starten ze vanaf hun eerste import erven.
+    Op de eigen (al opgezette) pools van dit proces heeft dat geen effect.
+    """
+    names = THREAD_ENV_VARS + ('TOKENIZERS_PARALLELISM',)
+    saved = {name: os.environ.get(name) for name in names}
+    os.environ.update({name: str(threads) for name in THREAD_ENV_VARS})
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+def _init_worker(backend, threads):
+    """Laadt het model één keer per worker-proces, met een vast aantal threads."""
+    global _worker_pipeline
+    # De pools volgen de omgeving al (zie _worker_environment); torch krijgt het aantal ook expliciet
+    if backend == 'torch':
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    _worker_pipeline = load_sentiment_pipeline(backend, threads)
+
+def _score_shard(zinnen):
+    return score_sentences(_worker_pipeline, zinnen, verbose=False)
+
+def score_sentences_sharded(zinnen_lijst, workers=SENTIMENT_WORKERS, backend=SENTIMENT_BACKEND, threads=SENTIMENT_THREADS):
+    """
+    Scoort zinnen verdeeld over 'workers' processen met elk 'threads' threads
+    (standaard: de cores gelijk verdeeld). De blokken worden in de oorspronkelijke
+    volgorde samengevoegd, dus het resultaat is gelijk aan dat van 'score_sentences'.
+    """
+    from tqdm import tqdm
+
+    shards = [zinnen_lijst[start:start + SHARD_SIZE] for start in range(0, len(zinnen_lijst), SHARD_SIZE)]
+    workers = min(workers, len(shards))
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+
+    sentiments = []
+    start_time = time.time()
+    # 'spawn': een geforkt proces erft de thread-pools van de ouder, wat met torch kan vastlopen
+    context = multiprocessing.get_context('spawn')
+    # Workers starten pas tijdens het verdelen van de blokken, dus de omgeving blijft het hele blok staan
+    with _worker_environment(threads), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=_init_worker, initargs=(backend, threads)) as pool:
+        with tqdm(total=len(zinnen_lijst), desc=f"Analyseren ({workers} workers)") as progress:
+            for result in pool.map(_score_shard, shards):
+                sentiments.extend(result)
+                progress.update(len(result))
+    elapsed = time.time() - start_time
+
+    print(f"{len(zinnen_lijst)} zinnen gescoord door {workers} workers x {threads} threads "
+          f"in {elapsed:.1f} seconden ({len(zinnen_lijst) / max(elapsed, 1e-9):.1f} zinnen/sec, incl. model laden).")
+    return sentiments
+
+def load_sentiment_pipeline(backend=SENTIMENT_BACKEND, threads=None):
+    """
+    Laadt het sentiment model uit de lokale modelcache (eenmalige download als het er nog niet staat).
+    Beide backends hebben dezelfde interface: 'tokenizer' plus aanroepen met een lijst zinnen.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"onbekende sentiment-backend '{backend}' (kies uit {', '.join(BACKENDS)})")
+
+    model_path = resolve_model(MODEL_NAME, MODEL_REVISION)
+    if backend == 'onnx-int8':
+        from onnx_sentiment import load_onnx_pipeline
+        return load_onnx_pipeline(model_path, threads)
+
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=model_path, tokenizer=model_path)
+
+def cache_revision(backend=SENTIMENT_BACKEND):
+    """
+    Modelversie voor de sentiment-cache. Het gekwantiseerde model geeft net iets
+    andere scores, dus die resultaten krijgen een eigen sleutel; 'torch' houdt
+    de bestaande sleutels.
+    """
+    return MODEL_REVISION if backend == 'torch' else f"{MODEL_REVISION}+{backend}"
+
+def add_sentiment(df, backend=SENTIMENT_BACKEND, workers=SENTIMENT_WORKERS, sentiment_pipeline=None):
+    """
+    Splitst reviews op in zinnen en voegt per zin een sentimentlabel en -score toe.
+    Neemt een DataFrame met opgeschoonde reviews en geeft een DataFrame op zinsniveau terug.
+    Met een al geladen 'sentiment_pipeline' (zie scoring_service.py) wordt het
+    model niet opnieuw geladen.
+    """
+    # Filter reviews met tekst
+    df_comments = df.dropna(subset=['comment']).copy()
+
+    # Near duplicates worden niet zelf opgesplitst en gescoord: ze krijgen aan het
+    # eind de zinnen van hun canonieke review (zie fan_out_duplicates)
+    df_duplicates = df_comments.iloc[:0]
+    if 'duplicateOf' in df_comments.columns:
+        is_duplicate = df_comments['duplicateOf'].notna()
+        df_duplicates = df_comments[is_duplicate]
+        df_comments = df_comments[~is_duplicate]
+        if len(df_duplicates):
+            print(f"{len(df_duplicates)} near-duplicate reviews nemen het resultaat van hun canonieke review over.")
+    
+    # Nieuw: Opsplitsen naar zinnen voor nauwkeuriger sentiment per aspect
+    df_zinnen = split_reviews_to_sentences(df_comments)
+    print(f"{len(df_zinnen)} zinnen gegenereerd uit {len(df_comments)} reviews.")
+
+    zinnen_lijst = df_zinnen['zin_tekst'].tolist()
+
+    # Eerder gescoorde zinnen komen uit de persistente cache
+    cache = SentimentCache(MODEL_NAME, cache_revision(backend))
+    sentiments = cache.lookup(zinnen_lijst)
+    nieuwe_zinnen = list(dict.fromkeys(
+        zin for zin, s in zip(zinnen_lijst, sentiments) if s is None
+    ))
+    print(f"{cache.hits} zinnen uit cache, {len(nieuwe_zinnen)} unieke nieuwe zinnen te scoren.")
+
+    if nieuwe_zinnen:
+        if sentiment_pipeline is not None:
+            nieuwe_sentiments = score_sentences(sentiment_pipeline, nieuwe_zinnen, verbose=False)
+        elif workers > 1 and len(nieuwe_zinnen) > SHARD_SIZE:
+            print(f"Stap 2/3: Sentiment analyseren over {workers} processen (backend: {backend})...")
+            # Elke worker laadt zijn eigen model; dat telt hier mee als rekentijd
+            nieuwe_sentiments = score_sentences_sharded(nieuwe_zinnen, workers, backend)
+        else:
+            print(f"Stap 2: Sentiment model laden (backend: {backend})...")
+            with phase('model_load'):
+                sentiment_pipeline = load_sentiment_pipeline(backend)
+
+            print("Stap 3: Sentiment per zin analyseren...")
+            # Zinnen worden in batches van vergelijkbare lengte door het model gehaald
+            nieuwe_sentiments = score_sentences(sentiment_pipeline, nieuwe_zinnen)
+        cache.store(nieuwe_zinnen, nieuwe_sentiments)
+
+        gescoord = dict(zip(nieuwe_zinnen, nieuwe_sentiments))
+        sentiments = [s if s is not None else gescoord[zin] for zin, s in zip(zinnen_lijst, sentiments)]
+    else:
+        print("Stap 2/3: Alle zinnen stonden al in de cache, model wordt niet geladen.")
+
+    cache.print_stats()
+    cache.close()
+
+    df_zinnen['sentiment_label'] = [s['label'] for s in sentiments]
+    df_zinnen['sentiment_score'] = [s['score'] for s in sentiments]
+    df_zinnen = fan_out_duplicates(df_zinnen, df_duplicates)
+    set_rows(rows_in=len(df), rows_out=len(df_zinnen))
+    return df_zinnen
+
+def save_sentences(df_zinnen, path=OUTPUT_FILE):
+    """Schrijft de zinnen met sentiment weg in het JSON-formaat dat 'analyse_topics.py' verwacht."""
+    output_data = {
+        "metadata": {"total_sentences": len(df_zinnen)},
+        "zinnen": df_zinnen.to_dict('records')
+    }
+
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+def analyze_sentiment(backend=SENTIMENT_BACKEND, workers=SENTIMENT_WORKERS):
+    print("Stap 1: Data laden...")
+    if not os.path.exists(INPUT_FILE):
+        print(f"ERROR: '{INPUT_FILE}' niet gevonden.")
+        sys.exit(1)
+
+    # De opgeschoonde reviews staan als JSON Lines (één review per regel)
+    with phase('io'):
+        df = pd.DataFrame.from_records(read_cleaned(INPUT_FILE))
+
+    df_zinnen = add_sentiment(df, backend, workers)
+
+    print(f"Stap 4: Resultaten opslaan naar '{OUTPUT_FILE}'...")
+    with phase('io'):
+        save_sentences(df_zinnen)
+    print("Klaar!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Splitst reviews in zinnen en bepaalt het sentiment per zin.")
+    parser.add_argument('--backend', choices=BACKENDS, default=SENTIMENT_BACKEND,
+                        help=f"Inferentie-backend voor het sentiment model (standaard: {SENTIMENT_BACKEND}).")
+    parser.add_argument('--workers', type=int, default=SENTIMENT_WORKERS,
+                        help=f"Aantal processen om over te scoren (standaard: {SENTIMENT_WORKERS}).")
+    args = parser.parse_args()
+    analyze_sentiment(backend=args.backend, workers=args.workers)
\ No newline at end of file
@@ -1,112 +1,308 @@
-import json
-import pandas as pd
-from bertopic import BERTopic
-from sklearn.feature_extraction.text import CountVectorizer
-import os
-import numpy as np
-
-# Bestandsnamen
-INPUT_FILE = 'reviews_met_sentiment.json'
-OUTPUT_FILE = 'reviews_met_topics.json'
-
-def analyze_topics():
-    """
-    Voert hiërarchische topic modeling uit op zinsniveau voor diepere inzichten.
-    """
-
-    # --- 1. Data laden (zinnen gegenereerd door analyse_sentiment.py) ---
-    print("Stap 1: Sentiment-zinnen laden...")
-    if not os.path.exists(INPUT_FILE):
-        print(f"ERROR: '{INPUT_FILE}' niet gevonden. Run eerst 'analyse_sentiment.py'.")
-        return
-        
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # We gebruiken 'zinnen' omdat het sentiment-script nu op zinsniveau opslaat
-        df_zinnen = pd.DataFrame(data['zinnen'])
-        print(f"{len(df_zinnen)} zinnen geladen voor analyse.")
-    except Exception as e:
-        print(f"ERROR: Kon data niet laden. {e}")
-        return
-
-    # Pak de tekst van de zinnen voor de clustering
-    zinnen_lijst = df_zinnen['zin_tekst'].astype(str).tolist()
-
-    if len(zinnen_lijst) == 0:
-        print("Geen tekst gevonden om te analyseren.")
-        return
-
-    # --- 2. BERTopic model configureren ---
-    print("Stap 2: BERTopic model configureren...")
-    
-    # Uitgebreide stopwoorden om ruis in de topics te verminderen
-    dutch_stop_words = [
-        "de", "het", "een", "is", "en", "van", "te", "dat", "die", "op", "met", 
-        "voor", "niet", "ook", "om", "als", "dan", "met", "google", "translated", 
-        "by", "original", "review"
-    ]
-    
-    vectorizer_model = CountVectorizer(stop_words=dutch_stop_words)
-
-    # We gebruiken language="multilingual". BERTopic laadt intern de juiste 
-    # sentence-transformers zonder dat we handmatige imports nodig hebben.
-    topic_model = BERTopic(
-        language="multilingual",
-        vectorizer_model=vectorizer_model,
-        nr_topics="20", # Zoekt zelf naar een optimaal aantal hoofd-topics
-        verbose=True
-    )
-
-    # --- 3. Topics trainen op zinsniveau ---
-    print("Stap 3: Topics trainen en toewijzen... (Dit kan even duren)")
-    topics, probs = topic_model.fit_transform(zinnen_lijst)
-    df_zinnen['topic_nr'] = topics
-
-    # --- 4. Hiërarchische analyse voor sub-topics ---
-    print("Stap 4: Sub-topic hiërarchie berekenen...")
-    try:
-        hierarchical_topics = topic_model.hierarchical_topics(zinnen_lijst)
-        
-        # Visualisaties opslaan voor de gebruiker
-        print("Visualisaties genereren...")
-        topic_model.visualize_topics().write_html("topic_overview.html")
-        topic_model.visualize_hierarchy(hierarchical_topics=hierarchical_topics).write_html("topic_hierarchy.html")
-        print("Visualisaties opgeslagen als 'topic_overview.html' en 'topic_hierarchy.html'.")
-    except Exception as e:
-        print(f"Waarschuwing: Kon hiërarchie niet berekenen/opslaan: {e}")
-
-    # --- 5. Topic namen toevoegen aan de dataframe ---
-    # Haal de tekstuele namen van de topics op (bijv. "0_zwembad_water_lekker")
-    topic_info = topic_model.get_topic_info()
-    df_final = df_zinnen.merge(
-        topic_info[['Topic', 'Name']], 
-        left_on='topic_nr', 
-        right_on='Topic', 
-        how='left'
-    ).drop(columns=['Topic']) # Dubbele kolom verwijderen
-
-    # --- 6. Resultaten opslaan ---
-    print(f"Stap 5: Resultaten opslaan naar '{OUTPUT_FILE}'...")
-    
-    # NaN vervangen door None voor JSON validiteit
-    df_final = df_final.replace({np.nan: None})
-    
-    output_data = {
-        "metadata": {
-            "total_sentences": len(df_final),
-            "topic_count": len(topic_info)
-        },
-        "zinnen": df_final.to_dict('records')
-    }
-
-    try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
-        print(f"\nTopic analyse voltooid! '{OUTPUT_FILE}' is aangemaakt.")
-    except Exception as e:
-        print(f"ERROR bij schrijven JSON: {e}")
-
-if __name__ == "__main__":
-    analyze_topics()
\ No newline at end of file
+import argparse
+import json
+import pandas as pd
+import os
+import sys
+import time
+import uuid
+import numpy as np
+from pipeline_config import SENTIMENT_FILE, TOPICS_FILE, atomic_output
+from embedding_cache import EmbeddingCache
+from topic_cache import TopicAssignmentCache
+from stage_metrics import phase, set_rows
+from model_store import resolve_model
+
+# BERTopic, scikit-learn en sentence-transformers worden pas binnen de functies
+# geïmporteerd die ze gebruiken: het opstarten en de controle op de invoer
+# kosten dan geen seconden aan imports.
+
+# Bestandsnamen
+INPUT_FILE = SENTIMENT_FILE
+OUTPUT_FILE = TOPICS_FILE
+
+# Het sentence-transformers model dat BERTopic bij language="multilingual" gebruikt
+EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_MODEL_REPO = f"sentence-transformers/{EMBEDDING_MODEL}"
+
+# Het getrainde topic model wordt bewaard zodat topicnummers en -namen
+# tussen runs gelijk blijven. Dit staat bewust niet in de cache-map:
+# verwijderen betekent opnieuw trainen, met nieuwe topicnummers.
+TOPIC_MODEL_DIR = 'models'
+TOPIC_MODEL_FILE = os.path.join(TOPIC_MODEL_DIR, 'topic_model.pkl')
+TOPIC_MODEL_INFO_FILE = os.path.join(TOPIC_MODEL_DIR, 'topic_model_info.json')
+TOPIC_MAPPING_FILE = os.path.join(TOPIC_MODEL_DIR, 'topic_mapping.json')
+
+def load_embedding_model():
+    """Laadt het sentence-transformers model uit de lokale modelcache."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(resolve_model(EMBEDDING_MODEL_REPO))
+
+def compute_embeddings(zinnen_lijst):
+    """
+    Haalt de embeddings van alle zinnen op uit de persistente cache en berekent
+    alleen die van nieuwe zinnen. Het embedding model wordt alleen geladen als
+    er nieuwe zinnen zijn; het wordt (of None) samen met de embeddings teruggegeven.
+    """
+    cache = EmbeddingCache(EMBEDDING_MODEL)
+    loaded = {}
+
+    def encode(nieuwe_zinnen):
+        with phase('model_load'):
+            loaded['model'] = load_embedding_model()
+        return loaded['model'].encode(nieuwe_zinnen, show_progress_bar=True)
+
+    embeddings = cache.get_embeddings(zinnen_lijst, encode)
+    return embeddings, loaded.get('model')
+
+def build_topic_model(embedding_model):
+    """Configureert een nieuw (nog niet getraind) BERTopic model."""
+    from bertopic import BERTopic
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    # Uitgebreide stopwoorden om ruis in de topics te verminderen
+    dutch_stop_words = [
+        "de", "het", "een", "is", "en", "van", "te", "dat", "die", "op", "met",
+        "voor", "niet", "ook", "om", "als", "dan", "met", "google", "translated",
+        "by", "original", "review"
+    ]
+
+    vectorizer_model = CountVectorizer(stop_words=dutch_stop_words)
+
+    # Embeddings komen uit de cache; alleen nieuwe zinnen worden ge-embed.
+    # BERTopic hoeft de documenten daardoor niet zelf opnieuw te embedden.
+    return BERTopic(
+        embedding_model=embedding_model,
+        language="multilingual",
+        vectorizer_model=vectorizer_model,
+        nr_topics="20", # Zoekt zelf naar een optimaal aantal hoofd-topics
+        verbose=True
+    )
+
+def load_topic_model():
+    """Laadt het bewaarde topic model. Geeft (model, info) terug, of (None, None) als er nog geen is."""
+    if not (os.path.exists(TOPIC_MODEL_FILE) and os.path.exists(TOPIC_MODEL_INFO_FILE)):
+        return None, None
+    with phase('model_load'):
+        from bertopic import BERTopic
+        with open(TOPIC_MODEL_INFO_FILE, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return BERTopic.load(TOPIC_MODEL_FILE), info
+
+def save_topic_model(topic_model, n_sentences):
+    """Bewaart het model (incl. UMAP/HDBSCAN, nodig voor 'transform') met een nieuw model-id."""
+    os.makedirs(TOPIC_MODEL_DIR, exist_ok=True)
+    # De embeddings komen altijd uit onze eigen cache, het embedding model hoeft niet mee
+    with phase('io'):
+        topic_model.save(TOPIC_MODEL_FILE, serialization="pickle", save_embedding_model=False)
+    info = {
+        "model_id": uuid.uuid4().hex,
+        "fitted_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "n_sentences": n_sentences,
+        "embedding_model": EMBEDDING_MODEL
+    }
+    with open(TOPIC_MODEL_INFO_FILE, 'w', encoding='utf-8') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+def assign_topics(topic_model, zinnen_lijst, embeddings, previous, cache=None):
+    """
+    Wijst topics toe met een bestaand model. Zinnen die in 'previous' staan
+    houden hun topic; alleen nieuwe zinnen gaan door 'transform'. Met een
+    TopicAssignmentCache komen de nieuwe toewijzingen daarin.
+    """
+    topics = np.array([previous.get(z, -2) for z in zinnen_lijst])
+    nieuw = np.flatnonzero(topics == -2)
+    print(f"{len(zinnen_lijst) - len(nieuw)} zinnen met bekend topic, {len(nieuw)} nieuwe zinnen toewijzen.")
+    if len(nieuw):
+        nieuwe_zinnen = [zinnen_lijst[i] for i in nieuw]
+        new_topics, _ = topic_model.transform(nieuwe_zinnen, embeddings=embeddings[nieuw])
+        topics[nieuw] = new_topics
+        if cache is not None:
+            cache.store(nieuwe_zinnen, topics[nieuw])
+    return topics
+
+def topic_id_mapping(old_topics, new_topics):
+    """
+    Koppelt elk oud topic aan het nieuwe topic waar de meeste van zijn zinnen
+    na een refit in terechtkomen, met het aandeel zinnen dat meegaat.
+    """
+    overlap = pd.crosstab(pd.Series(old_topics, name='oud'), pd.Series(new_topics, name='nieuw'))
+    mapping = {}
+    for old_topic, row in overlap.iterrows():
+        mapping[str(old_topic)] = {
+            "nieuw_topic": int(row.idxmax()),
+            "aandeel": round(float(row.max() / row.sum()), 3)
+        }
+    return mapping
+
+def write_visualizations(topic_model, zinnen_lijst):
+    """Berekent de sub-topic hiërarchie en slaat de visualisaties op."""
+    print("Sub-topic hiërarchie berekenen...")
+    try:
+        hierarchical_topics = topic_model.hierarchical_topics(zinnen_lijst)
+
+        # Visualisaties opslaan voor de gebruiker
+        print("Visualisaties genereren...")
+        topic_model.visualize_topics().write_html("topic_overview.html")
+        topic_model.visualize_hierarchy(hierarchical_topics=hierarchical_topics).write_html("topic_hierarchy.html")
+        print("Visualisaties opgeslagen als 'topic_overview.html' en 'topic_hierarchy.html'.")
+    except Exception as e:
+        print(f"Waarschuwing: Kon hiërarchie niet berekenen/opslaan: {e}")
+
+def canonical_mask(df_zinnen):
+    """
+    Welke zinnen meetellen voor het topic model. Zinnen van near-duplicate reviews
+    (kopieën van hun canonieke review) tellen niet mee en krijgen daarna hetzelfde topic.
+    """
+    if 'duplicateOf' in df_zinnen.columns:
+        return df_zinnen['duplicateOf'].isna().to_numpy()
+    return np.ones(len(df_zinnen), dtype=bool)
+
+def attach_topics(df_zinnen, canoniek, zinnen_lijst, topics, topic_model):
+    """
+    Zet de topics van de canonieke zinnen ('zinnen_lijst') in de kolom 'topic_nr'
+    van alle zinnen en voegt de topicnaam ('Name') toe.
+    """
+    df_zinnen = df_zinnen.copy()
+    topic_nr = np.empty(len(df_zinnen), dtype=np.int64)
+    topic_nr[canoniek] = topics
+    if not canoniek.all():
+        # Kopieën van near duplicates: dezelfde tekst, dus hetzelfde topic als de canonieke zin
+        per_zin = dict(zip(zinnen_lijst, topics))
+        topic_nr[~canoniek] = [per_zin[z] for z in df_zinnen.loc[~canoniek, 'zin_tekst'].astype(str)]
+    df_zinnen['topic_nr'] = topic_nr
+
+    # Haal de tekstuele namen van de topics op (bijv. "0_zwembad_water_lekker")
+    topic_info = topic_model.get_topic_info()
+    return df_zinnen.merge(
+        topic_info[['Topic', 'Name']],
+        left_on='topic_nr',
+        right_on='Topic',
+        how='left'
+    ).drop(columns=['Topic']) # Dubbele kolom verwijderen
+
+def add_topics(df_zinnen, refit=False):
+    """
+    Wijst op zinsniveau topics toe voor diepere inzichten.
+    Standaard wordt het bewaarde model gebruikt en worden alleen nieuwe zinnen
+    toegewezen, zodat topicnummers en -namen stabiel blijven. Bij 'refit' (of
+    als er nog geen model is) wordt een nieuw model getraind; de koppeling van
+    oude naar nieuwe topicnummers wordt dan opgeslagen in TOPIC_MAPPING_FILE.
+    Geeft de zinnen terug met 'topic_nr' en 'Name'.
+    """
+    # Pak de tekst van de zinnen voor de clustering
+    canoniek = canonical_mask(df_zinnen)
+    zinnen_lijst = df_zinnen.loc[canoniek, 'zin_tekst'].astype(str).tolist()
+
+    if len(zinnen_lijst) == 0:
+        print("Geen tekst gevonden om te analyseren.")
+        return None
+
+    print("Stap 2: Embeddings ophalen...")
+    embeddings, embedding_model = compute_embeddings(zinnen_lijst)
+
+    old_model, old_info = load_topic_model()
+
+    if old_model is not None and not refit:
+        # --- 3a. Incrementeel: bestaand model, alleen nieuwe zinnen toewijzen ---
+        print(f"Stap 3: Bestaand topic model gebruiken (getraind op {old_info['fitted_at']})...")
+        cache = TopicAssignmentCache(old_info['model_id'])
+        topics = assign_topics(old_model, zinnen_lijst, embeddings, cache.lookup(zinnen_lijst), cache)
+        cache.close()
+        topic_model, info = old_model, old_info
+    else:
+        # --- 3b. Volledig trainen op zinsniveau ---
+        print("Stap 3: Topics trainen en toewijzen... (Dit kan even duren)")
+        topic_model = build_topic_model(embedding_model)
+        topics, probs = topic_model.fit_transform(zinnen_lijst, embeddings=embeddings)
+
+        if old_model is not None:
+            print("Koppeling oude -> nieuwe topicnummers bepalen...")
+            old_cache = TopicAssignmentCache(old_info['model_id'])
+            old_topics = assign_topics(old_model, zinnen_lijst, embeddings, old_cache.lookup(zinnen_lijst))
+            old_cache.close()
+            mapping = topic_id_mapping(old_topics, topics)
+            with open(TOPIC_MAPPING_FILE, 'w', encoding='utf-8') as f:
+                json.dump({"oud_model": old_info['model_id'], "mapping": mapping}, f, indent=2)
+            print(f"Topic-koppeling opgeslagen in '{TOPIC_MAPPING_FILE}'.")
+
+        info = save_topic_model(topic_model, len(zinnen_lijst))
+        print(f"Topic model opgeslagen in '{TOPIC_MODEL_FILE}'.")
+        cache = TopicAssignmentCache(info['model_id'])
+        cache.store(zinnen_lijst, topics)
+        cache.remove_other_models()
+        cache.close()
+
+        # --- 4. Hiërarchische analyse voor sub-topics (alleen na trainen) ---
+        write_visualizations(topic_model, zinnen_lijst)
+
+    # --- 5. Topic namen toevoegen aan de dataframe ---
+    df_final = attach_topics(df_zinnen, canoniek, zinnen_lijst, topics, topic_model)
+
+    df_final.attrs['topic_model_id'] = info['model_id']
+    set_rows(rows_in=len(df_zinnen), rows_out=len(df_final))
+    return df_final
+
+def save_topics(df_final, path=OUTPUT_FILE):
+    """Schrijft de zinnen met topics weg in het JSON-formaat dat 'merge_with_weather.py' verwacht."""
+    model_id = df_final.attrs.get('topic_model_id')
+
+    # NaN vervangen door None voor JSON validiteit
+    df_final = df_final.replace({np.nan: None})
+
+    output_data = {
+        "metadata": {
+            "total_sentences": len(df_final),
+            "topic_count": int(df_final['topic_nr'].nunique()),
+            "topic_model_id": model_id
+        },
+        "zinnen": df_final.to_dict('records')
+    }
+
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(output_data, f, indent=2, ensure_ascii=False)
+
+def analyze_topics(refit=False):
+    """
+    Leest de zinnen met sentiment, wijst topics toe en slaat het resultaat op.
+    """
+
+    # --- 1. Data laden (zinnen gegenereerd door analyse_sentiment.py) ---
+    print("Stap 1: Sentiment-zinnen laden...")
+    if not os.path.exists(INPUT_FILE):
+        print(f"ERROR: '{INPUT_FILE}' niet gevonden. Run eerst 'analyse_sentiment.py'.")
+        sys.exit(1)
+
+    try:
+        with phase('io'):
+            with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            # We gebruiken 'zinnen' omdat het sentiment-script nu op zinsniveau opslaat
+            df_zinnen = pd.DataFrame(data['zinnen'])
+        print(f"{len(df_zinnen)} zinnen geladen voor analyse.")
+    except Exception as e:
+        print(f"ERROR: Kon data niet laden. {e}")
+        sys.exit(1)
+
+    df_final = add_topics(df_zinnen, refit=refit)
+    if df_final is None:
+        sys.exit(1)
+
+    # --- 6. Resultaten opslaan ---
+    print(f"Stap 5: Resultaten opslaan naar '{OUTPUT_FILE}'...")
+    try:
+        with phase('io'):
+            save_topics(df_final)
+        print(f"\nTopic analyse voltooid! '{OUTPUT_FILE}' is aangemaakt.")
+    except Exception as e:
+        print(f"ERROR bij schrijven JSON: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wijst topics toe aan de zinnen.")
+    parser.add_argument('--refit', action='store_true',
+                        help="Train het topic model opnieuw in plaats van het bewaarde model te gebruiken.")
+    args = parser.parse_args()
+    analyze_topics(refit=args.refit)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import sys
+import pandas as pd
+from pipeline_config import FINAL_STORE, CUBE_STORE
+from columnar_store import write_table
+from dataset_store import dataset_exists, read_dataset, dataset_lock
+from stage_metrics import phase, set_rows
+
+# De kubus vat de zinnen samen per jaar x maand x periode x topic x sentiment.
+# De dashboard beantwoordt metrics en grafieken vanuit deze paar duizend cellen
+# in plaats van bij elke filterwijziging alle zinnen opnieuw te groeperen.
+INPUT_STORE = FINAL_STORE
+OUTPUT_STORE = CUBE_STORE
+
+CUBE_DIMENSIONS = ['year', 'month', 'periode_type', 'topic_nr', 'Name', 'sentiment_label']
+
+# Kolommen uit de eindopslag die nodig zijn om de kubus te bouwen
+SOURCE_COLUMNS = ['createTime', 'periode_type', 'topic_nr', 'Name', 'sentiment_label',
+                  'sentiment_score', 'temp_max_c', 'precip_amount_mm', 'temp_avg_c', 'duplicateOf']
+
+# Weerkolommen waarvan som en aantal (niet-lege waarden) worden bijgehouden,
+# zodat gemiddelden over elke selectie van cellen exact blijven
+WEATHER_COLUMNS = ['temp_max_c', 'precip_amount_mm', 'temp_avg_c']
+
+
+def build_cube(df):
+    """
+    Aggregeert een DataFrame met zinnen tot de analysekubus.
+    Per cel: aantal zinnen ('n'), som van de sentimentscore en per weerkolom
+    de som en het aantal bekende waarden. Zinnen zonder datum vallen weg, net als
+    de kopieën van near-duplicate reviews (die tellen maar één keer mee).
+    """
+    rows_in = len(df)
+    if 'duplicateOf' in df.columns:
+        df = df[df['duplicateOf'].isna()]
+    dates = pd.to_datetime(df['createTime'].astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    cube_input = pd.DataFrame({
+        'year': dates.dt.year,
+        'month': dates.dt.month,
+        'periode_type': df['periode_type'] if 'periode_type' in df.columns else 'Onbekend',
+        'topic_nr': df['topic_nr'],
+        'Name': df['Name'],
+        'sentiment_label': df['sentiment_label'],
+        'score': df['sentiment_score'],
+    })
+    measures = {'n': ('score', 'size'), 'score_sum': ('score', 'sum')}
+    for col in WEATHER_COLUMNS:
+        if col in df.columns:
+            cube_input[col] = df[col].values
+            measures[f'{col}_sum'] = (col, 'sum')
+            measures[f'{col}_n'] = (col, 'count')
+
+    cube_input = cube_input[dates.notna().values]
+    cube = cube_input.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).agg(**measures).reset_index()
+    cube['year'] = cube['year'].astype(int)
+    cube['month'] = cube['month'].astype(int)
+    set_rows(rows_in=rows_in, rows_out=len(cube))
+    return cube
+
+
+def merge_cubes(cube, extra):
+    """
+    Telt twee kubussen cel voor cel op. Alle maten zijn sommen en aantallen,
+    dus de kubus van nieuwe zinnen kan zonder de oude zinnen worden bijgeteld.
+    """
+    merged = pd.concat([cube, extra], ignore_index=True)
+    return merged.groupby(CUBE_DIMENSIONS, observed=True, dropna=False).sum().reset_index()
+
+
+def build_analytics_cube():
+    print("Analysekubus bouwen...")
+    if not dataset_exists(INPUT_STORE):
+        print(f"ERROR: {INPUT_STORE}/ niet gevonden. Run eerst 'merge_with_weather.py' en 'add_holidays.py'.")
+        sys.exit(1)
+
+    # De scoring-service telt nieuwe zinnen bij de kubus op; tussen lezen en
+    # schrijven mag de opslag dus niet veranderen
+    with dataset_lock(INPUT_STORE):
+        with phase('io'):
+            df = read_dataset(INPUT_STORE, columns=SOURCE_COLUMNS)
+        cube = build_cube(df)
+        with phase('io'):
+            write_table(cube, OUTPUT_STORE)
+    print(f"Kubus met {len(cube)} cellen ({len(df)} zinnen) opgeslagen in '{OUTPUT_STORE}/'.")
+
+
+if __name__ == "__main__":
+    build_analytics_cube()
\ No newline at end of file
@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import stage_metrics
+
+# Benchmark van de volledige pijplijn op synthetische exports van oplopende grootte.
+# Elke grootte draait in een eigen, lege werkmap (koude caches); per stap worden
+# wandtijd en piekgeheugen (RSS) gemeten. De modelstappen zijn standaard
+# vervangen door deterministische stubs, zodat de benchmark offline draait en
+# tussen releases vergelijkbaar is. Gebruik --real-models voor de echte modellen.
+# Met de stubs is ook geen NLTK-data nodig (ongetraind punkt-model, zie
+# sentence_segmenter.py) en wordt het sentiment in één proces 'gescoord': de
+# stubs bestaan alleen in dit proces, worker-processen zouden het echte model laden.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_OUTPUT = 'benchmark_results.json'
+# Bestanden uit de repository die de pijplijn in de werkmap nodig heeft
+SUPPORT_FILES = ['weather_data.csv', 'weather_stations.csv', 'locations.csv', 'holiday_calendar.csv']
+# Een stap die meer dan deze factor trager is dan in het vergelijkingsbestand wordt gemeld
+REGRESSION_FACTOR = 1.2
+# Scripts waarvan de opstarttijd (alleen importeren) wordt gemeten
+STARTUP_MODULES = ['clean_reviews', 'analyse_sentiment', 'analyse_topics', 'merge_with_weather', 'add_holidays']
+STARTUP_REPEATS = 3
+
+# --- Synthetische reviews ---
+LOCATION_IDS = ['14531893168791146170', '17435356160216474074', '8764989153052100599']
+STAR_RATINGS = ['ONE', 'TWO', 'THREE', 'FOUR', 'FIVE']
+STAR_WEIGHTS = [5, 4, 8, 25, 58]
+FIRST_NAMES = ['Anita', 'Jan', 'Patricia', 'Sven', 'Fatima', 'Kees', 'Lotte', 'Thomas', 'Mira', 'Daan']
+LAST_NAMES = ['Jansen', 'de Vries', 'Bakker', 'Visser', 'Smit', 'Meijer', 'Mulder', 'de Boer']
+SUBJECTS = ['Het zwembad', 'De bungalow', 'Het personeel', 'Het restaurant', 'De camping',
+            'Het sanitair', 'De speeltuin', 'Het eten', 'De receptie', 'Het park']
+OPINIONS = ['was erg schoon', 'was vies', 'was super gezellig', 'viel tegen', 'was prima in orde',
+            'was te duur', 'was heerlijk', 'kan beter', 'was erg vriendelijk', 'was veel te druk']
+ADDITIONS = ['', ' voor de kinderen', ' in de zomer', ' tijdens het weekend', ' dit keer', ' helaas']
+# Lettergrepen voor zeldzame woorden (namen, plaatsen), zodat de woordenschat met de data meegroeit
+SYLLABLES = ['ka', 'lo', 'ven', 'ber', 'dam', 'tis', 'mo', 'rik', 'se', 'hol', 'van', 'dor']
+REPLIES = ['Bedankt voor uw review!', 'Fijn dat u genoten heeft, tot ziens!',
+           'Jammer om te lezen, we nemen dit mee.']
+FIRST_REVIEW = datetime(2017, 1, 1, tzinfo=timezone.utc)
+REVIEW_SPAN_SECONDS = int((datetime(2025, 11, 1, tzinfo=timezone.utc) - FIRST_REVIEW).total_seconds())
+
+
+def synthetic_sentence(rng):
+    sentence = f"{rng.choice(SUBJECTS)} {rng.choice(OPINIONS)}{rng.choice(ADDITIONS)}"
+    if rng.random() < 0.5:
+        sentence += f" en {rng.choice(SUBJECTS).lower()} {rng.choice(OPINIONS)}"
+    if rng.random() < 0.3:
+        rare_word = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        sentence += f", net als in {rare_word.capitalize()}"
+    return sentence + '.'
+
+
+def synthetic_review(rng, i):
+    """Eén review in het formaat van de export (reviewer, starRating, createTime, comment, reviewReply, name)."""
+    created = FIRST_REVIEW + timedelta(seconds=rng.randrange(REVIEW_SPAN_SECONDS), microseconds=rng.randrange(1_000_000))
+    stamp = created.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    review = {
+        'reviewer': {'displayName': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"},
+        'starRating': rng.choices(STAR_RATINGS, STAR_WEIGHTS)[0],
+        'createTime': stamp,
+        'updateTime': stamp,
+        'name': f"accounts/117508028258842179623/locations/{rng.choice(LOCATION_IDS)}/reviews/synthetic{i:09d}",
+    }
+    # Ongeveer 1 op 5 reviews heeft alleen sterren, zonder tekst
+    if rng.random() < 0.8:
+        review['comment'] = ' '.join(synthetic_sentence(rng) for _ in range(rng.randint(1, 5)))
+    if rng.random() < 0.5:
+        review['reviewReply'] = {'comment': rng.choice(REPLIES), 'updateTime': stamp}
+    # Een klein deel is onvolledig, zodat het opschonen ook iets te doen heeft
+    if rng.random() < 0.005:
+        del review['reviewer']['displayName']
+    return review
+
+
+def generate_reviews(path, n_reviews, seed=0):
+    """
+    Schrijft een synthetische export met 'n_reviews' reviews (plus ~1% duplicaten en ~1% herplaatste teksten).
+    De reviews worden één voor één weggeschreven, zodat ook 1M reviews weinig geheugen kost.
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n  "reviews": [\n')
+        previous = None
+        for i in range(n_reviews):
+            review = synthetic_review(rng, i)
+            if previous is not None and rng.random() < 0.01:
+                review = previous  # Duplicaat, zoals bij overlappende exports
+            elif previous is not None and 'comment' in previous and rng.random() < 0.01:
+                review['comment'] = previous['comment']  # Dezelfde tekst opnieuw geplaatst (near duplicate)
+            f.write(('    ' if i == 0 else ',\n    ') + json.dumps(review, ensure_ascii=False))
+            previous = review
+        f.write('\n  ]\n}\n')
+    return os.path.getsize(path)
+
+
+# --- Deterministische stubs voor de modelstappen ---
+class StubSentimentPipeline:
+    """Vervangt de Hugging Face pipeline: label en score volgen uit een hash van de zin."""
+
+    LABELS = ['Negative', 'Neutral', 'Positive']
+
+    def tokenizer(self, texts, truncation=True, max_length=512):
+        return {'input_ids': [text.split()[:max_length] for text in texts]}
+
+    def __call__(self, texts, **kwargs):
+        results = []
+        for text in texts:
+            h = zlib.crc32(text.encode('utf-8'))
+            results.append({'label': self.LABELS[h % 3], 'score': 0.5 + (h >> 8) % 500 / 1000})
+        return results
+
+
+STUB_TOPICS = 20
+
+
+def stub_add_topics(df_zinnen, refit=False):
+    """Vervangt BERTopic: het topic volgt uit een hash van de zin (-1 = geen topic)."""
+    df_final = df_zinnen.copy()
+    hashes = np.fromiter((zlib.crc32(z.encode('utf-8')) for z in df_final['zin_tekst'].astype(str)),
+                         dtype=np.int64, count=len(df_final))
+    df_final['topic_nr'] = hashes % (STUB_TOPICS + 1) - 1
+    df_final['Name'] = [f"{t}_stub_topic" for t in df_final['topic_nr']]
+    df_final.attrs['topic_model_id'] = 'stub'
+    return df_final
+
+
+# --- Meten ---
+def measure(results, name, func, *args):
+    """Voert één stap uit en legt wandtijd, piekgeheugen en rijen vast."""
+    per_stage_peak = stage_metrics.reset_peak_rss()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    rows = len(result) if hasattr(result, 'columns') else None
+    peak = stage_metrics.peak_rss_mb()
+    results.append({
+        'stage': name,
+        'seconds': round(elapsed, 4),
+        'peak_rss_mb': round(peak, 1) if peak is not None else None,
+        'peak_rss_is_per_stage': per_stage_peak,
+        'rows_out': rows,
+    })
+    print(f"  {name:<16} {elapsed:8.2f} s  {peak or 0:8.1f} MB" + (f"  {rows} rijen" if rows is not None else ""))
+    return result
+
+
+def run_size(n_reviews, real_models=False, seed=0, keep_dir=False):
+    """Draait de volledige pijplijn (in-process) plus het laden van de dashboard op één grootte."""
+    import clean_reviews
+    import analyse_sentiment
+    import sentence_segmenter
+    import merge_with_weather
+    import add_holidays
+    import analytics_cube
+    import term_index
+    from columnar_store import write_table
+    from dataset_store import write_dataset
+    from pipeline_config import REVIEWS_FILE, WEATHER_FILE, FINAL_STORE, CUBE_STORE, FINAL_FILE
+
+    workdir = tempfile.mkdtemp(prefix=f'bench_{n_reviews}_')
+    old_cwd = os.getcwd()
+    stages = []
+    try:
+        for name in SUPPORT_FILES:
+            if os.path.exists(os.path.join(REPO_DIR, name)):
+                shutil.copy(os.path.join(REPO_DIR, name), workdir)
+        os.chdir(workdir)
+
+        print(f"\n--- {n_reviews} reviews ({'echte modellen' if real_models else 'stubs'}) in {workdir} ---")
+        input_bytes = measure(stages, 'generate', generate_reviews, REVIEWS_FILE, n_reviews, seed)
+
+        original_loader = analyse_sentiment.load_sentiment_pipeline
+        original_punkt = os.environ.get(sentence_segmenter.PUNKT_ENV)
+        if real_models:
+            import analyse_topics
+            add_topics = analyse_topics.add_topics
+            workers = analyse_sentiment.SENTIMENT_WORKERS
+        else:
+            analyse_sentiment.load_sentiment_pipeline = lambda backend=None: StubSentimentPipeline()
+            add_topics = stub_add_topics
+            workers = 1
+            os.environ[sentence_segmenter.PUNKT_ENV] = 'untrained'
+            sentence_segmenter._punkt = None
+        try:
+            df = measure(stages, 'clean', lambda: clean_reviews.clean_reviews(clean_reviews.load_raw_reviews(REVIEWS_FILE)))
+            df = measure(stages, 'sentiment', analyse_sentiment.add_sentiment, df,
+                         analyse_sentiment.SENTIMENT_BACKEND, workers)
+            df = measure(stages, 'topics', add_topics, df)
+        finally:
+            analyse_sentiment.load_sentiment_pipeline = original_loader
+            if not real_models:
+                if original_punkt is None:
+                    os.environ.pop(sentence_segmenter.PUNKT_ENV, None)
+                else:
+                    os.environ[sentence_segmenter.PUNKT_ENV] = original_punkt
+                sentence_segmenter._punkt = None
+
+        weather = measure(stages, 'load_weather', merge_with_weather.load_weather, WEATHER_FILE)
+        df = measure(stages, 'weather', merge_with_weather.add_weather, df, weather)
+        df = measure(stages, 'holidays', add_holidays.add_holiday_labels, df)
+        cube = measure(stages, 'cube', analytics_cube.build_cube, df)
+
+        # Inclusief de woordtellingen, die per segment worden berekend
+        def write_outputs():
+            write_dataset(df, FINAL_STORE, on_segment=term_index.write_segment_terms,
+                          added_columns=add_holidays.HOLIDAY_COLUMNS)
+            write_table(cube, CUBE_STORE)
+        measure(stages, 'write_store', write_outputs)
+        measure(stages, 'export_json', add_holidays.export_json, df, FINAL_FILE)
+        del df, cube
+
+        dashboard = measure_dashboard(stages)
+        return {
+            'reviews': n_reviews,
+            'input_mb': round(input_bytes / 1024 / 1024, 2),
+            'stages': stages,
+            'dashboard': dashboard,
+            # Zonder het genereren van de invoer
+            'total_seconds': round(sum(s['seconds'] for s in stages if s['stage'] != 'generate'), 3),
+        }
+    finally:
+        os.chdir(old_cwd)
+        if not keep_dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure_dashboard(stages):
+    """
+    Draait dashboard.py headless (Streamlit AppTest): de eerste run laadt de data
+    (load_data en de caches), de tweede run is een rerun zoals na een filterklik.
+    """
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("  dashboard        overgeslagen (streamlit.testing niet beschikbaar)")
+        return None
+
+    # De caches van de dashboard leven per proces; de vorige grootte mag niet meetellen
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    app = AppTest.from_file(os.path.join(REPO_DIR, 'dashboard.py'), default_timeout=3600)
+    measure(stages, 'dashboard_load', app.run)
+    measure(stages, 'dashboard_rerun', app.run)
+    errors = [str(e.value) for e in app.exception]
+    return {'errors': errors}
+
+
+def measure_startup(repeats=STARTUP_REPEATS):
+    """
+    Opstarttijd per stap: een verse interpreter die alleen het script importeert
+    (zonder data of modellen). Het minimum over 'repeats' pogingen telt.
+    """
+    print("\n--- Opstarttijd (import in een nieuw proces) ---")
+    startup = {}
+    for module in STARTUP_MODULES:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            done = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=REPO_DIR,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+            if done.returncode != 0:
+                break
+        if done.returncode != 0:
+            print(f"  {module:<20} mislukt (ontbrekende afhankelijkheid?)")
+            startup[module] = None
+            continue
+        startup[module] = round(min(times), 3)
+        print(f"  {module:<20} {startup[module]:8.2f} s")
+    return startup
+
+
+def compare(results, baseline_path):
+    """Meldt stappen die merkbaar trager zijn dan in een eerder resultaatbestand."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(run['reviews'], s['stage']): s['seconds'] for run in baseline['runs'] for s in run['stages']}
+
+    regressions = []
+    for run in results['runs']:
+        for s in run['stages']:
+            before = previous.get((run['reviews'], s['stage']))
+            if before and before > 0.05 and s['seconds'] > before * REGRESSION_FACTOR:
+                regressions.append(f"{run['reviews']} reviews, {s['stage']}: {before:.2f} s -> {s['seconds']:.2f} s")
+    for module, seconds in (results.get('startup') or {}).items():
+        before = (baseline.get('startup') or {}).get(module)
+        if before and seconds and before > 0.05 and seconds > before * REGRESSION_FACTOR:
+            regressions.append(f"opstarten {module}: {before:.2f} s -> {seconds:.2f} s")
+    if regressions:
+        print(f"\nTRAGER dan '{baseline_path}' (> {REGRESSION_FACTOR:.1f}x):")
+        for line in regressions:
+            print(f"  {line}")
+    else:
+        print(f"\nGeen regressies ten opzichte van '{baseline_path}'.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark van de review-pijplijn op synthetische data.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Aantallen reviews om te benchmarken (standaard: 1k, 10k, 100k, 1M).")
+    parser.add_argument('--real-models', action='store_true',
+                        help="Gebruik het echte sentiment- en topic model in plaats van de stubs.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed voor de synthetische reviews.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="JSON-bestand voor de resultaten.")
+    parser.add_argument('--compare', help="Eerder resultaatbestand om regressies tegen te controleren.")
+    parser.add_argument('--keep', action='store_true', help="Bewaar de werkmappen met de gegenereerde data.")
+    args = parser.parse_args()
+
+    sys.path.insert(0, REPO_DIR)
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'real_models': args.real_models,
+        'seed': args.seed,
+        'startup': measure_startup(),
+        'runs': [run_size(n, args.real_models, args.seed, args.keep) for n in args.sizes],
+    }
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResultaten opgeslagen in '{args.output}'.")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
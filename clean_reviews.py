@@ -1,103 +1,356 @@
-import json
-import os
-
-INPUT_FILE = 'terspegelt.json'
-OUTPUT_FILE = 'cleaned_reviews.json'
-
-# 1. Mapping to convert string ratings to numbers
-RATING_MAP = {
-    "FIVE": 5,
-    "FOUR": 4,
-    "THREE": 3,
-    "TWO": 2,
-    "ONE": 1
-}
-
-def clean_review_data():
-    """
-    Reads the combined JSON file, cleans the data,
-    and saves it to a new file.
-    """
-    
-    # --- 1. Load the file ---
-    if not os.path.exists(INPUT_FILE):
-        print(f"ERROR: File '{INPUT_FILE}' not found.")
-        print("Please run 'combined_reviews.py' first.")
-        return
-
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"ERROR: Could not read JSON from '{INPUT_FILE}'. Is the file corrupt?")
-        return
-
-    if 'reviews' not in data or not isinstance(data['reviews'], list):
-        print(f"ERROR: '{INPUT_FILE}' does not have the expected structure (no 'reviews' list).")
-        return
-
-    original_count = len(data['reviews'])
-    print(f"Starting cleaning process... {original_count} reviews found in '{INPUT_FILE}'.")
-
-    # --- 2. Clean data ---
-    cleaned_reviews_list = []
-    processed_ids = set()  # Set to track duplicates
-    skipped_count = 0
-    duplicate_count = 0
-
-    for review in data['reviews']:
-        
-        # 2a. Check for duplicates
-        review_id_full = review.get('name')
-        if not review_id_full:
-            print("WARNING: Review found without 'name' (ID). Skipping.")
-            skipped_count += 1
-            continue
-            
-        if review_id_full in processed_ids:
-            duplicate_count += 1
-            continue  # This is a duplicate, skip
-        processed_ids.add(review_id_full)
-
-        # 2b. Convert rating
-        rating_str = review.get('starRating')
-        rating_int = RATING_MAP.get(rating_str)  # Returns 'None' if rating does not exist
-
-        # 2c. Get reviewer name
-        reviewer_name = review.get('reviewer', {}).get('displayName')
-
-        # 2d. Filter: Skip reviews without rating or name
-        if not rating_int or not reviewer_name:
-            skipped_count += 1
-            continue
-
-        # 2e. Build the new, clean object
-        cleaned_review = {
-            "reviewId": review_id_full.split('/')[-1],  # A shorter, cleaner ID
-            "reviewerName": reviewer_name,
-            "rating": rating_int,
-            "createTime": review.get('createTime'),
-            "comment": review.get('comment'),  # Get review comment (if present)
-            "replyComment": review.get('reviewReply', {}).get('comment') # Get reply (if present)
-        }
-        
-        cleaned_reviews_list.append(cleaned_review)
-
-    # --- 3. Save the result ---
-    cleaned_data_output = {"reviews": cleaned_reviews_list}
-
-    try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_data_output, f, indent=2, ensure_ascii=False)
-        
-        print("\n--- Cleaning Completed ---")
-        print(f"Total {original_count} reviews processed.")
-        print(f"  {duplicate_count} duplicates removed.")
-        print(f"  {skipped_count} reviews skipped (missing rating or name).")
-        print(f"**{len(cleaned_reviews_list)} clean reviews** saved in '{OUTPUT_FILE}'.")
-
-    except Exception as e:
-        print(f"\nERROR: Could not write clean file '{OUTPUT_FILE}': {e}")
-
-if __name__ == "__main__":
+import hashlib
+import itertools
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from pipeline_config import (REVIEWS_FILE, STREAM_REVIEWS_FILE, CLEANED_FILE, COMMENT_SIGNATURES_FILE,
+                             ensure_parent_dir, atomic_output)
+from stage_metrics import set_rows, input_started
+from near_duplicates import (NearDuplicateIndex, MinHasher, HASH_BATCH_SIZE, canonical_key, choose_canonicals,
+                             comment_signatures, encode_signature)
+
+INPUT_FILE = REVIEWS_FILE
+STREAM_INPUT_FILE = STREAM_REVIEWS_FILE
+OUTPUT_FILE = CLEANED_FILE
+SIGNATURES_FILE = COMMENT_SIGNATURES_FILE
+
+# Number of characters read from the export per step while streaming
+READ_CHUNK_SIZE = 1024 * 1024
+# Largest single value (one review) accepted while streaming; bounds the read buffer
+MAX_VALUE_SIZE = 64 * 1024 * 1024
+
+# 1. Mapping to convert string ratings to numbers
+RATING_MAP = {
+    "FIVE": 5,
+    "FOUR": 4,
+    "THREE": 3,
+    "TWO": 2,
+    "ONE": 1
+}
+
+# 'duplicateOf' holds the reviewId of the canonical copy for near-duplicate reviews (None otherwise)
+CLEAN_COLUMNS = ["reviewId", "locationId", "reviewerName", "rating", "createTime", "comment", "replyComment", "duplicateOf"]
+
+class _StreamBuffer:
+    """Small read buffer over a text file that lets the JSON decoder work on one value at a time."""
+
+    def __init__(self, f, chunk_size, max_value_size=MAX_VALUE_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.max_value_size = max_value_size
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads the next chunk; returns False at end of file."""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected '{char}' at character {self.pos}")
+        self.pos += 1
+
+    def decode(self, decoder):
+        """
+        Decodes one complete JSON value, reading more data as long as the value is incomplete.
+        Raises ValueError if the value is larger than 'max_value_size' characters.
+        """
+        self.peek()
+        chunk_size = self.chunk_size
+        try:
+            while True:
+                try:
+                    value, end = decoder.raw_decode(self.text, self.pos)
+                    # A number at the very end of the buffer may still continue in the next chunk
+                    if end < len(self.text) or self.eof:
+                        self.pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if self.eof:
+                        raise
+                if len(self.text) - self.pos >= self.max_value_size:
+                    raise ValueError(f"a single value at character {self.pos} is larger than "
+                                     f"{self.max_value_size} characters")
+                # Grow the read size while this value is incomplete, so very large values do not
+                # cause quadratic re-parsing; the buffer never holds more than about one value
+                if self.fill():
+                    self.chunk_size = min(self.chunk_size * 2, self.max_value_size)
+        finally:
+            # The next value starts again with the normal read size
+            self.chunk_size = chunk_size
+
+def iter_reviews(path=INPUT_FILE, chunk_size=READ_CHUNK_SIZE):
+    """
+    Streams the elements of the top-level 'reviews' list of an export one by one,
+    without loading the whole file. Raises ValueError if the structure is unexpected.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = _StreamBuffer(f, chunk_size)
+        buf.expect('{')
+        while buf.peek() != '}':
+            key = buf.decode(decoder)
+            buf.expect(':')
+            if key != 'reviews':
+                buf.decode(decoder)  # Other top-level keys are small metadata, skip them
+            else:
+                buf.expect('[')
+                while buf.peek() != ']':
+                    if buf.peek() == '':
+                        raise ValueError("unexpected end of file inside the 'reviews' list")
+                    yield buf.decode(decoder)
+                    if buf.peek() == ',':
+                        buf.pos += 1
+                buf.pos += 1
+                return
+            if buf.peek() == ',':
+                buf.pos += 1
+            elif buf.peek() == '':
+                break
+        raise ValueError("no 'reviews' list found")
+
+def location_id(review_name):
+    """Extracts the location ID from 'accounts/<id>/locations/<id>/reviews/<id>' (None if absent)."""
+    parts = review_name.split('/')
+    if 'locations' in parts[:-1]:
+        return parts[parts.index('locations') + 1]
+    return None
+
+def iter_clean_reviews(raw_reviews, stats):
+    """
+    Cleans a stream of raw reviews and yields one clean record per unique, complete review.
+    Counts are kept in the 'stats' dict ('total', 'duplicates', 'skipped').
+    """
+    # Only a 16-byte digest of each seen ID is kept instead of the full name. This
+    # is still O(N): about 85 bytes per review in the set, so ~85 MB for 1M reviews.
+    # That is deliberate. The next stages load the cleaned reviews into a DataFrame,
+    # which costs far more per review, and an on-disk set would make every lookup I/O.
+    processed_ids = set()  # Set to track duplicates
+    stats.update(total=0, duplicates=0, skipped=0)
+
+    for review in raw_reviews:
+        stats['total'] += 1
+
+        # 2a. Check for duplicates
+        review_id_full = review.get('name')
+        if not review_id_full:
+            print("WARNING: Review found without 'name' (ID). Skipping.")
+            stats['skipped'] += 1
+            continue
+
+        id_digest = hashlib.blake2b(review_id_full.encode('utf-8'), digest_size=16).digest()
+        if id_digest in processed_ids:
+            stats['duplicates'] += 1
+            continue  # This is a duplicate, skip
+        processed_ids.add(id_digest)
+
+        # 2b. Convert rating
+        rating_str = review.get('starRating')
+        rating_int = RATING_MAP.get(rating_str)  # Returns 'None' if rating does not exist
+
+        # 2c. Get reviewer name
+        reviewer_name = review.get('reviewer', {}).get('displayName')
+
+        # 2d. Filter: Skip reviews without rating or name
+        if not rating_int or not reviewer_name:
+            stats['skipped'] += 1
+            continue
+
+        # 2e. Build the new, clean object
+        yield {
+            "reviewId": review_id_full.split('/')[-1],  # A shorter, cleaner ID
+            "locationId": location_id(review_id_full),  # Park/location the review belongs to
+            "reviewerName": reviewer_name,
+            "rating": rating_int,
+            "createTime": review.get('createTime'),
+            "comment": review.get('comment'),  # Get review comment (if present)
+            "replyComment": review.get('reviewReply', {}).get('comment'), # Get reply (if present)
+            "duplicateOf": None  # Filled in by mark_near_duplicates
+        }
+
+def iter_indexed(records, index):
+    """Passes the records through while adding their comments to a NearDuplicateIndex (by row number)."""
+    for position, record in enumerate(records):
+        index.add(position, record['comment'])
+        yield record
+
+def near_duplicate_ids(index, records, stats):
+    """
+    Clusters the indexed comments. Returns {row: reviewId of the canonical copy}
+    for every near duplicate and counts them in 'stats' ('near_duplicates').
+    'records' is a new pass over the indexed records; it is only read when there
+    are clusters, and only their createTime and reviewId are kept.
+    The canonical copy is the oldest review of a cluster (see near_duplicates.py).
+    """
+    clusters = index.clusters()
+    keys, review_ids = {}, {}
+    if clusters:
+        for row, record in enumerate(records):
+            if row in clusters:
+                keys[row] = canonical_key(record['createTime'], record['reviewId'])
+                review_ids[row] = record['reviewId']
+    canonicals = choose_canonicals(clusters, keys)
+    stats['near_duplicates'] = len(canonicals)
+    return {row: review_ids[canonical] for row, canonical in canonicals.items()}
+
+def print_stats(stats):
+    print("\n--- Cleaning Completed ---")
+    print(f"Total {stats['total']} reviews processed.")
+    print(f"  {stats['duplicates']} duplicates removed.")
+    print(f"  {stats['skipped']} reviews skipped (missing rating or name).")
+    if 'near_duplicates' in stats:
+        print(f"  {stats['near_duplicates']} near-duplicate reviews marked (same or nearly the same text as an older review).")
+
+def clean_reviews(raw_reviews):
+    """
+    Cleans an iterable of raw reviews (as found in the export's 'reviews' list).
+    Returns a DataFrame with one row per unique, complete review.
+    """
+    stats = {}
+    index = NearDuplicateIndex()
+    df = pd.DataFrame(list(iter_indexed(iter_clean_reviews(raw_reviews, stats), index)), columns=CLEAN_COLUMNS)
+    duplicate_of = near_duplicate_ids(index, df[['reviewId', 'createTime']].to_dict('records'), stats)
+    df['duplicateOf'] = [duplicate_of.get(row) for row in range(len(df))]
+    print_stats(stats)
+    set_rows(rows_in=stats['total'], rows_out=len(df))
+    return df
+
+def _write_lines(records, path, mode):
+    count = 0
+    with open(path, mode, encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+def write_jsonl(records, path, mode='w'):
+    """
+    Writes records as JSON Lines (one object per line); returns the number of records.
+    Mode 'w' replaces the file only when all records are written, mode 'a' appends.
+    """
+    if mode == 'a':
+        ensure_parent_dir(path)
+        return _write_lines(records, path, mode)
+    with atomic_output(path) as tmp_path:
+        return _write_lines(records, tmp_path, mode)
+
+def read_jsonl(path):
+    """Streams the objects of a JSON Lines file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_cleaned(path=OUTPUT_FILE):
+    """Streams the clean records from a JSON Lines file."""
+    return read_jsonl(path)
+
+def save_cleaned(df, path=OUTPUT_FILE):
+    """Writes cleaned reviews to the JSON Lines file read by 'analyse_sentiment.py'."""
+    write_jsonl(df.replace({np.nan: None}).to_dict('records'), path)
+
+def iter_signature_records(records):
+    """
+    Streams {reviewId, createTime, signature} for the canonical records (no
+    duplicateOf) whose comment is long enough for the near-duplicate check.
+    The signature is the MinHash of the original comment (see near_duplicates.py).
+    """
+    hasher = MinHasher()
+    # Records may come from a DataFrame, where missing values can be NaN
+    canonical = (r for r in records if not isinstance(r.get('duplicateOf'), str) and isinstance(r.get('comment'), str))
+    while True:
+        batch = list(itertools.islice(canonical, HASH_BATCH_SIZE))
+        if not batch:
+            return
+        positions, signatures = comment_signatures([r['comment'] for r in batch], hasher)
+        for position, signature in zip(positions, signatures):
+            record = batch[position]
+            yield {"reviewId": record['reviewId'], "createTime": record.get('createTime'),
+                   "signature": encode_signature(signature)}
+
+def save_signatures(records, path=SIGNATURES_FILE, mode='w'):
+    """
+    Writes the comment signatures of the canonical records as JSON Lines, so the
+    scoring service can match new reviews against the stored ones. Mode 'a' appends.
+    """
+    return write_jsonl(iter_signature_records(records), path, mode)
+
+def load_raw_reviews(path=INPUT_FILE, stream_path=STREAM_INPUT_FILE):
+    """
+    Returns a lazy stream over the raw reviews of an export file, followed by
+    the reviews received by the scoring service (if any).
+    Returns None (after printing the reason) if the export is missing.
+    """
+    if not os.path.exists(path):
+        print(f"ERROR: File '{path}' not found.")
+        print("Please run 'combined_reviews.py' first.")
+        return None
+
+    if stream_path and os.path.exists(stream_path):
+        # Reviews that are also in a newer export are dropped as duplicates (same ID)
+        return itertools.chain(iter_reviews(path), read_jsonl(stream_path))
+    return iter_reviews(path)
+
+def clean_review_data():
+    """
+    Streams the combined JSON file, cleans the data
+    and writes the result as JSON Lines, so memory use stays bounded.
+    """
+
+    # --- 1. Open the file as a stream ---
+    input_started()
+    raw_reviews = load_raw_reviews()
+    if raw_reviews is None:
+        sys.exit(1)
+
+    print(f"Starting cleaning process... streaming reviews from '{INPUT_FILE}'.")
+
+    # --- 2. Clean and save record by record ---
+    # The MinHash signatures of the comments are spilled to temporary files for the near-duplicate check
+    # The clean file only replaces the previous one once all passes succeeded
+    stats = {}
+    index = NearDuplicateIndex()
+    with atomic_output(OUTPUT_FILE) as tmp_path:
+        try:
+            clean_count = write_jsonl(iter_indexed(iter_clean_reviews(raw_reviews, stats), index), tmp_path)
+        except (json.JSONDecodeError, ValueError) as e:
+            print(f"ERROR: Could not read JSON from '{INPUT_FILE}' ({e}). Is the file corrupt?")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\nERROR: Could not write clean file '{OUTPUT_FILE}': {e}")
+            sys.exit(1)
+
+        # --- 3. Mark near duplicates (streaming passes over the clean file) ---
+        duplicate_of = near_duplicate_ids(index, read_cleaned(tmp_path), stats)
+        if duplicate_of:
+            write_jsonl((dict(r, duplicateOf=duplicate_of.get(row)) for row, r in enumerate(read_cleaned(tmp_path))), tmp_path)
+
+        # --- 4. Signatures of the canonical comments (for the scoring service) ---
+        save_signatures(read_cleaned(tmp_path))
+
+    print_stats(stats)
+    set_rows(rows_in=stats['total'], rows_out=clean_count)
+    print(f"**{clean_count} clean reviews** saved in '{OUTPUT_FILE}'.")
+
+if __name__ == "__main__":
     clean_review_data()
\ No newline at end of file
@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+# Een kolomopslag is een map met per kolom één ongecomprimeerd Arrow IPC-bestand
+# plus een klein schema-bestand. Daardoor kan een kolom worden toegevoegd zonder
+# de rest te herschrijven, en kan de dashboard de bestanden memory-mapped openen.
+SCHEMA_FILE = '_schema.json'
+
+# Tekstkolommen met relatief weinig unieke waarden (topicnaam, sentimentlabel,
+# periode) worden dictionary-encoded opgeslagen.
+DICTIONARY_MAX_UNIQUE_RATIO = 0.5
+
+
+def column_file(store_path, column):
+    """Pad van het bestand waarin een kolom van de opslag staat."""
+    return os.path.join(store_path, f"{column}.arrow")
+
+
+def _read_schema(store_path):
+    with open(os.path.join(store_path, SCHEMA_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_schema(store_path, schema):
+    tmp_path = os.path.join(store_path, SCHEMA_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, os.path.join(store_path, SCHEMA_FILE))
+
+
+def _to_arrow(values):
+    """Zet een pandas-kolom om naar een Arrow-array; tekst met weinig unieke waarden wordt dictionary-encoded."""
+    array = pa.array(values, from_pandas=True)
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        n_values = len(array) - array.null_count
+        n_unique = len(array.drop_null().unique())
+        if n_values and n_unique / n_values <= DICTIONARY_MAX_UNIQUE_RATIO:
+            array = array.dictionary_encode()
+    return array
+
+
+def _write_column(store_path, name, array):
+    path = column_file(store_path, name)
+    tmp_path = path + '.tmp'
+    table = pa.Table.from_arrays([array], names=[name])
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def store_exists(store_path):
+    return os.path.exists(os.path.join(store_path, SCHEMA_FILE))
+
+
+def replace_directory(tmp_path, path):
+    """
+    Vervangt de map 'path' door de volledig geschreven map 'tmp_path'. De oude
+    map gaat eerst opzij ('.old'), zodat 'path' alleen tussen twee renames
+    ontbreekt en nooit half geschreven is.
+    """
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def write_table(df, store_path):
+    """
+    Schrijft een volledige DataFrame als kolomopslag; een bestaande opslag wordt
+    vervangen. De kolommen worden eerst in een tijdelijke map geschreven.
+    """
+    tmp_path = store_path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    for name in df.columns:
+        _write_column(tmp_path, name, _to_arrow(df[name]))
+    _write_schema(tmp_path, {'num_rows': len(df), 'columns': [str(c) for c in df.columns]})
+    replace_directory(tmp_path, store_path)
+
+
+def add_column(store_path, name, values):
+    """Voegt een kolom toe (of vervangt hem) zonder de overige kolommen te herschrijven."""
+    schema = _read_schema(store_path)
+    if len(values) != schema['num_rows']:
+        raise ValueError(f"Kolom '{name}' heeft {len(values)} rijen, opslag heeft er {schema['num_rows']}.")
+
+    _write_column(store_path, name, _to_arrow(values))
+    if name not in schema['columns']:
+        schema['columns'].append(name)
+    _write_schema(store_path, schema)
+
+
+def read_arrow(store_path, columns=None):
+    """Opent (een deel van) de kolommen memory-mapped en geeft een Arrow Table terug."""
+    schema = _read_schema(store_path)
+    names = schema['columns'] if columns is None else [c for c in columns if c in schema['columns']]
+
+    arrays = []
+    for name in names:
+        source = pa.memory_map(column_file(store_path, name), 'r')
+        arrays.append(ipc.open_file(source).read_all().column(0))
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def read_table(store_path, columns=None):
+    """Leest (een deel van) de kolommen als pandas DataFrame; dictionary-kolommen worden categoricals."""
+    return read_arrow(store_path, columns).to_pandas()
\ No newline at end of file
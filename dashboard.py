@@ -1,207 +1,364 @@
-import streamlit as st
-import pandas as pd
-import json
-import os
-import plotly.express as px
-from wordcloud import WordCloud, STOPWORDS
-import matplotlib.pyplot as plt
-
-# --- CONFIGURATION ---
-st.set_page_config(page_title="TerSpegelt Management Dashboard", layout="wide")
-
-st.title("📊 TerSpegelt Actionable Insights Dashboard")
-st.markdown("Combined analysis of reviews, weather, and holiday periods (2017 - present).")
-
-# --- LOAD DATA ---
-@st.cache_data
-def load_data():
-    file_path = 'final_data_for_powerbi.json'
-    if not os.path.exists(file_path):
-        return None
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Data is stored under the 'reviews' key
-    df = pd.DataFrame(data['reviews'])
-    
-    if 'createTime' in df.columns:
-        df['createTime'] = pd.to_datetime(df['createTime'])
-        df['date_only'] = df['createTime'].dt.date
-        df['year'] = df['createTime'].dt.year
-    return df
-
-df = load_data()
-
-if df is not None:
-    # --- TRANSLATE DATA VALUES ---
-    if 'periode_type' in df.columns:
-        df['periode_type'] = df['periode_type'].replace({
-            'Buiten vakantie': 'Off-season',
-            'Vakantie': 'Holiday'
-        })
-
-    # --- CLEANING ---
-    df = df[df['topic_nr'] != -1]
-
-    # --- SIDEBAR: FILTERS ---
-    st.sidebar.header("Dashboard Filters")
-    
-    years = sorted(df['year'].unique().tolist(), reverse=True)
-    selected_years = st.sidebar.multiselect("Select Years", years, default=years[:2])
-
-    periods = df['periode_type'].unique().tolist() if 'periode_type' in df.columns else []
-    selected_periods = st.sidebar.multiselect("Select Holiday/Period", periods, default=periods)
-
-    top_n = st.sidebar.slider("Number of top topics", 5, 20, 10)
-    temp_df = df[df['year'].isin(selected_years)]
-    top_topics = temp_df['Name'].value_counts().nlargest(top_n).index.tolist()
-    selected_topics = st.sidebar.multiselect("Select Topics", sorted(df['Name'].unique()), default=top_topics)
-
-    # --- APPLY FILTERS ---
-    mask = (df['year'].isin(selected_years)) & (df['Name'].isin(selected_topics))
-    if 'periode_type' in df.columns:
-        mask &= (df['periode_type'].isin(selected_periods))
-    
-    df_filtered = df[mask].copy()
-
-    # --- METRICS ---
-    st.subheader(f"Status Overview ({', '.join(map(str, selected_years))})")
-    m1, m2, m3, m4 = st.columns(4)
-    with m1:
-        st.metric("Number of sentences", len(df_filtered))
-    with m2:
-        neg_count = len(df_filtered[df_filtered['sentiment_label'] == 'Negative'])
-        st.metric("Negative feedback", neg_count, delta_color="inverse")
-    with m3:
-        avg_score = df_filtered['sentiment_score'].mean()
-        st.metric("Avg. Satisfaction", f"{avg_score:.2f}")
-    with m4:
-        if 'temp_max_c' in df_filtered.columns:
-            st.metric("Avg. Max Temp", f"{df_filtered['temp_max_c'].mean():.1f}°C")
-
-    # --- HOLIDAY & SENTIMENT ANALYSIS ---
-    st.markdown("---")
-    c1, c2 = st.columns([2, 1])
-
-    with c1:
-        st.subheader("Sentiment per Topic")
-        sent_per_topic = df_filtered.groupby(['Name', 'sentiment_label']).size().reset_index(name='Count')
-        fig_sent_topic = px.bar(sent_per_topic, x='Count', y='Name', color='sentiment_label', 
-                                orientation='h', barmode='stack',
-                                color_discrete_map={'Positive': '#2ecc71', 'Neutral': '#f1c40f', 'Negative': '#e74c3c'})
-        st.plotly_chart(fig_sent_topic, use_container_width=True)
-
-    with c2:
-        st.subheader("Holiday vs. Off-season")
-        if 'periode_type' in df_filtered.columns:
-            period_dist = df_filtered.groupby(['periode_type', 'sentiment_label']).size().reset_index(name='n')
-            fig_period = px.bar(period_dist, x='periode_type', y='n', color='sentiment_label', 
-                                barmode='group', color_discrete_map={'Positive': '#2ecc71', 'Neutral': '#f1c40f', 'Negative': '#e74c3c'})
-            st.plotly_chart(fig_period, use_container_width=True)
-
-    # --- WEATHER IMPACT ---
-    st.markdown("---")
-    st.subheader("🌤️ Weather Impact")
-    w1, w2 = st.columns(2)
-
-    with w1:
-        st.markdown("**Rain intensity vs. Satisfaction**")
-        if 'precip_amount_mm' in df_filtered.columns:
-            df_rain = df_filtered[df_filtered['precip_amount_mm'] > 0]
-            if not df_rain.empty:
-                fig_rain = px.scatter(df_rain, x='precip_amount_mm', y='sentiment_score', 
-                                      trendline="ols", labels={'precip_amount_mm': 'Precipitation (mm)'})
-                st.plotly_chart(fig_rain, use_container_width=True)
-            else:
-                st.info("No rainy days in this selection.")
-
-    with w2:
-        st.markdown("**Temperature vs. Satisfaction**")
-        if 'temp_max_c' in df_filtered.columns:
-            temp_trend = df_filtered.groupby('date_only').agg({'temp_max_c': 'first', 'sentiment_score': 'mean'}).reset_index()
-            fig_temp = px.scatter(temp_trend, x='temp_max_c', y='sentiment_score', trendline="ols",
-                                  labels={'temp_max_c': 'Max Temp (°C)'})
-            st.plotly_chart(fig_temp, use_container_width=True)
-
-    # --- DEEP DIVE SECTION ---
-    st.markdown("---")
-    st.header("🔍 Deep Dive: Literal Reviews")
-    
-    # Wordcloud and Table logic for Negative feedback (Improvement Areas)
-    st.subheader("🔴 Improvement Areas (Negative Feedback Focus)")
-    df_neg = df_filtered[df_filtered['sentiment_label'] == 'Negative']
-
-    if not df_neg.empty:
-        d1, d2 = st.columns([1, 1])
-        with d1:
-            st.markdown("**Common themes in negative reviews**")
-            custom_stopwords = set(STOPWORDS)
-            custom_stopwords.update([
-                "the", "in", "fur", "and", "sehr", "wir", "für", "mit", "und", "die", "een", "ist",
-                "google", "translated", "by", "original", "review", "zo'n", "beetje",
-                "de", "het", "en", "is", "dat", "op", "met", "voor", "niet", "ook", "om", "als", "dan", "te", "zijn",
-                "was", "we", "er", "maar", "ik", "je", "deze", "die", "dit", "aan", "bij", "door", "naar", "over",
-                "der", "das", "ein", "eine", "von", "zu", "was", "aber", "im", "dem", "nicht", "auch", "waren", "sind"
-            ])
-            text = " ".join(df_neg['zin_tekst'].astype(str))
-            wordcloud = WordCloud(width=800, height=400, background_color='white', 
-                                  colormap='Reds', stopwords=custom_stopwords, collocations=False).generate(text)
-            fig_wc, ax = plt.subplots()
-            ax.imshow(wordcloud, interpolation='bilinear')
-            ax.axis("off")
-            st.pyplot(fig_wc)
-
-        with d2:
-            st.markdown("**Top 5 Complaint Topics**")
-            neg_topics = df_neg['Name'].value_counts().reset_index()
-            neg_topics.columns = ['Topic', 'Count']
-            st.table(neg_topics.head(5))
-    else:
-        st.success("No negative feedback found for this selection! 🎉")
-
-    # --- NEW: FILTERABLE REVIEW TABLE ---
-    st.markdown("---")
-    st.subheader("📖 Read Literal Reviews")
-    
-    # Filters for the table
-    col_sent, col_topic = st.columns(2)
-    
-    with col_sent:
-        selected_sentiment = st.selectbox(
-            "Filter by Sentiment:", 
-            options=["All", "Positive", "Neutral", "Negative"],
-            index=3  # Default to Negative as it was the original focus
-        )
-        
-    with col_topic:
-        # Get list of topics available for the selected sentiment to keep the filter relevant
-        if selected_sentiment == "All":
-            topic_options = sorted(df_filtered['Name'].unique().tolist())
-        else:
-            topic_options = sorted(df_filtered[df_filtered['sentiment_label'] == selected_sentiment]['Name'].unique().tolist())
-        
-        selected_review_topic = st.selectbox("Filter by Topic:", options=["All"] + topic_options)
-
-    # Apply table filters
-    df_table = df_filtered.copy()
-    if selected_sentiment != "All":
-        df_table = df_table[df_table['sentiment_label'] == selected_sentiment]
-    if selected_review_topic != "All":
-        df_table = df_table[df_table['Name'] == selected_review_topic]
-
-    # Display the table
-    if not df_table.empty:
-        st.table(df_table[['Name', 'sentiment_label', 'zin_tekst', 'createTime']].rename(
-            columns={
-                'Name': 'Topic', 
-                'sentiment_label': 'Sentiment',
-                'zin_tekst': 'Review Text', 
-                'createTime': 'Date'
-            }
-        ).sort_values(by='Date', ascending=False).head(20))
-    else:
-        st.info("No reviews match the selected filters.")
-
-else:
+import streamlit as st
+import pandas as pd
+import io
+import json
+import numpy as np
+import os
+import plotly.express as px
+from wordcloud import WordCloud
+from columnar_store import store_exists, read_table
+from dataset_store import dataset_exists, dataset_years, read_dataset, manifest_path
+from pipeline_config import FINAL_STORE, FINAL_FILE, CUBE_STORE
+from analytics_cube import build_cube
+from term_index import build_term_matrix, load_segment_terms, term_frequencies
+
+# --- CONFIGURATION ---
+st.set_page_config(page_title="TerSpegelt Management Dashboard", layout="wide")
+
+st.title("📊 TerSpegelt Actionable Insights Dashboard")
+st.markdown("Combined analysis of reviews, weather, and holiday periods (2017 - present).")
+
+# --- LOAD DATA ---
+# Filter columns are held as categoricals, so masks are built from integer codes
+CATEGORY_COLUMNS = ['year', 'Name', 'sentiment_label', 'periode_type']
+# Number of distinct filter selections whose row positions are kept in memory
+FILTER_CACHE_ENTRIES = 256
+# Page sizes offered for the review table
+PAGE_SIZES = [20, 50, 100]
+
+def translate_periods(frame):
+    period_labels = {
+        'Buiten vakantie': 'Off-season',
+        'Vakantie': 'Holiday',
+        'Onbekend': 'Unknown'
+    }
+    # Text columns from the columnar store arrive as categoricals
+    if isinstance(frame['periode_type'].dtype, pd.CategoricalDtype):
+        frame['periode_type'] = frame['periode_type'].cat.rename_categories(lambda c: period_labels.get(c, c))
+    else:
+        frame['periode_type'] = frame['periode_type'].replace(period_labels)
+
+def prepare_columns(df):
+    # Date columns, English period labels and categoricals; done once per loaded frame
+    if 'createTime' in df.columns:
+        df['createTime'] = pd.to_datetime(df['createTime'], format='ISO8601')
+        df['date_only'] = df['createTime'].dt.date
+        df['year'] = df['createTime'].dt.year
+
+    # --- TRANSLATE DATA VALUES ---
+    if 'periode_type' in df.columns:
+        translate_periods(df)
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+@st.cache_resource
+def load_export():
+    # Fallback when there is no partitioned store: the full JSON export, read once
+    with open(FINAL_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Data is stored under the 'reviews' key
+    return prepare_columns(pd.DataFrame(data['reviews']))
+
+def available_years():
+    # The store's manifest lists its year/month partitions, so no rows are read here
+    if dataset_exists(FINAL_STORE):
+        return dataset_years(FINAL_STORE)
+    if os.path.exists(FINAL_FILE):
+        return sorted(load_export()['year'].dropna().astype(int).unique().tolist())
+    return None
+
+# cache_resource shares one read-only frame between reruns and sessions instead of
+# handing every rerun its own copy; nothing below may modify it in place.
+# One frame is cached per selection of years; the years also key every cache below.
+@st.cache_resource
+def load_data(years):
+    # Prefer the partitioned store: only the partitions of the selected years are read
+    # (memory-mapped Arrow files); the JSON export is a fallback
+    segments = None
+    if dataset_exists(FINAL_STORE):
+        df = prepare_columns(read_dataset(FINAL_STORE, years=years))
+        segments = df.attrs['segments']
+    elif os.path.exists(FINAL_FILE):
+        # The cached export is shared, so it is only selected from, never changed
+        df = load_export()
+        if 'year' in df.columns:
+            df = df[df['year'].isin(years)]
+    else:
+        return None
+
+    # --- CLEANING ---
+    # The index keeps the row number in the store, which is also the row of the term matrix
+    df = df[df['topic_nr'] != -1]
+    # Near-duplicate reviews (re-posts and copies, see near_duplicates.py) count once, like in the cube
+    if 'duplicateOf' in df.columns:
+        df = df[df['duplicateOf'].isna()]
+
+    # Rows are kept sorted by date (the pipeline writes them that way), so every
+    # selection of row positions is in date order and the table never has to sort
+    if 'createTime' in df.columns and not df['createTime'].is_monotonic_increasing:
+        df = df.sort_values('createTime', kind='stable')
+
+    # The segments that were read, in row order (their word counts are stacked the same way)
+    df.attrs['segments'] = segments
+    return df
+
+@st.cache_resource
+def load_cube(_df, years):
+    # The pipeline writes a pre-aggregated cube; build it from the rows if it is missing
+    cube = read_table(CUBE_STORE) if store_exists(CUBE_STORE) else build_cube(_df)
+    translate_periods(cube)
+    return cube[cube['topic_nr'] != -1]
+
+@st.cache_resource
+def value_bitmaps(_df, years, column):
+    # One packed bitmap (1 bit per sentence) per value of a categorical column
+    codes = _df[column].cat.codes.to_numpy()
+    return {value: np.packbits(codes == i) for i, value in enumerate(_df[column].cat.categories)}
+
+def selection_bitmap(df, years, column, values):
+    bitmaps = value_bitmaps(df, years, column)
+    selected = [bitmaps[v] for v in values if v in bitmaps]
+    if not selected:
+        return np.zeros((len(df) + 7) // 8, dtype=np.uint8)
+    return np.bitwise_or.reduce(selected)
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES)
+def filter_rows(_df, years, topics, periods):
+    # Row positions matching the sidebar filters, cached per selection
+    bits = selection_bitmap(_df, years, 'Name', topics)
+    if 'periode_type' in _df.columns:
+        bits &= selection_bitmap(_df, years, 'periode_type', periods)
+    return np.flatnonzero(np.unpackbits(bits, count=len(_df)))
+
+@st.cache_resource
+def load_terms(_df, years):
+    # Per-segment word counts written by the pipeline, stacked in the order the segments
+    # were read; the index of df is the row number in that stack
+    if _df.attrs.get('segments') is not None:
+        terms = load_segment_terms(_df.attrs['segments'])
+        if terms is not None:
+            matrix, vocab = terms
+            return matrix[_df.index.to_numpy()], vocab
+    return build_term_matrix(_df['zin_tekst'])
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES)
+def render_negative_wordcloud(_df, years, topics, periods):
+    # PNG of the negative-feedback word cloud, cached per filter selection
+    rows = filter_rows(_df, years, topics, periods)
+    neg_rows = rows[(_df['sentiment_label'].iloc[rows] == 'Negative').to_numpy()]
+    matrix, vocab = load_terms(_df, years)
+    frequencies = term_frequencies(matrix, vocab, neg_rows)
+    if not frequencies:
+        return None
+    wordcloud = WordCloud(width=800, height=400, background_color='white',
+                          colormap='Reds', collocations=False).generate_from_frequencies(frequencies)
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def data_version():
+    # The manifest changes whenever the store is rewritten by the pipeline or extended by scoring_service.py
+    path = manifest_path(FINAL_STORE)
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else None
+
+@st.cache_resource
+def loaded_version():
+    return {}
+
+# New rows appear on the next rerun: when the store changed, every cached frame,
+# bitmap and word cloud is dropped (they all depend on the row order of df)
+version = data_version()
+seen = loaded_version()
+if seen.get('version', version) != version:
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    seen = loaded_version()
+seen['version'] = version
+
+years = available_years()
+
+if years is not None:
+    # --- SIDEBAR: FILTERS ---
+    st.sidebar.header("Dashboard Filters")
+
+    # Only the sentences of the selected years are loaded; the default view is the two most recent years
+    years = sorted(years, reverse=True)
+    selected_years = st.sidebar.multiselect("Select Years", years, default=years[:2])
+    if not selected_years:
+        st.info("Select at least one year.")
+        st.stop()
+    df = load_data(tuple(sorted(selected_years)))
+    # Filter options and aggregates come from the cube (a few thousand cells), not the sentences
+    cube = load_cube(df, tuple(sorted(selected_years)))
+
+    periods = cube['periode_type'].unique().tolist() if 'periode_type' in df.columns else []
+    selected_periods = st.sidebar.multiselect("Select Holiday/Period", periods, default=periods)
+
+    top_n = st.sidebar.slider("Number of top topics", 5, 20, 10)
+    temp_cube = cube[cube['year'].isin(selected_years)]
+    top_topics = temp_cube.groupby('Name', observed=True)['n'].sum().nlargest(top_n).index.tolist()
+    selected_topics = st.sidebar.multiselect("Select Topics", sorted(cube['Name'].unique()), default=top_topics)
+
+    # --- APPLY FILTERS ---
+    # Selections are passed sorted so the same filters always hit the same cache entry
+    selection = (tuple(sorted(selected_years)), tuple(sorted(selected_topics)), tuple(sorted(selected_periods)))
+    rows = filter_rows(df, *selection)
+
+    def filtered(*columns):
+        # Only the columns a chart needs are taken at the selected row positions
+        return df.iloc[rows, df.columns.get_indexer(columns)]
+
+    cube_mask = (cube['year'].isin(selected_years)) & (cube['Name'].isin(selected_topics))
+    if 'periode_type' in df.columns:
+        cube_mask &= (cube['periode_type'].isin(selected_periods))
+    cube_filtered = cube[cube_mask]
+
+    # --- METRICS ---
+    st.subheader(f"Status Overview ({', '.join(map(str, selected_years))})")
+    m1, m2, m3, m4 = st.columns(4)
+    with m1:
+        st.metric("Number of sentences", int(cube_filtered['n'].sum()))
+    with m2:
+        neg_count = int(cube_filtered.loc[cube_filtered['sentiment_label'] == 'Negative', 'n'].sum())
+        st.metric("Negative feedback", neg_count, delta_color="inverse")
+    with m3:
+        avg_score = cube_filtered['score_sum'].sum() / cube_filtered['n'].sum()
+        st.metric("Avg. Satisfaction", f"{avg_score:.2f}")
+    with m4:
+        if 'temp_max_c_sum' in cube_filtered.columns:
+            avg_temp = cube_filtered['temp_max_c_sum'].sum() / cube_filtered['temp_max_c_n'].sum()
+            st.metric("Avg. Max Temp", f"{avg_temp:.1f}°C")
+
+    # --- HOLIDAY & SENTIMENT ANALYSIS ---
+    st.markdown("---")
+    c1, c2 = st.columns([2, 1])
+
+    with c1:
+        st.subheader("Sentiment per Topic")
+        sent_per_topic = cube_filtered.groupby(['Name', 'sentiment_label'], observed=True)['n'].sum().reset_index(name='Count')
+        fig_sent_topic = px.bar(sent_per_topic, x='Count', y='Name', color='sentiment_label', 
+                                orientation='h', barmode='stack',
+                                color_discrete_map={'Positive': '#2ecc71', 'Neutral': '#f1c40f', 'Negative': '#e74c3c'})
+        st.plotly_chart(fig_sent_topic, use_container_width=True)
+
+    with c2:
+        st.subheader("Holiday vs. Off-season")
+        if 'periode_type' in df.columns:
+            period_dist = cube_filtered.groupby(['periode_type', 'sentiment_label'], observed=True)['n'].sum().reset_index(name='n')
+            fig_period = px.bar(period_dist, x='periode_type', y='n', color='sentiment_label', 
+                                barmode='group', color_discrete_map={'Positive': '#2ecc71', 'Neutral': '#f1c40f', 'Negative': '#e74c3c'})
+            st.plotly_chart(fig_period, use_container_width=True)
+
+    # --- WEATHER IMPACT ---
+    st.markdown("---")
+    st.subheader("🌤️ Weather Impact")
+    w1, w2 = st.columns(2)
+
+    with w1:
+        st.markdown("**Rain intensity vs. Satisfaction**")
+        if 'precip_amount_mm' in df.columns:
+            df_rain = filtered('precip_amount_mm', 'sentiment_score')
+            df_rain = df_rain[df_rain['precip_amount_mm'] > 0]
+            if not df_rain.empty:
+                fig_rain = px.scatter(df_rain, x='precip_amount_mm', y='sentiment_score', 
+                                      trendline="ols", labels={'precip_amount_mm': 'Precipitation (mm)'})
+                st.plotly_chart(fig_rain, use_container_width=True)
+            else:
+                st.info("No rainy days in this selection.")
+
+    with w2:
+        st.markdown("**Temperature vs. Satisfaction**")
+        if 'temp_max_c' in df.columns:
+            temp_trend = filtered('date_only', 'temp_max_c', 'sentiment_score').groupby('date_only').agg({'temp_max_c': 'first', 'sentiment_score': 'mean'}).reset_index()
+            fig_temp = px.scatter(temp_trend, x='temp_max_c', y='sentiment_score', trendline="ols",
+                                  labels={'temp_max_c': 'Max Temp (°C)'})
+            st.plotly_chart(fig_temp, use_container_width=True)
+
+    # --- DEEP DIVE SECTION ---
+    st.markdown("---")
+    st.header("🔍 Deep Dive: Literal Reviews")
+    
+    # Wordcloud and Table logic for Negative feedback (Improvement Areas)
+    st.subheader("🔴 Improvement Areas (Negative Feedback Focus)")
+    # The cube already counted the negative sentences of this selection
+    if neg_count:
+        d1, d2 = st.columns([1, 1])
+        with d1:
+            st.markdown("**Common themes in negative reviews**")
+            # Word counts (stopwords already removed) are precomputed per sentence in term_index.py
+            wordcloud_png = render_negative_wordcloud(df, *selection)
+            if wordcloud_png is not None:
+                st.image(wordcloud_png, use_container_width=True)
+            else:
+                st.info("No words left after removing stopwords.")
+
+        with d2:
+            st.markdown("**Top 5 Complaint Topics**")
+            cube_neg = cube_filtered[cube_filtered['sentiment_label'] == 'Negative']
+            neg_topics = cube_neg.groupby('Name', observed=True)['n'].sum().sort_values(ascending=False)
+            neg_topics = neg_topics[neg_topics > 0].reset_index()
+            neg_topics.columns = ['Topic', 'Count']
+            st.table(neg_topics.head(5))
+    else:
+        st.success("No negative feedback found for this selection! 🎉")
+
+    # --- NEW: FILTERABLE REVIEW TABLE ---
+    st.markdown("---")
+    st.subheader("📖 Read Literal Reviews")
+    
+    # Filters for the table
+    col_sent, col_topic = st.columns(2)
+    
+    with col_sent:
+        selected_sentiment = st.selectbox(
+            "Filter by Sentiment:", 
+            options=["All", "Positive", "Neutral", "Negative"],
+            index=3  # Default to Negative as it was the original focus
+        )
+        
+    with col_topic:
+        # Get list of topics available for the selected sentiment to keep the filter relevant
+        df_topics = filtered('Name', 'sentiment_label')
+        if selected_sentiment != "All":
+            df_topics = df_topics[df_topics['sentiment_label'] == selected_sentiment]
+        topic_options = sorted(df_topics['Name'].unique().tolist())
+        
+        selected_review_topic = st.selectbox("Filter by Topic:", options=["All"] + topic_options)
+
+    # Apply table filters on row positions; these are in date order, newest last
+    table_mask = np.ones(len(rows), dtype=bool)
+    if selected_sentiment != "All":
+        table_mask &= (df['sentiment_label'].iloc[rows] == selected_sentiment).to_numpy()
+    if selected_review_topic != "All":
+        table_mask &= (df['Name'].iloc[rows] == selected_review_topic).to_numpy()
+    table_rows = rows[table_mask][::-1]
+
+    # Display the table, one page at a time
+    if len(table_rows):
+        col_size, col_page = st.columns(2)
+        with col_size:
+            page_size = st.selectbox("Rows per page:", options=PAGE_SIZES)
+        n_pages = (len(table_rows) - 1) // page_size + 1
+        with col_page:
+            page = st.number_input(f"Page (of {n_pages}):", min_value=1, max_value=n_pages, value=1)
+
+        page_rows = table_rows[(page - 1) * page_size:page * page_size]
+        st.caption(f"Showing {len(page_rows)} of {len(table_rows)} matching sentences, newest first.")
+        # Only the rows of this page and the shown columns are taken from df
+        table_columns = ['Name', 'sentiment_label', 'zin_tekst', 'createTime']
+        st.table(df.iloc[page_rows, df.columns.get_indexer(table_columns)].rename(
+            columns={
+                'Name': 'Topic', 
+                'sentiment_label': 'Sentiment',
+                'zin_tekst': 'Review Text', 
+                'createTime': 'Date'
+            }
+        ))
+    else:
+        st.info("No reviews match the selected filters.")
+
+else:
     st.error("Data not found. Please ensure the full pipeline has been run.")
\ No newline at end of file
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from columnar_store import write_table, read_table, add_column
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# De eindopslag is gepartitioneerd op jaar/maand van 'createTime'. Elke partitie
+# bestaat uit één of meer segmenten; een segment is een gewone kolomopslag
+# (columnar_store.py) die na het schrijven niet meer verandert. Nieuwe rijen
+# komen in een nieuw segment, alleen in de partities waar ze in vallen.
+# Het manifest somt partities, segmenten, kolommen en aantallen op en wordt als
+# laatste (atomair) vervangen: een lezer ziet een toevoeging helemaal of niet.
+# Per partitie staat er ook een hash van de rijen in; een volledige run van de
+# pijplijn herschrijft alleen de partities waarvan de rijen zijn veranderd.
+# Afgeleide kolommen (zoals de vakantie-labels) tellen niet mee in die hash:
+# verandert alleen zo'n kolom, dan wordt alleen dat kolombestand vervangen.
+#
+#   final_data/_manifest.json
+#   final_data/2024/07/part-00000/createTime.arrow, ..., _schema.json
+#   final_data/2024/07/part-00001/...
+MANIFEST_FILE = '_manifest.json'
+
+# Partitie voor rijen zonder (geldige) datum
+UNKNOWN_PARTITION = 'onbekend'
+
+# Lockbestand naast de opslag (niet erin: de map zelf wordt bij write_dataset vervangen)
+LOCK_SUFFIX = '.lock'
+
+
+def manifest_path(dataset_path):
+    return os.path.join(dataset_path, MANIFEST_FILE)
+
+
+def dataset_exists(dataset_path):
+    return os.path.exists(manifest_path(dataset_path))
+
+
+@contextmanager
+def dataset_lock(dataset_path):
+    """
+    Exclusieve lock op de opslag (en de kubus die erbij hoort), gedeeld tussen
+    processen: de pijplijn en de scoring-service schrijven nooit tegelijk.
+    Nodig rond elke schrijfactie, en rond lezen + schrijven als het geschrevene
+    van het gelezene afhangt (kubus bijtellen). Niet re-entrant: write_dataset
+    en append_rows nemen de lock zelf niet.
+    """
+    lock_path = dataset_path + LOCK_SUFFIX
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            # LK_LOCK probeert het tien keer (één keer per seconde); daarna opnieuw
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_manifest(dataset_path):
+    with open(manifest_path(dataset_path), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_manifest(dataset_path, manifest):
+    manifest['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    tmp_path = manifest_path(dataset_path) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(dataset_path))
+
+
+def partition_keys(create_times):
+    """Partitie ('JJJJ-MM') per rij, op basis van het datumdeel van 'createTime'."""
+    dates = pd.to_datetime(pd.Series(create_times).astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    return dates.dt.strftime('%Y-%m').fillna(UNKNOWN_PARTITION).to_numpy()
+
+
+def _partition_dir(key):
+    """'2024-07' -> '2024/07' (in het manifest altijd met '/')."""
+    return key.replace('-', '/')
+
+
+def _partition_hash(df):
+    """Hash van de kolomnamen en de rijen (in volgorde) van een partitie."""
+    digest = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _next_segment(partition, key):
+    """Pad (relatief) van het volgende segment van een partitie; bestaande namen worden niet hergebruikt."""
+    numbers = [int(segment['path'].rsplit('-', 1)[1]) for segment in partition['segments']]
+    return f"{_partition_dir(key)}/part-{max(numbers, default=-1) + 1:05d}"
+
+
+def _write_segment(df_segment, dataset_path, key, partition, on_segment=None):
+    """
+    Schrijft de rijen als nieuw segment van een partitie en voegt het toe aan
+    'partition' (de manifest-entry). 'on_segment(segment_path, df_segment)' kan
+    per segment extra bestanden naast de kolommen zetten, vóórdat het manifest
+    ernaar verwijst.
+    """
+    segment = _next_segment(partition, key)
+    segment_path = os.path.join(dataset_path, *segment.split('/'))
+    write_table(df_segment, segment_path)
+    if on_segment is not None:
+        on_segment(segment_path, df_segment)
+    partition['segments'].append({'path': segment, 'num_rows': len(df_segment)})
+    partition['num_rows'] += len(df_segment)
+
+
+def _partitions(df):
+    """(partitie, rijen van die partitie) per partitie van 'df', op volgorde van partitie."""
+    keys = partition_keys(df['createTime'])
+    for key, rows in pd.Series(keys).groupby(keys, sort=True).indices.items():
+        yield key, df.iloc[rows].reset_index(drop=True)
+
+
+def _update_columns(df_partition, dataset_path, partition, names):
+    """
+    Vervangt in de segmenten van een ongewijzigde partitie de kolommen 'names'
+    waarvan de waarden verschillen (of die ontbreken), zonder de overige
+    kolommen en woordtellingen te herschrijven. Geeft True als er iets is geschreven.
+    """
+    changed = False
+    start = 0
+    for segment in partition['segments']:
+        segment_path = os.path.join(dataset_path, *segment['path'].split('/'))
+        rows = df_partition.iloc[start:start + segment['num_rows']].reset_index(drop=True)
+        start += segment['num_rows']
+        stored = read_table(segment_path, columns=names)
+        for name in names:
+            if name in stored.columns and _partition_hash(stored[[name]]) == _partition_hash(rows[[name]]):
+                continue
+            add_column(segment_path, name, rows[name])
+            changed = True
+    return changed
+
+
+def write_dataset(df, dataset_path, on_segment=None, added_columns=()):
+    """
+    Schrijft een volledige DataFrame als gepartitioneerde opslag en vervangt de
+    inhoud van een bestaande opslag. Partities waarvan de rijen niet veranderd
+    zijn (zelfde hash) blijven staan; een veranderde partitie krijgt één nieuw
+    segment. Kolommen in 'added_columns' tellen niet mee voor de hash: in een
+    verder ongewijzigde partitie worden ze met add_column bijgewerkt. Het
+    manifest wordt als laatste vervangen en daarna worden de segmenten
+    opgeruimd waar het niet meer naar verwijst, zodat een lezer nooit een half
+    geschreven opslag ziet. Zonder wijzigingen blijft ook het manifest (en dus
+    de versie) staan. Geeft het manifest terug.
+    """
+    if dataset_exists(dataset_path):
+        manifest = read_manifest(dataset_path)
+    else:
+        os.makedirs(dataset_path, exist_ok=True)
+        manifest = {'version': 0, 'partition_by': 'createTime (jaar/maand)',
+                    'num_rows': 0, 'columns': [], 'partitions': {}}
+
+    added = [c for c in df.columns if c in added_columns]
+    old_partitions = manifest['partitions']
+    partitions, written = {}, []
+    for key, df_partition in _partitions(df):
+        digest = _partition_hash(df_partition.drop(columns=added))
+        old = old_partitions.get(key)
+        if old is not None and old.get('hash') == digest:
+            partitions[key] = old
+            if added and _update_columns(df_partition, dataset_path, old, added):
+                written.append(key)
+            continue
+        # Nummering loopt door na de oude segmenten, die tot de manifest-wissel leesbaar blijven
+        partition = {'num_rows': 0, 'segments': list(old['segments']) if old else [], 'hash': digest}
+        _write_segment(df_partition, dataset_path, key, partition, on_segment)
+        partition['segments'] = partition['segments'][-1:]
+        partitions[key] = partition
+        written.append(key)
+
+    columns = [str(c) for c in df.columns]
+    if not written and partitions.keys() == old_partitions.keys() and columns == manifest['columns']:
+        return manifest
+
+    stale = [segment['path'] for key, partition in old_partitions.items()
+             for segment in partition['segments'] if segment not in partitions.get(key, {}).get('segments', [])]
+    manifest.update({'version': manifest['version'] + 1, 'num_rows': len(df),
+                     'columns': columns, 'partitions': partitions})
+    _write_manifest(dataset_path, manifest)
+
+    for segment in stale:
+        segment_path = os.path.join(dataset_path, *segment.split('/'))
+        shutil.rmtree(segment_path, ignore_errors=True)
+        # Lege partitiemappen ook weg; removedirs stopt bij de eerste map die niet leeg is
+        try:
+            os.removedirs(os.path.dirname(segment_path))
+        except OSError:
+            pass
+    return manifest
+
+
+def append_rows(df, dataset_path, on_segment=None):
+    """
+    Voegt rijen toe als nieuwe segmenten van de partities waar ze in vallen.
+    Bestaande segmenten en andere partities worden niet aangeraakt.
+    Geeft het bijgewerkte manifest terug.
+    """
+    manifest = read_manifest(dataset_path)
+    for key, df_segment in _partitions(df):
+        partition = manifest['partitions'].setdefault(key, {'num_rows': 0, 'segments': []})
+        _write_segment(df_segment, dataset_path, key, partition, on_segment)
+        # De rijen van de partitie komen niet meer overeen met de hash van de vorige volledige run
+        partition.pop('hash', None)
+    manifest['columns'] += [str(c) for c in df.columns if str(c) not in manifest['columns']]
+    manifest['num_rows'] += len(df)
+    manifest['version'] += 1
+    _write_manifest(dataset_path, manifest)
+    return manifest
+
+
+def dataset_years(dataset_path):
+    """Jaren waarvoor de opslag partities heeft (oplopend)."""
+    partitions = read_manifest(dataset_path)['partitions']
+    return sorted({int(key[:4]) for key in partitions if key != UNKNOWN_PARTITION})
+
+
+def segment_paths(dataset_path, years=None, manifest=None):
+    """Mappen van de segmenten (van de gegeven jaren), in partitie- en schrijfvolgorde."""
+    manifest = manifest or read_manifest(dataset_path)
+    wanted = None if years is None else {str(year) for year in years}
+    paths = []
+    for key in sorted(manifest['partitions']):
+        if wanted is not None and key[:4] not in wanted:
+            continue
+        for segment in manifest['partitions'][key]['segments']:
+            paths.append(os.path.join(dataset_path, *segment['path'].split('/')))
+    return paths
+
+
+def read_dataset(dataset_path, columns=None, years=None):
+    """
+    Leest (een deel van) de kolommen van de segmenten van de gegeven jaren
+    (standaard alles) als één DataFrame. Tekstkolommen die in een segment als
+    dictionary zijn opgeslagen worden categoricals. De gelezen segmenten staan
+    in 'df.attrs["segments"]', in rijvolgorde.
+    """
+    manifest = read_manifest(dataset_path)
+    paths = segment_paths(dataset_path, years, manifest)
+    frames = [read_table(path, columns) for path in paths]
+    if not frames:
+        names = manifest['columns'] if columns is None else [c for c in columns if c in manifest['columns']]
+        df = pd.DataFrame(columns=names)
+    else:
+        df = pd.concat(frames, ignore_index=True)
+        # Segmenten met verschillende categorieën worden bij concat gewone tekst
+        for col in df.columns:
+            if not isinstance(df[col].dtype, pd.CategoricalDtype) and any(
+                    col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+                df[col] = df[col].astype('category')
+    df.attrs['segments'] = paths
+    return df
\ No newline at end of file
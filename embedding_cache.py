@@ -0,0 +1,90 @@
+import os
+import re
+
+import numpy as np
+from pipeline_config import CACHE_DIR
+from sentiment_cache import sentence_key
+
+EMBEDDING_DIR = os.path.join(CACHE_DIR, 'embeddings')
+
+# Een sleutel is de eerste 16 bytes van de zin-hash
+KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """
+    Persistente opslag van zin-embeddings voor één model.
+    De vectoren staan achter elkaar in een float32-bestand dat memory-mapped wordt
+    gelezen; een tweede bestand bevat per rij de sleutel (hash van de zin).
+    Nieuwe zinnen worden achteraan toegevoegd, bestaande rijen worden nooit herschreven.
+    """
+
+    def __init__(self, model_name, directory=EMBEDDING_DIR):
+        self.model_name = model_name
+        self.dir = os.path.join(directory, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+        self.keys_path = os.path.join(self.dir, 'keys.bin')
+        self.vectors_path = os.path.join(self.dir, 'vectors.f32')
+        self.dim_path = os.path.join(self.dir, 'dim.txt')
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.dim = None
+        if os.path.exists(self.dim_path):
+            with open(self.dim_path, 'r', encoding='utf-8') as f:
+                self.dim = int(f.read().strip())
+
+        keys = []
+        if self.dim and os.path.exists(self.keys_path) and os.path.exists(self.vectors_path):
+            with open(self.keys_path, 'rb') as f:
+                data = f.read()
+            keys = [data[i:i + KEY_BYTES] for i in range(0, len(data) - KEY_BYTES + 1, KEY_BYTES)]
+            # Na een afgebroken run kunnen de bestanden ongelijk lang zijn:
+            # alleen rijen met zowel sleutel als volledige vector blijven bewaard
+            complete_rows = min(len(keys), os.path.getsize(self.vectors_path) // (4 * self.dim))
+            keys = keys[:complete_rows]
+            os.truncate(self.keys_path, complete_rows * KEY_BYTES)
+            os.truncate(self.vectors_path, complete_rows * 4 * self.dim)
+        self.rows = {key: row for row, key in enumerate(keys)}
+        self.count = len(keys)
+
+    def key(self, text):
+        return bytes.fromhex(sentence_key(text, self.model_name, 'embedding'))[:KEY_BYTES]
+
+    def vectors(self):
+        """Alle opgeslagen vectoren als read-only memory map (count x dim)."""
+        if not self.count:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+
+    def append(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self.dim_path, 'w', encoding='utf-8') as f:
+                f.write(str(self.dim))
+        # Eerst de vectoren, dan de sleutels: een afgebroken run laat zo geen sleutel zonder vector achter
+        with open(self.vectors_path, 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b''.join(keys))
+        for key in keys:
+            self.rows[key] = self.count
+            self.count += 1
+
+    def get_embeddings(self, zinnen, encode):
+        """
+        Geeft een (len(zinnen) x dim) array met embeddings terug.
+        Alleen zinnen die nog niet in de cache staan worden met 'encode' berekend.
+        """
+        keys = [self.key(z) for z in zinnen]
+        new = {}
+        for key, zin in zip(keys, zinnen):
+            if key not in self.rows and key not in new:
+                new[key] = zin
+
+        print(f"Embeddings: {len(zinnen) - sum(k in new for k in keys)} uit cache, "
+              f"{len(new)} nieuwe zinnen te embedden.")
+        if new:
+            self.append(list(new.keys()), encode(list(new.values())))
+
+        rows = np.fromiter((self.rows[k] for k in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self.vectors()[rows])
\ No newline at end of file
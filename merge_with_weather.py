@@ -1,82 +1,106 @@
-import pandas as pd
-import json
-import os
-import numpy as np
-
-# File names
-INPUT_REVIEWS = 'reviews_met_topics.json'
-INPUT_WEATHER = 'weather_data.csv'
-OUTPUT_FILE = 'final_data_for_powerbi.json'
-
-def merge_data():
-    print("Starting integration with weather data...")
-
-    # 1. Load reviews
-    if not os.path.exists(INPUT_REVIEWS):
-        print(f"ERROR: '{INPUT_REVIEWS}' not found.")
-        return
-        
-    with open(INPUT_REVIEWS, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Gebruik 'zinnen' in plaats van 'reviews'
-    df_reviews = pd.DataFrame.from_records(data['zinnen']) 
-    print(f"{len(df_reviews)} zinnen geladen voor integratie.")
-
-    # 2. Load weather data
-    if not os.path.exists(INPUT_WEATHER):
-        print(f"ERROR: '{INPUT_WEATHER}' not found.")
-        return
-        
-    df_weather = pd.read_csv(INPUT_WEATHER)
-    print(f"{len(df_weather)} dagen weersgegevens geladen.")
-
-    # 3. Voorbereiden voor merge
-    # De datum in createTime is bijv. "2024-08-15T10:00:00Z", we pakken de eerste 10 tekens
-    df_reviews['datum'] = df_reviews['createTime'].str[:10]
-    
-    # Kolomnaam in weer-bestand uniform maken
-    if 'date' in df_weather.columns:
-        df_weather = df_weather.rename(columns={'date': 'datum'})
-    elif 'Date' in df_weather.columns:
-        df_weather = df_weather.rename(columns={'Date': 'datum'})
-        
-    if 'datum' not in df_weather.columns:
-        print("ERROR: Kon geen datum-kolom vinden in weather CSV.")
-        return
-
-    df_weather['datum'] = df_weather['datum'].astype(str)
-
-    # 4. Mergen op datum
-    print("Samenvoegen op basis van datum...")
-    
-    weather_cols_to_keep = ['datum']
-    if 'temp_max_c' in df_weather.columns:
-        weather_cols_to_keep.append('temp_max_c')
-    if 'precip_amount_mm' in df_weather.columns:
-        weather_cols_to_keep.append('precip_amount_mm')
-    if 'temp_avg_c' in df_weather.columns:
-        weather_cols_to_keep.append('temp_avg_c')
-
-    df_final = pd.merge(
-        df_reviews, 
-        df_weather[weather_cols_to_keep], 
-        on='datum', 
-        how='left'
-    )
-    
-    # Tijdelijke datum-kolom verwijderen
-    df_final = df_final.drop(columns=['datum'])
-    
-    # 5. Opslaan
-    print(f"Opslaan naar '{OUTPUT_FILE}'...")
-    df_final_for_json = df_final.replace({np.nan: None})
-    output_data = {"reviews": df_final_for_json.to_dict('records')}
-    
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-    print(f"\nSucces! '{OUTPUT_FILE}' is klaar voor Power BI.")
-
-if __name__ == "__main__":
+import pandas as pd
+import json
+import os
+import sys
+import numpy as np
+from pipeline_config import TOPICS_FILE, WEATHER_FILE, MERGED_FILE, atomic_output
+from weather_store import load_weather_store, load_locations, location_stations
+from stage_metrics import phase, set_rows
+
+# File names
+INPUT_REVIEWS = TOPICS_FILE
+INPUT_WEATHER = WEATHER_FILE
+OUTPUT_FILE = MERGED_FILE
+
+def load_weather(path=INPUT_WEATHER):
+    """
+    Laadt de daggegevens van het weer als WeatherStore (per station en dag).
+    Geeft None terug als het bestand ontbreekt of geen datumkolom heeft.
+    """
+    if not os.path.exists(path):
+        print(f"ERROR: '{path}' not found.")
+        return None
+
+    try:
+        with phase('io'):
+            store = load_weather_store(path)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return None
+    print(f"Weersgegevens geladen: {len(store.station_codes)} station(s), {store.n_days} dagen.")
+    return store
+
+def add_weather(df_reviews, store, locations=None):
+    """
+    Koppelt de daggegevens van het weer aan elke zin.
+    Elke zin krijgt het station het dichtst bij de locatie van de review
+    ('locationId'); de waarden worden per rij direct uit de (station, dag)-arrays
+    van de WeatherStore gehaald. Als er uurwaarden zijn, komen daar neerslag en
+    temperatuur over de laatste 3, 6 en 24 uur vóór de review bij.
+    """
+    if locations is None:
+        locations = load_locations()
+
+    # 3. Station en dag per zin bepalen
+    # De datum in createTime is bijv. "2024-08-15T10:00:00Z", we pakken de eerste 10 tekens
+    df_final = df_reviews.copy()
+    days = pd.to_datetime(df_final['createTime'].astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+    days = days.values.astype('datetime64[D]')
+    location_ids = df_final['locationId'] if 'locationId' in df_final.columns else np.full(len(df_final), None)
+    df_final['weather_station'] = location_stations(store, location_ids, locations)
+
+    # 4. Opzoeken per (station, dag)
+    print("Weer opzoeken per station en dag...")
+    for col, values in store.lookup(df_final['weather_station'].to_numpy(), days).items():
+        df_final[col] = values
+
+    # 5. Uurweer in de uren vóór de review (as-of op het tijdstip, alleen met uurwaarden)
+    if store.hourly is not None:
+        print("Uurweer vóór elke review opzoeken...")
+        timestamps = pd.to_datetime(df_final['createTime'], utc=True, format='ISO8601', errors='coerce')
+        timestamps = timestamps.dt.tz_localize(None).values.astype('datetime64[s]').astype(np.int64)
+        for col, values in store.hourly.window_stats(df_final['weather_station'].to_numpy(), timestamps).items():
+            df_final[col] = values
+
+    set_rows(rows_in=len(df_reviews), rows_out=len(df_final))
+    # Op datum sorteren: de opslag staat zo in tijdsvolgorde, waardoor de
+    # dashboard de nieuwste zinnen zonder sorteren vindt
+    return df_final.sort_values('createTime', kind='stable', ignore_index=True)
+
+def save_merged(df_final, path=OUTPUT_FILE):
+    """Schrijft de zinnen met weer als één Arrow-bestand voor 'add_holidays.py'."""
+    with atomic_output(path) as tmp_path:
+        df_final.to_feather(tmp_path)
+
+def merge_data():
+    print("Starting integration with weather data...")
+
+    # 1. Load reviews
+    if not os.path.exists(INPUT_REVIEWS):
+        print(f"ERROR: '{INPUT_REVIEWS}' not found.")
+        sys.exit(1)
+        
+    with phase('io'):
+        with open(INPUT_REVIEWS, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Gebruik 'zinnen' in plaats van 'reviews'
+        df_reviews = pd.DataFrame.from_records(data['zinnen'])
+    print(f"{len(df_reviews)} zinnen geladen voor integratie.")
+
+    # 2. Load weather data
+    store = load_weather()
+    if store is None:
+        sys.exit(1)
+
+    df_final = add_weather(df_reviews, store)
+    
+    # 5. Opslaan
+    print(f"Opslaan naar '{OUTPUT_FILE}'...")
+    with phase('io'):
+        save_merged(df_final)
+
+    print(f"\nSucces! '{OUTPUT_FILE}' is klaar; run 'add_holidays.py' voor de vakantie-labels en de eindopslag.")
+
+if __name__ == "__main__":
     merge_data()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import argparse
+import os
+import time
+
+from pipeline_config import MODEL_CACHE_DIR, OFFLINE
+from stage_metrics import phase
+
+# Lokale opslag van alle modelbestanden die de NLP-stappen nodig hebben.
+# Modellen worden één keer naar MODEL_CACHE_DIR gehaald (zie 'prefetch' onderaan);
+# daarna laden de stappen ze rechtstreeks van schijf, zonder de Hugging Face Hub
+# of de NLTK-server te raadplegen. Met PIPELINE_OFFLINE=1 wordt nooit gedownload:
+# ontbrekende bestanden geven dan direct een duidelijke foutmelding.
+HUB_DIR = os.path.join(MODEL_CACHE_DIR, 'hub')
+NLTK_DIR = os.path.join(MODEL_CACHE_DIR, 'nltk_data')
+
+# NLTK-data voor de zinssegmentatie (punkt_tab voor nieuwe, punkt voor oude NLTK-versies)
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab/english/',
+    'punkt': 'tokenizers/punkt/english.pickle',
+}
+
+
+class ModelNotAvailable(RuntimeError):
+    """Een model staat niet in de lokale cache en downloaden is niet toegestaan."""
+
+
+def ensure_nltk_data():
+    """
+    Zorgt dat NLTK de punkt-data in NLTK_DIR vindt en downloadt die alleen als
+    hij nergens te vinden is. Is goedkoop genoeg om per (worker)proces aan te roepen.
+    """
+    import nltk
+
+    if NLTK_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DIR)
+
+    missing = []
+    for package, resource_path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            missing.append(package)
+    # Eén van beide is genoeg (afhankelijk van de NLTK-versie)
+    if len(missing) < len(NLTK_RESOURCES):
+        return
+
+    if OFFLINE:
+        raise ModelNotAvailable(
+            f"NLTK-data {missing} niet gevonden in '{NLTK_DIR}' en downloaden staat uit (PIPELINE_OFFLINE). "
+            f"Draai eerst 'python model_store.py' op een machine met internet en kopieer '{MODEL_CACHE_DIR}/'."
+        )
+    downloaded = [nltk.download(package, download_dir=NLTK_DIR, quiet=True) for package in missing]
+    if not any(downloaded):
+        raise ModelNotAvailable(
+            f"NLTK-data {missing} niet gevonden in '{NLTK_DIR}' en downloaden is mislukt (geen internet?). "
+            f"Draai 'python model_store.py' op een machine met internet en kopieer '{MODEL_CACHE_DIR}/'."
+        )
+
+
+def resolve_model(repo_id, revision='main'):
+    """
+    Geeft de lokale map met de bestanden van een Hugging Face-model terug.
+    Staat het model al in HUB_DIR, dan wordt het netwerk niet gebruikt;
+    anders wordt het (eenmalig) gedownload, tenzij OFFLINE aan staat.
+    Het opzoeken telt als opstarttijd van de stap, een download als model laden.
+    """
+    with phase('startup'):
+        from huggingface_hub import snapshot_download
+        from huggingface_hub.utils import LocalEntryNotFoundError
+
+        try:
+            return snapshot_download(repo_id, revision=revision, cache_dir=HUB_DIR, local_files_only=True)
+        except LocalEntryNotFoundError:
+            if OFFLINE:
+                raise ModelNotAvailable(
+                    f"Model '{repo_id}' ({revision}) niet gevonden in '{HUB_DIR}' en downloaden staat uit (PIPELINE_OFFLINE). "
+                    f"Draai eerst 'python model_store.py' op een machine met internet en kopieer '{MODEL_CACHE_DIR}/'."
+                ) from None
+    print(f"Model '{repo_id}' downloaden naar '{HUB_DIR}' (eenmalig)...")
+    with phase('model_load'):
+        return snapshot_download(repo_id, revision=revision, cache_dir=HUB_DIR)
+
+
+def prefetch():
+    """Haalt alle modellen en NLTK-data van de pijplijn naar de lokale cache."""
+    # Hier pas importeren: de stappen zelf laden hun zware bibliotheken ook pas bij gebruik
+    import analyse_sentiment
+    import analyse_topics
+
+    start = time.time()
+    ensure_nltk_data()
+    print(f"NLTK-data: '{NLTK_DIR}'")
+    for repo_id, revision in [
+        (analyse_sentiment.MODEL_NAME, analyse_sentiment.MODEL_REVISION),
+        (analyse_topics.EMBEDDING_MODEL_REPO, 'main'),
+    ]:
+        print(f"{repo_id}: '{resolve_model(repo_id, revision)}'")
+    print(f"Alle modellen staan in '{MODEL_CACHE_DIR}/' ({time.time() - start:.1f} seconden).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Haalt de modellen voor de NLP-stappen eenmalig naar de lokale modelcache, "
+                    "zodat de pijplijn daarna zonder internet kan draaien.")
+    parser.parse_args()
+    prefetch()
\ No newline at end of file
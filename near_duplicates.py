@@ -0,0 +1,335 @@
+import base64
+import re
+import tempfile
+import unicodedata
+from array import array
+
+import numpy as np
+
+# Near-duplicate detection for review comments (MinHash + LSH).
+# Every comment is reduced to the set of its character shingles; a MinHash
+# signature of NUM_PERM values estimates the Jaccard similarity between two
+# such sets. Signatures are cut into BANDS bands: reviews that share a band
+# are candidates, and a candidate joins a cluster only if the full signatures
+# agree on at least SIMILARITY_THRESHOLD of their values.
+#
+# The canonical copy of a cluster is the review with the oldest createTime
+# (ties: the lowest reviewId), so it does not depend on the order of the export.
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.7
+
+# Short comments ("Top!", "Leuk park") are written independently by many
+# reviewers, so they are never treated as duplicates of each other
+MIN_CHARS = 40
+
+# Number of comments hashed together
+HASH_BATCH_SIZE = 256
+# Upper bound on the hash matrix (permutations x shingles) built at once, so a
+# batch of long comments is hashed a few permutations at a time (256 MB at most)
+MAX_HASH_CELLS = 32 * 1024 * 1024
+
+# Fixed seed, so the same export always gives the same clusters
+SEED = 20240601
+
+_NON_WORD = re.compile(r'\W+')
+
+# Google adds a machine translation to the comment; only the original text is compared,
+# otherwise every short comment would look long (and alike) because of its translation
+TRANSLATED_MARKER = '(Translated by Google)'
+ORIGINAL_MARKER = '(Original)'
+
+
+def original_text(text):
+    """The reviewer's own text: '<original> (Translated by Google) <translation>' or '... (Original) <original>'."""
+    if ORIGINAL_MARKER in text:
+        return text.split(ORIGINAL_MARKER, 1)[1]
+    return text.split(TRANSLATED_MARKER, 1)[0]
+
+
+def normalize_comment(text):
+    """The original text in lower case, Unicode-normalized, with punctuation and whitespace runs collapsed to one space."""
+    text = unicodedata.normalize('NFKC', original_text(text)).lower()
+    return _NON_WORD.sub(' ', text).strip()
+
+
+class MinHasher:
+    """Computes MinHash signatures of comments with multiply-shift hash functions."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """
+        Signatures (uint32, one row per text) of a batch of normalized comments.
+        The whole batch is shingled at once and hashed a block of permutations at
+        a time (at most MAX_HASH_CELLS values), then reduced per comment, which
+        avoids numpy overhead per comment. Every text must have at least
+        SHINGLE_SIZE bytes.
+        """
+        encoded = [text.encode('utf-8') for text in texts]
+        lengths = np.array([len(e) for e in encoded], dtype=np.int64)
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+
+        # Each shingle of SHINGLE_SIZE bytes as one exact 64-bit number (base 257)
+        n = len(data) - SHINGLE_SIZE + 1
+        shingles = np.zeros(n, dtype=np.uint64)
+        for j in range(SHINGLE_SIZE):
+            shingles = shingles * np.uint64(257) + data[j:j + n]
+
+        # Drop the shingles that run over the end of a comment into the next one
+        owner = np.repeat(np.arange(len(texts)), lengths)[:n]
+        offset = np.arange(n) - (np.cumsum(lengths) - lengths)[owner]
+        shingles = shingles[offset <= lengths[owner] - SHINGLE_SIZE]
+        counts = lengths - SHINGLE_SIZE + 1
+
+        # Arithmetic wraps around modulo 2^64; the high 32 bits are the hash value
+        starts = np.cumsum(counts) - counts
+        block = max(1, MAX_HASH_CELLS // len(shingles))
+        result = np.empty((len(texts), len(self.a)), dtype=np.uint32)
+        for first in range(0, len(self.a), block):
+            a, b = self.a[first:first + block, None], self.b[first:first + block, None]
+            hashed = (a * shingles[None, :] + b) >> np.uint64(32)
+            result[:, first:first + block] = np.minimum.reduceat(hashed, starts, axis=1).T
+        return result
+
+    def signature(self, text):
+        """Signature of a single comment, or None if it is too short to compare."""
+        normalized = normalize_comment(text)
+        return self.signatures([normalized])[0] if len(normalized) >= MIN_CHARS else None
+
+
+class NearDuplicateIndex:
+    """
+    Collects the signatures of a stream of comments and clusters near-identical ones.
+    The texts are not kept, and the signatures are not kept in memory either: each
+    band is appended to its own temporary file, so clustering holds one band
+    (BANDS times smaller than the signatures) plus a few numbers per comment.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=SIMILARITY_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.positions = array('q')
+        self._band_files = None
+        self._pending = []
+
+    def add(self, position, text):
+        """Adds the comment at 'position' (any number that identifies it, e.g. the row number)."""
+        if not isinstance(text, str):
+            return
+        normalized = normalize_comment(text)
+        if len(normalized) >= MIN_CHARS:
+            self.positions.append(position)
+            self._pending.append(normalized)
+            if len(self._pending) >= HASH_BATCH_SIZE:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self._band_files is None:
+            self._band_files = [tempfile.TemporaryFile() for _ in range(self.bands)]
+        signatures = self.hasher.signatures(self._pending)
+        for band, f in enumerate(self._band_files):
+            f.write(np.ascontiguousarray(signatures[:, band * self.rows:(band + 1) * self.rows]).tobytes())
+        self._pending = []
+
+    def _read_band(self, band):
+        f = self._band_files[band]
+        f.flush()
+        f.seek(0)
+        return np.fromfile(f, dtype=np.uint32).reshape(-1, self.rows)
+
+    def close(self):
+        """Removes the temporary band files."""
+        for f in self._band_files or []:
+            f.close()
+        self._band_files = None
+
+    def clusters(self):
+        """
+        Returns {position: cluster} for every comment that has at least one near
+        duplicate; 'cluster' is the smallest position in its cluster. Comments
+        without a near duplicate are not in the result. Closes the index.
+        """
+        self._flush()
+        count = len(self.positions)
+        if count < 2:
+            self.close()
+            return {}
+
+        # Candidate pairs: every comment and the first comment in its bucket, per band
+        firsts, seconds = [], []
+        for band in range(self.bands):
+            keys = self._read_band(band).view(f'V{self.rows * 4}').ravel()
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            representative = first[inverse.ravel()]
+            candidates = np.flatnonzero(representative != np.arange(count))
+            firsts.append(candidates)
+            seconds.append(representative[candidates])
+        pairs = np.unique(np.stack([np.concatenate(firsts), np.concatenate(seconds)], axis=1), axis=0)
+
+        # Similarity of the full signatures, one band at a time
+        agree = np.zeros(len(pairs), dtype=np.int64)
+        if len(pairs):
+            for band in range(self.bands):
+                values = self._read_band(band)
+                agree += (values[pairs[:, 0]] == values[pairs[:, 1]]).sum(axis=1)
+        self.close()
+        pairs = pairs[agree >= self.threshold * self.bands * self.rows]
+
+        parent = np.arange(count)
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in pairs:
+            root_a, root_b = find(i), find(j)
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        positions = np.frombuffer(self.positions, dtype=np.int64)
+        members = np.unique(pairs)
+        return {int(positions[i]): int(positions[find(i)]) for i in members}
+
+
+def comment_signatures(texts, hasher=None):
+    """
+    Signatures (uint32, one row per text) of the comments that are long enough
+    to be matched, with their positions in 'texts'. Non-text values are skipped.
+    """
+    hasher = hasher or MinHasher()
+    normalized = [normalize_comment(t) if isinstance(t, str) else '' for t in texts]
+    positions = [i for i, t in enumerate(normalized) if len(t) >= MIN_CHARS]
+    signatures = np.empty((len(positions), len(hasher.a)), dtype=np.uint32)
+    for start in range(0, len(positions), HASH_BATCH_SIZE):
+        batch = [normalized[i] for i in positions[start:start + HASH_BATCH_SIZE]]
+        signatures[start:start + len(batch)] = hasher.signatures(batch)
+    return positions, signatures
+
+
+def encode_signature(signature):
+    """A signature as text (base64 of its little-endian values), e.g. for JSON Lines."""
+    return base64.b64encode(np.asarray(signature, dtype='<u4').tobytes()).decode('ascii')
+
+
+def decode_signatures(encoded, num_perm=NUM_PERM):
+    """The signatures of a list of encode_signature strings, as one uint32 array."""
+    raw = b''.join(base64.b64decode(text) for text in encoded)
+    return np.frombuffer(raw, dtype='<u4').astype(np.uint32).reshape(-1, num_perm)
+
+
+class StoredCommentIndex:
+    """
+    In-memory LSH index of comments that are already stored, so that new comments
+    (e.g. in the scoring service) can be matched against them. Keeps the
+    signatures and one 64-bit hash per band; new comments go into an unsorted
+    tail that is merged into the sorted part once it grows.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=SIMILARITY_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.keys = []
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.band_hashes = np.empty((0, bands), dtype=np.uint64)
+        # Per band: the sorted hashes of the first '_sorted' comments and their row numbers
+        self._order = np.empty((bands, 0), dtype=np.intp)
+        self._sorted_hashes = np.empty((bands, 0), dtype=np.uint64)
+        self._sorted = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _band_hashes(self, signatures):
+        # Multiply-add over the values of a band (wraps around modulo 2^64)
+        values = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        hashes = np.zeros((len(signatures), self.bands), dtype=np.uint64)
+        for row in range(self.rows):
+            hashes = hashes * np.uint64(0x9E3779B97F4A7C15) + values[:, :, row]
+        return hashes
+
+    def add(self, keys, texts):
+        """Adds comments; 'keys' (any value per comment) are what 'match' returns."""
+        positions, signatures = comment_signatures(texts, self.hasher)
+        keys = list(keys)
+        self.add_signatures([keys[i] for i in positions], signatures)
+
+    def add_signatures(self, keys, signatures):
+        """Adds comments by their signatures (see comment_signatures)."""
+        self.keys += list(keys)
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.band_hashes = np.concatenate([self.band_hashes, self._band_hashes(signatures)])
+        if len(self) - self._sorted > max(1024, self._sorted // 8):
+            self._order = np.argsort(self.band_hashes, axis=0, kind='stable').T.copy()
+            self._sorted_hashes = np.take_along_axis(self.band_hashes.T, self._order, axis=1)
+            self._sorted = len(self)
+
+    def match(self, texts):
+        """
+        The key of the most similar stored comment (at least 'threshold') per
+        text, or None. Ties go to the comment that was added first.
+        """
+        result = [None] * len(texts)
+        positions, signatures = comment_signatures(texts, self.hasher)
+        for position, signature, hashes in zip(positions, signatures, self._band_hashes(signatures)):
+            candidates = [np.flatnonzero(self.band_hashes[self._sorted:, band] == hashes[band]) + self._sorted
+                          for band in range(self.bands)]
+            for band in range(self.bands):
+                sorted_hashes = self._sorted_hashes[band]
+                lo = np.searchsorted(sorted_hashes, hashes[band], 'left')
+                hi = np.searchsorted(sorted_hashes, hashes[band], 'right')
+                candidates.append(self._order[band][lo:hi])
+            candidates = np.unique(np.concatenate(candidates))
+            if not len(candidates):
+                continue
+            similarity = (self.signatures[candidates] == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                result[position] = self.keys[candidates[best]]
+        return result
+
+
+def canonical_key(create_time, review_id):
+    """Sort key of the canonical-copy rule: the oldest createTime (missing last), then the lowest reviewId."""
+    return (create_time is None, create_time or '', review_id or '')
+
+
+def choose_canonicals(clusters, keys):
+    """
+    Picks the canonical copy of every cluster (see canonical_key).
+    'keys' maps every position in 'clusters' to its canonical_key. Returns
+    {position: canonical position} for every other member of a cluster.
+    """
+    best = {}
+    for position, cluster in clusters.items():
+        if cluster not in best or keys[position] < keys[best[cluster]]:
+            best[cluster] = position
+    return {position: best[cluster] for position, cluster in clusters.items() if best[cluster] != position}
+
+
+def find_near_duplicates(comments, keys=None):
+    """
+    {position: canonical position} for a list of comments (positions are list
+    indices). 'keys' are the canonical_key of each comment; without them the
+    first comment of a cluster is its canonical copy.
+    """
+    index = NearDuplicateIndex()
+    for position, text in enumerate(comments):
+        index.add(position, text)
+    clusters = index.clusters()
+    return choose_canonicals(clusters, keys if keys is not None else {p: p for p in clusters})
\ No newline at end of file
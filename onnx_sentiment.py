@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import time
+
+import numpy as np
+from pipeline_config import MODEL_CACHE_DIR, CLEANED_FILE
+
+# CPU-backend voor het sentiment model: RobBERT wordt één keer geëxporteerd naar
+# ONNX, de graaf wordt geoptimaliseerd (samengevoegde attention/LayerNorm-operaties)
+# en de gewichten worden dynamisch naar int8 gekwantiseerd. Daarna is voor het
+# scoren alleen onnxruntime en de tokenizer nodig, geen PyTorch.
+#
+# De export staat naast de gedownloade modellen, per modelversie (commit-hash):
+#   <MODEL_CACHE_DIR>/onnx/<commit-hash>/model.int8.onnx (+ tokenizer en config)
+ONNX_DIR = os.path.join(MODEL_CACHE_DIR, 'onnx')
+MODEL_FILE = 'model.int8.onnx'
+PARITY_FILE = 'parity.json'
+OPSET_VERSION = 14
+
+# Pariteitscontrole tegen de PyTorch-backend op een steekproef van eigen zinnen.
+# Dynamische kwantisatie gebruikt geen kalibratiedata, dus elke steekproef is 'held-out'.
+PARITY_SAMPLE_SIZE = 1000
+PARITY_MIN_AGREEMENT = 0.98
+PARITY_MAX_DRIFT_P95 = 0.05
+
+
+def export_dir(model_path):
+    """Map van de export voor een gedownloade modelversie (de snapshot-map eindigt op de commit-hash)."""
+    return os.path.join(ONNX_DIR, os.path.basename(os.path.normpath(model_path)))
+
+
+def export_quantized(model_path, output_dir):
+    """
+    Exporteert het model naar ONNX, optimaliseert de graaf voor BERT-achtige
+    modellen en kwantiseert de gewichten naar int8. Alles wordt eerst in een
+    tijdelijke map opgebouwd, zodat een afgebroken export geen halve map achterlaat.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from onnxruntime.transformers import optimizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    print(f"Sentiment model exporteren naar ONNX (int8) in '{output_dir}'...")
+    start = time.time()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    fp32_path = os.path.join(tmp_dir, 'model.onnx')
+    sample = tokenizer(["Een korte zin.", "Het zwembad was koud maar het personeel was erg vriendelijk."],
+                       padding=True, return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (sample['input_ids'], sample['attention_mask']), fp32_path,
+            input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+            dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                          'attention_mask': {0: 'batch', 1: 'sequence'},
+                          'logits': {0: 'batch'}},
+            opset_version=OPSET_VERSION, do_constant_folding=True,
+        )
+
+    # RoBERTa heeft dezelfde graafstructuur als BERT
+    optimized_path = os.path.join(tmp_dir, 'model.opt.onnx')
+    optimized = optimizer.optimize_model(fp32_path, model_type='bert',
+                                         num_heads=model.config.num_attention_heads,
+                                         hidden_size=model.config.hidden_size)
+    optimized.save_model_to_file(optimized_path)
+
+    quantize_dynamic(optimized_path, os.path.join(tmp_dir, MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    os.remove(optimized_path)
+
+    tokenizer.save_pretrained(tmp_dir)
+    model.config.save_pretrained(tmp_dir)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    size_mb = os.path.getsize(os.path.join(output_dir, MODEL_FILE)) / 1024 / 1024
+    print(f"Export klaar in {time.time() - start:.1f} seconden ({size_mb:.0f} MB).")
+
+
+class OnnxSentimentPipeline:
+    """
+    Zelfde interface als de transformers-pipeline die 'score_sentences' gebruikt:
+    een 'tokenizer' en aanroepen met een lijst zinnen, met per zin {'label', 'score'}.
+    """
+
+    def __init__(self, model_dir, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        config = AutoConfig.from_pretrained(model_dir)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, MODEL_FILE), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def __call__(self, texts, batch_size=32, truncation=True, max_length=512):
+        results = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=truncation,
+                                     max_length=max_length, return_tensors='np')
+            logits = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self.input_names})[0]
+            # Softmax, net als de transformers-pipeline bij één label per zin
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            probs /= probs.sum(axis=1, keepdims=True)
+            best = probs.argmax(axis=1)
+            results.extend({'label': self.labels[b], 'score': float(p[b])} for b, p in zip(best, probs))
+        return results
+
+
+def load_onnx_pipeline(model_path, threads=None):
+    """Laadt de int8-export van een gedownload model; exporteert eerst als die er nog niet is."""
+    output_dir = export_dir(model_path)
+    if not os.path.exists(os.path.join(output_dir, MODEL_FILE)):
+        export_quantized(model_path, output_dir)
+
+    parity_path = os.path.join(output_dir, PARITY_FILE)
+    if not os.path.exists(parity_path):
+        print("WAARSCHUWING: voor deze ONNX-export is nog geen pariteitscontrole gedraaid "
+              "('python onnx_sentiment.py --parity').")
+    else:
+        with open(parity_path, 'r', encoding='utf-8') as f:
+            if not json.load(f)['passed']:
+                print(f"WAARSCHUWING: de ONNX-export haalde de pariteitscontrole niet (zie '{parity_path}').")
+    return OnnxSentimentPipeline(output_dir, threads)
+
+
+def sample_sentences(sample_size=PARITY_SAMPLE_SIZE, seed=0, path=CLEANED_FILE):
+    """Een vaste (seed) steekproef van unieke zinnen uit de opgeschoonde reviews."""
+    import pandas as pd
+    from clean_reviews import read_cleaned
+    from analyse_sentiment import split_reviews_to_sentences
+
+    df = pd.DataFrame.from_records(read_cleaned(path)).dropna(subset=['comment'])
+    zinnen = sorted(set(split_reviews_to_sentences(df)['zin_tekst']))
+    return random.Random(seed).sample(zinnen, min(sample_size, len(zinnen)))
+
+
+def parity_check(zinnen):
+    """
+    Scoort dezelfde zinnen met de PyTorch- en de ONNX-backend en vergelijkt:
+    het aandeel gelijke labels, de afwijking in score (bij gelijke labels) en de snelheid.
+    Het rapport wordt naast de export bewaard.
+    """
+    from analyse_sentiment import MODEL_NAME, MODEL_REVISION, load_sentiment_pipeline, score_sentences
+    from model_store import resolve_model
+
+    timings, results = {}, {}
+    for backend in ('torch', 'onnx-int8'):
+        sentiment_pipeline = load_sentiment_pipeline(backend)
+        start = time.time()
+        results[backend] = score_sentences(sentiment_pipeline, zinnen)
+        timings[backend] = time.time() - start
+        del sentiment_pipeline
+
+    reference, quantized = results['torch'], results['onnx-int8']
+    same_label = np.array([r['label'] == q['label'] for r, q in zip(reference, quantized)])
+    drift = np.array([abs(r['score'] - q['score']) for r, q in zip(reference, quantized)])[same_label]
+
+    report = {
+        'model': MODEL_NAME,
+        'revision': MODEL_REVISION,
+        'checked_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'sentences': len(zinnen),
+        'label_agreement': round(float(same_label.mean()), 4),
+        'score_drift_mean': round(float(drift.mean()), 4) if len(drift) else None,
+        'score_drift_p95': round(float(np.percentile(drift, 95)), 4) if len(drift) else None,
+        'score_drift_max': round(float(drift.max()), 4) if len(drift) else None,
+        'torch_seconds': round(timings['torch'], 2),
+        'onnx_seconds': round(timings['onnx-int8'], 2),
+        'speedup': round(timings['torch'] / max(timings['onnx-int8'], 1e-9), 2),
+    }
+    report['passed'] = bool(report['label_agreement'] >= PARITY_MIN_AGREEMENT
+                            and report['score_drift_p95'] is not None
+                            and report['score_drift_p95'] <= PARITY_MAX_DRIFT_P95)
+
+    parity_path = os.path.join(export_dir(resolve_model(MODEL_NAME, MODEL_REVISION)), PARITY_FILE)
+    with open(parity_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n--- Pariteit ONNX int8 vs. PyTorch ({report['sentences']} zinnen) ---")
+    print(f"Gelijke labels:    {report['label_agreement']:.2%} (minimaal {PARITY_MIN_AGREEMENT:.0%})")
+    if report['score_drift_p95'] is not None:
+        print(f"Score-afwijking:   gemiddeld {report['score_drift_mean']:.4f}, p95 {report['score_drift_p95']:.4f} "
+              f"(maximaal {PARITY_MAX_DRIFT_P95}), max {report['score_drift_max']:.4f}")
+    print(f"Tijd:              PyTorch {report['torch_seconds']:.1f} s, ONNX {report['onnx_seconds']:.1f} s "
+          f"({report['speedup']:.1f}x sneller)")
+    print(f"Resultaat:         {'GESLAAGD' if report['passed'] else 'NIET GESLAAGD'} (opgeslagen in '{parity_path}')")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX int8-export van het sentiment model en pariteitscontrole.")
+    parser.add_argument('--export', action='store_true', help="Exporteer het model opnieuw (ook als er al een export is).")
+    parser.add_argument('--parity', action='store_true', help="Vergelijk de ONNX-backend met PyTorch.")
+    parser.add_argument('--sample', type=int, default=PARITY_SAMPLE_SIZE,
+                        help=f"Aantal zinnen voor de pariteitscontrole (standaard: {PARITY_SAMPLE_SIZE}).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed voor de steekproef.")
+    args = parser.parse_args()
+
+    from analyse_sentiment import MODEL_NAME, MODEL_REVISION
+    from model_store import resolve_model
+
+    model_path = resolve_model(MODEL_NAME, MODEL_REVISION)
+    if args.export or not os.path.exists(os.path.join(export_dir(model_path), MODEL_FILE)):
+        export_quantized(model_path, export_dir(model_path))
+
+    if args.parity:
+        if not os.path.exists(CLEANED_FILE):
+            print(f"ERROR: '{CLEANED_FILE}' niet gevonden. Run eerst 'clean_reviews.py'.")
+            sys.exit(1)
+        report = parity_check(sample_sentences(args.sample, args.seed))
+        if not report['passed']:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,134 +1,223 @@
-import pandas as pd
-import io
-import re
-import os
-
-INPUT_FILE = 'result.txt'
-OUTPUT_FILE = 'weather_data.csv'
-
-# 1. Definieer de kolomnaam-vertalingen
-# Gebaseerd op de KNMI-beschrijvingen in het bestand
-RENAME_MAP = {
-    'TG': 'temp_avg_c',
-    'TN': 'temp_min_c',
-    'TX': 'temp_max_c',
-    'DR': 'precip_duration_h',
-    'RH': 'precip_amount_mm',
-    'RHX': 'precip_max_hourly_mm'
-}
-# Kolommen die we moeten delen door 10
-# (Allemaal behalve de ID's)
-COLS_TO_CONVERT = ['TG', 'TN', 'TX', 'DR', 'RH', 'RHX']
-
-def parse_knmi_data():
-    """
-    Leest het complexe KNMI-tekstbestand, schoont het op en slaat het op als CSV.
-    """
-    if not os.path.exists(INPUT_FILE):
-        print(f"FOUT: '{INPUT_FILE}' niet gevonden.")
-        print(f"Zorg dat '{INPUT_FILE}' in dezelfde map staat als het script.")
-        return
-
-    print(f"Starten met parsen van '{INPUT_FILE}'...")
-    
-    header_line = None
-    data_lines = []
-
-    # --- Stap 1: Lees het bestand en scheid data van commentaar ---
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        for line in f:
-            stripped_line = line.strip()
-            
-            # Check voor commentaar/header regels
-            if stripped_line.startswith('#'):
-                # Zoek de daadwerkelijke data-header
-                if 'STN,YYYYMMDD' in stripped_line:
-                    header_line = stripped_line.replace('#', '').strip()
-                continue
-            
-            # Als het geen commentaar is, is het een (fragment van een) data-regel
-            if stripped_line:
-                data_lines.append(stripped_line)
-
-    if not header_line:
-        print("FOUT: Kon de header-regel ('# STN,YYYYMMDD,...') niet vinden in het bestand.")
-        return
-
-    # --- Stap 2: Repareer gebroken dataregels ---
-    # Voeg alle data-fragmenten samen tot één lange string
-    # Vervang newlines door spaties (voor het geval dat)
-    full_data_string = " ".join(data_lines).replace('\n', ' ')
-    
-    # Split de string op basis van de '370,' stationcode
-    # Dit zorgt ervoor dat elke dataregel correct begint
-    # We gebruiken een 'positive lookahead' '(?=370,)' om te splitten *voor* de code
-    processed_lines = re.split(r'(?=370,)', full_data_string)
-
-    # Filter eventuele lege strings uit het resultaat
-    clean_data_rows = [line.strip() for line in processed_lines if line.strip()]
-
-    # --- Stap 3: Maak een "virtueel" CSV-bestand in het geheugen ---
-    
-    # Maak de header schoon (verwijder extra spaties)
-    header = re.sub(r'\s*,\s*', ',', header_line)
-    cols = header.split(',')
-    
-    csv_data_io = io.StringIO()
-    csv_data_io.write(header + '\n') # Schrijf de schone header
-    
-    for line in clean_data_rows:
-        # Maak de dataregel schoon (verwijder extra spaties)
-        clean_line = re.sub(r'\s*,\s*', ',', line)
-        csv_data_io.write(clean_line + '\n')
-        
-    # Spoel terug naar het begin van het virtuele bestand
-    csv_data_io.seek(0)
-
-    # --- Stap 4: Lees het virtuele bestand in met Pandas ---
-    print("Data inlezen in pandas...")
-    try:
-        df = pd.read_csv(csv_data_io, sep=',')
-    except Exception as e:
-        print(f"FOUT: Er ging iets mis bij het inlezen van de data in pandas: {e}")
-        return
-
-    # --- Stap 5: Data opschonen en converteren ---
-    print("Data opschonen (eenheden converteren, datums omzetten)...")
-    
-    # Converteer datumkolom
-    df['YYYYMMDD'] = pd.to_datetime(df['YYYYMMDD'], format='%Y%m%d')
-    df.rename(columns={'YYYYMMDD': 'date'}, inplace=True)
-    
-    # Converteer de meetwaarden
-    for col in COLS_TO_CONVERT:
-        if col in df.columns:
-            # Converteer naar numeriek, fouten worden 'NaN' (Not a Number)
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Speciale waarde: -1 (voor neerslag) betekent <0.05, we maken er 0 van
-            df[col] = df[col].replace(-1, 0)
-            
-            # Converteer de eenheid (0.1 graden/mm/uur naar 1.0)
-            df[col] = df[col] / 10.0
-        
-    # Hernoem kolommen naar duidelijke namen
-    df.rename(columns=RENAME_MAP, inplace=True)
-    
-    # Verwijder kolommen die we niet hebben hernoemd (als die er zijn)
-    # Dit ruimt eventuele lege kolommen op
-    df = df[[col for col in df.columns if col in ['STN', 'date'] + list(RENAME_MAP.values())]]
-
-    # --- Stap 6: Opslaan als schone CSV ---
-    try:
-        df.to_csv(OUTPUT_FILE, index=False, date_format='%Y-%m-%d')
-        print("\n--- Voltooid ---")
-        print(f"Succesvol {len(df)} dataregels verwerkt.")
-        print(f"Schone data opgeslagen in: '{OUTPUT_FILE}'")
-    except Exception as e:
-        print(f"\nFOUT: Kon het CSV-bestand niet wegschrijven: {e}")
-
-
-# --- Voer de functie uit als het script direct wordt gerund ---
-# DEZE REGELS ZIJN ESSENTIEEL!
-if __name__ == "__main__":
+import pandas as pd
+import numpy as np
+import re
+import os
+from array import array
+from pipeline_config import WEATHER_FILE, WEATHER_HOURLY_FILE, STATIONS_FILE
+
+INPUT_FILE = 'result.txt'
+OUTPUT_FILE = WEATHER_FILE
+# Exports met uurwaarden (kolom HH) gaan naar een apart bestand
+OUTPUT_HOURLY_FILE = WEATHER_HOURLY_FILE
+# Stationsgegevens uit de header (code, coördinaten, naam) komen in STATIONS_FILE,
+# voor het koppelen van review-locaties aan het dichtstbijzijnde station
+
+# 1. Definieer de kolomnaam-vertalingen
+# Gebaseerd op de KNMI-beschrijvingen in het bestand
+RENAME_MAP = {
+    'TG': 'temp_avg_c',
+    'TN': 'temp_min_c',
+    'TX': 'temp_max_c',
+    'DR': 'precip_duration_h',
+    'RH': 'precip_amount_mm',
+    'RHX': 'precip_max_hourly_mm'
+}
+# Bij uurwaarden heten de kolommen anders (T = temperatuur, RH = uursom neerslag)
+HOURLY_RENAME_MAP = {
+    'T': 'temp_c',
+    'DR': 'precip_duration_h',
+    'RH': 'precip_amount_mm'
+}
+# Kolommen die we moeten delen door 10
+# (Allemaal behalve de ID's)
+COLS_TO_CONVERT = ['TG', 'TN', 'TX', 'T', 'DR', 'RH', 'RHX']
+# Alleen bij neerslag betekent -1 "minder dan 0.05 mm"
+PRECIP_COLS = ['RH', 'RHX']
+
+# Kolommen die gehele getallen bevatten; de rest wordt als float (leeg = NaN) bewaard
+INTEGER_COLS = ('STN', 'YYYYMMDD', 'HH')
+
+# Een datumveld (YYYYMMDD) herkent het begin van een nieuwe dataregel
+DATE_FIELD = re.compile(r'^\d{8}$')
+
+
+class KnmiReader:
+    """
+    Leest een KNMI-export in één keer van boven naar beneden.
+    Uit de commentaarregels worden de stations en de kolomnamen gehaald;
+    dataregels worden direct omgezet naar getallen en per kolom in een
+    getypeerde array bewaard. Regels die over meerdere tekstregels zijn
+    afgebroken worden weer samengevoegd, voor elk station uit de header.
+    """
+
+    def __init__(self):
+        self.stations = {}
+        self.columns = None
+        self.values = None
+        self.pending = []
+        self.short_rows = 0
+        self.in_station_table = False
+
+    def read_comment(self, text):
+        compact = text.replace(' ', '')
+        if compact.startswith('STN,'):
+            # De data-header, bijv. 'STN,YYYYMMDD,   TG,   TN, ...'
+            self.columns = compact.split(',')
+            self.values = {col: array('q') if col in INTEGER_COLS else array('d') for col in self.columns}
+            self.in_station_table = False
+        elif text.startswith('STN'):
+            # Begin van de stationstabel: 'STN  LON(east)  LAT(north)  ALT(m)  NAME'
+            self.in_station_table = True
+        elif self.in_station_table:
+            parts = text.split(None, 4)
+            if len(parts) >= 4 and parts[0].isdigit():
+                self.stations[int(parts[0])] = {
+                    'STN': int(parts[0]),
+                    'lon': float(parts[1]),
+                    'lat': float(parts[2]),
+                    'alt_m': float(parts[3]),
+                    'name': parts[4].strip() if len(parts) > 4 else '',
+                }
+            else:
+                self.in_station_table = False
+
+    def starts_record(self, fields):
+        if not fields[0].isdigit():
+            return False
+        if self.stations and int(fields[0]) not in self.stations:
+            return False
+        # Een stationscode gevolgd door een datum, of een stationscode aan het begin van een lege regel
+        return not self.pending or (len(fields) > 1 and DATE_FIELD.match(fields[1]) is not None)
+
+    def emit(self, fields):
+        if len(fields) < len(self.columns):
+            self.short_rows += 1
+            fields = fields + [''] * (len(self.columns) - len(fields))
+        for col, value in zip(self.columns, fields):
+            if col in INTEGER_COLS:
+                self.values[col].append(int(value))
+            else:
+                # Een leeg veld betekent: niet gemeten
+                self.values[col].append(float(value) if value else np.nan)
+
+    def read_data(self, text):
+        fields = [field.strip() for field in text.split(',')]
+        if fields[-1] == '':
+            fields.pop()  # De regel is direct na een komma afgebroken
+
+        if self.starts_record(fields) and self.pending:
+            self.emit(self.pending)  # De vorige regel was onvolledig
+            self.pending = []
+        self.pending.extend(fields)
+        if len(self.pending) >= len(self.columns):
+            self.emit(self.pending[:len(self.columns)])
+            self.pending = []
+
+    def read(self, f):
+        for line in f:
+            stripped_line = line.strip()
+            if stripped_line.startswith('#'):
+                self.read_comment(stripped_line.lstrip('#').strip())
+            elif stripped_line:
+                if self.columns is None:
+                    raise ValueError("dataregel gevonden vóór de header-regel ('# STN,YYYYMMDD,...')")
+                self.read_data(stripped_line)
+        if self.pending:
+            self.emit(self.pending)
+            self.pending = []
+
+    def to_frame(self):
+        df = pd.DataFrame({col: np.frombuffer(values, dtype=np.int64 if values.typecode == 'q' else np.float64)
+                           for col, values in self.values.items()})
+        stations = pd.DataFrame(list(self.stations.values()), columns=['STN', 'lon', 'lat', 'alt_m', 'name'])
+        return df, stations
+
+
+def read_knmi(path=INPUT_FILE):
+    """
+    Leest een KNMI-export (dag- of uurwaarden, één of meer stations).
+    Geeft de ruwe meetwaarden en de stationstabel terug als DataFrames.
+    """
+    reader = KnmiReader()
+    with open(path, 'r', encoding='utf-8') as f:
+        reader.read(f)
+    if reader.columns is None:
+        raise ValueError("kon de header-regel ('# STN,YYYYMMDD,...') niet vinden")
+    if reader.short_rows:
+        print(f"WAARSCHUWING: {reader.short_rows} onvolledige dataregels; ontbrekende waarden zijn leeg gelaten.")
+    return reader.to_frame()
+
+
+def convert_units(df):
+    """Zet de ruwe KNMI-waarden om naar datums, graden, mm en uren met duidelijke kolomnamen."""
+    # Converteer datumkolom (YYYYMMDD als geheel getal)
+    dates = df['YYYYMMDD'].to_numpy()
+    df['YYYYMMDD'] = pd.to_datetime(pd.DataFrame({
+        'year': dates // 10000, 'month': dates // 100 % 100, 'day': dates % 100
+    }))
+    df = df.rename(columns={'YYYYMMDD': 'date'})
+
+    # Uurwaarden: HH is het uur (1-24, UT) waarin de meting eindigt
+    hourly = 'HH' in df.columns
+    if hourly:
+        df['time'] = df['date'] + pd.to_timedelta(df['HH'], unit='h')
+
+    # Converteer de meetwaarden
+    for col in COLS_TO_CONVERT:
+        if col in df.columns:
+            # Speciale waarde: -1 (voor neerslag) betekent <0.05, we maken er 0 van
+            if col in PRECIP_COLS:
+                df[col] = df[col].replace(-1, 0)
+
+            # Converteer de eenheid (0.1 graden/mm/uur naar 1.0)
+            df[col] = df[col] / 10.0
+
+    # Hernoem kolommen naar duidelijke namen
+    rename_map = HOURLY_RENAME_MAP if hourly else RENAME_MAP
+    df = df.rename(columns=rename_map)
+
+    # Verwijder kolommen die we niet hebben hernoemd (als die er zijn)
+    keep = ['STN', 'time'] if hourly else ['STN', 'date']
+    return df[[col for col in df.columns if col in keep + list(rename_map.values())]]
+
+
+def parse_knmi_data():
+    """
+    Leest het KNMI-tekstbestand in één keer (streaming), zet de waarden om en slaat ze op als CSV.
+    """
+    if not os.path.exists(INPUT_FILE):
+        print(f"FOUT: '{INPUT_FILE}' niet gevonden.")
+        print(f"Zorg dat '{INPUT_FILE}' in dezelfde map staat als het script.")
+        return
+
+    print(f"Starten met parsen van '{INPUT_FILE}'...")
+
+    # --- Stap 1: Lees het bestand regel voor regel naar getypeerde kolommen ---
+    try:
+        df, stations = read_knmi(INPUT_FILE)
+    except ValueError as e:
+        print(f"FOUT: {e}")
+        return
+
+    # --- Stap 2: Data opschonen en converteren ---
+    print("Data opschonen (eenheden converteren, datums omzetten)...")
+    df = convert_units(df)
+    hourly = 'time' in df.columns
+    output_file = OUTPUT_HOURLY_FILE if hourly else OUTPUT_FILE
+
+    # --- Stap 3: Opslaan als schone CSV ---
+    try:
+        df.to_csv(output_file, index=False, date_format='%Y-%m-%d %H:%M' if hourly else '%Y-%m-%d')
+        if len(stations):
+            stations.to_csv(STATIONS_FILE, index=False)
+        print("\n--- Voltooid ---")
+        print(f"Succesvol {len(df)} dataregels verwerkt voor {df['STN'].nunique()} station(s).")
+        print(f"Schone data opgeslagen in: '{output_file}'")
+    except Exception as e:
+        print(f"\nFOUT: Kon het CSV-bestand niet wegschrijven: {e}")
+
+
+# --- Voer de functie uit als het script direct wordt gerund ---
+# DEZE REGELS ZIJN ESSENTIEEL!
+if __name__ == "__main__":
     parse_knmi_data()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+from contextlib import contextmanager
+
+# Map voor tussenbestanden en caches van de pijplijn.
+# Alles in deze map kan veilig worden verwijderd; de pijplijn bouwt het opnieuw op.
+CACHE_DIR = '.pipeline_cache'
+
+# Lokale kopie van de modellen (RobBERT, het embedding model en de NLTK-data), zie model_store.py.
+# Staat bewust niet in CACHE_DIR: op machines zonder internet kan deze map niet opnieuw worden opgebouwd.
+# De map hoort bij de repository (niet bij de werkmap), zodat ook de benchmark hem hergebruikt.
+MODEL_CACHE_DIR = os.environ.get(
+    'PIPELINE_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'downloads'))
+# Met PIPELINE_OFFLINE=1 (of HF_HUB_OFFLINE=1) wordt nooit iets gedownload
+OFFLINE = os.environ.get('PIPELINE_OFFLINE', os.environ.get('HF_HUB_OFFLINE', '')).lower() in ('1', 'true', 'yes')
+# Inferentie-backend voor het sentiment model: 'torch' of 'onnx-int8' (zie onnx_sentiment.py)
+SENTIMENT_BACKEND = os.environ.get('PIPELINE_SENTIMENT_BACKEND', 'torch')
+# Aantal processen voor het sentiment model (1 = in het huidige proces) en threads per
+# proces (0 = de cores gelijk verdelen over de processen)
+SENTIMENT_WORKERS = int(os.environ.get('PIPELINE_SENTIMENT_WORKERS', '1'))
+SENTIMENT_THREADS = int(os.environ.get('PIPELINE_SENTIMENT_THREADS', '0'))
+
+# Bronbestanden
+REVIEWS_FILE = 'terspegelt.json'
+# Ruwe reviews die via de scoring-service (scoring_service.py) binnenkwamen, één per regel.
+# De schoonmaakstap leest ze samen met REVIEWS_FILE, zodat een volledige run ze ook meeneemt.
+STREAM_REVIEWS_FILE = 'reviews_stream.jsonl'
+WEATHER_FILE = 'weather_data.csv'
+# Uurwaarden (optioneel; alleen als er een KNMI-export met uurgegevens is geparsed)
+WEATHER_HOURLY_FILE = 'weather_hourly.csv'
+# KNMI-stations (code, coördinaten) en de coördinaten van de review-locaties
+STATIONS_FILE = 'weather_stations.csv'
+LOCATIONS_FILE = 'locations.csv'
+
+# Tussenbestanden (worden bewaard zodat ongewijzigde stappen overgeslagen kunnen worden)
+CLEANED_FILE = os.path.join(CACHE_DIR, 'cleaned_reviews.jsonl')
+SENTIMENT_FILE = os.path.join(CACHE_DIR, 'reviews_met_sentiment.json')
+TOPICS_FILE = os.path.join(CACHE_DIR, 'reviews_met_topics.json')
+# Zinnen met weer (één Arrow-bestand); add_holidays.py maakt hier de eindopslag van
+MERGED_FILE = os.path.join(CACHE_DIR, 'zinnen_met_weer.arrow')
+
+# Eindresultaat: een opslag gepartitioneerd op jaar/maand met een manifest (zie
+# dataset_store.py); elk segment is een kolomopslag (Arrow, zie columnar_store.py)
+# met de woordtellingen van zijn zinnen ernaast. De dashboard leest alleen de
+# partities van de gekozen jaren. Het JSON-bestand is alleen nog een export voor Power BI.
+FINAL_STORE = 'final_data'
+FINAL_FILE = 'final_data_for_powerbi.json'
+# MinHash-handtekening van het commentaar van elke canonieke review (één per regel,
+# zie near_duplicates.py); de scoring-service zoekt hierin naar near duplicates
+COMMENT_SIGNATURES_FILE = 'comment_signatures.jsonl'
+EXPORT_JSON = True
+# Meetrapport van de laatste pijplijn-run (tijden, rijen, geheugen per stap), naast de export
+RUN_REPORT_FILE = 'pipeline_run_report.json'
+
+# Voorgeaggregeerde kubus (jaar x maand x periode x topic x sentiment) voor de dashboard
+CUBE_STORE = 'final_cube'
+
+
+def ensure_parent_dir(path):
+    """Maakt de map van 'path' aan als die nog niet bestaat."""
+    parent = os.path.dirname(path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    Geeft een tijdelijk pad naast 'path' om naar te schrijven. Dat bestand komt
+    pas op 'path' als het blok zonder fout eindigt; anders wordt het verwijderd
+    en blijft een eerder resultaat staan (nooit een half geschreven bestand).
+    """
+    ensure_parent_dir(path)
+    tmp_path = path + '.tmp'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
\ No newline at end of file
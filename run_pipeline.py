@@ -1,58 +1,426 @@
-import subprocess
-import sys
-import time
-import os
-
-def run_script(script_name):
-    """
-    Voert een Python-script uit en stopt de pijplijn als er een fout optreedt.
-    """
-    print(f"\n{'='*60}")
-    print(f"STARTING: {script_name}")
-    print(f"{'='*60}")
-    
-    start_time = time.time()
-    
-    try:
-        # Gebruik de huidige Python-interpreter om het script aan te roepen
-        result = subprocess.run([sys.executable, script_name], check=True)
-        elapsed = time.time() - start_time
-        print(f"DONE: {script_name} succesvol uitgevoerd in {elapsed:.1f} seconden.")
-        
-    except subprocess.CalledProcessError:
-        print(f"\nERROR: Er is iets misgegaan tijdens het uitvoeren van '{script_name}'.")
-        sys.exit(1)
-
-def main():
-    print("--- STARTING AUTOMATIC DATA PIELINE (INCL. HISTORISCHE VAKANTIES) ---")
-    
-    # Voer de standaard stappen uit
-    run_script('clean_reviews.py')
-    run_script('analyse_sentiment.py')
-    run_script('analyse_topics.py')
-    run_script('merge_with_weather.py')
-    
-    # --- NIEUW: VAKANTIEDATA TOEVOEGEN (2017-2025) ---
-    # Deze stap moet ná de merge met het weer komen, omdat het de finale JSON verrijkt.
-    run_script('add_holidays.py')
-
-    # --- TUSSENBESTANDEN VERWIJDEREN ---
-    print("\nOpschonen van tussenbestanden...")
-    intermediate_files = [
-        'cleaned_reviews.json', 
-        'reviews_met_sentiment.json', 
-        'reviews_met_topics.json'
-    ]
-    
-    for file in intermediate_files:
-        if os.path.exists(file):
-            os.remove(file)
-            print(f"Verwijderd: {file}")
-
-    print("\n" + "="*60)
-    print("SUCCES! De volledige dataset inclusief weer en vakanties is klaar.")
-    print("Bestand: 'final_data_for_powerbi.json'")
-    print("="*60)
-
-if __name__ == "__main__":
+import argparse
+import hashlib
+import json
+import subprocess
+import sys
+import time
+import os
+from graphlib import TopologicalSorter
+
+from pipeline_config import (
+    CACHE_DIR, REVIEWS_FILE, STREAM_REVIEWS_FILE, WEATHER_FILE, WEATHER_HOURLY_FILE, STATIONS_FILE, LOCATIONS_FILE, CLEANED_FILE, SENTIMENT_FILE,
+    TOPICS_FILE, MERGED_FILE, FINAL_STORE, FINAL_FILE, EXPORT_JSON, CUBE_STORE, RUN_REPORT_FILE, SENTIMENT_BACKEND,
+    COMMENT_SIGNATURES_FILE
+)
+import stage_metrics
+from columnar_store import SCHEMA_FILE
+from dataset_store import manifest_path
+
+# Bestand waarin per stap de vingerafdruk van de laatste succesvolle run staat
+STATE_FILE = os.path.join(CACHE_DIR, 'pipeline_state.json')
+# cProfile-uitvoer per stap (alleen met --profile)
+PROFILE_DIR = os.path.join(CACHE_DIR, 'profiles')
+
+# De pijplijn als afhankelijkheidsgraaf: elke stap declareert zijn in- en uitvoer.
+# 'code' bevat extra modules die het script importeert; wijzigingen daarin
+# tellen mee als een nieuwe scriptversie.
+STAGES = [
+    {
+        'name': 'clean',
+        'script': 'clean_reviews.py',
+        'code': ['pipeline_config.py', 'near_duplicates.py'],
+        'inputs': [REVIEWS_FILE, STREAM_REVIEWS_FILE],
+        'outputs': [CLEANED_FILE, COMMENT_SIGNATURES_FILE],
+    },
+    {
+        'name': 'sentiment',
+        'script': 'analyse_sentiment.py',
+        'code': ['pipeline_config.py', 'sentiment_cache.py', 'clean_reviews.py', 'sentence_segmenter.py', 'model_store.py', 'onnx_sentiment.py'],
+        'inputs': [CLEANED_FILE],
+        'outputs': [SENTIMENT_FILE],
+        # Een andere backend geeft (iets) andere scores
+        'settings': {'backend': SENTIMENT_BACKEND},
+    },
+    {
+        'name': 'topics',
+        'script': 'analyse_topics.py',
+        'code': ['pipeline_config.py', 'embedding_cache.py', 'sentiment_cache.py', 'topic_cache.py', 'model_store.py'],
+        # Het bewaarde topic model is geen invoer: deze stap schrijft het zelf (bij de
+        # eerste run of --refit-topics, dat de stap altijd uitvoert). Een refit met
+        # 'analyse_topics.py --refit' schrijft ook TOPICS_FILE, waar de volgende stappen op reageren.
+        'inputs': [SENTIMENT_FILE],
+        'outputs': [TOPICS_FILE],
+    },
+    {
+        'name': 'weather',
+        'script': 'merge_with_weather.py',
+        'code': ['pipeline_config.py', 'weather_store.py'],
+        'inputs': [TOPICS_FILE, WEATHER_FILE, WEATHER_HOURLY_FILE, STATIONS_FILE, LOCATIONS_FILE],
+        'outputs': [MERGED_FILE],
+    },
+    {
+        # Voegt de vakantie-labels toe en schrijft de gepartitioneerde eindopslag
+        # (met de woordtellingen per segment voor de woordwolk in de dashboard)
+        'name': 'holidays',
+        'script': 'add_holidays.py',
+        'code': ['pipeline_config.py', 'columnar_store.py', 'dataset_store.py', 'term_index.py'],
+        'inputs': [MERGED_FILE, 'holiday_calendar.csv'],
+        'outputs': [manifest_path(FINAL_STORE)] + ([FINAL_FILE] if EXPORT_JSON else []),
+    },
+    {
+        # Aggregeert de eindopslag tot de kubus waar de dashboard uit leest
+        'name': 'cube',
+        'script': 'analytics_cube.py',
+        'code': ['pipeline_config.py', 'columnar_store.py', 'dataset_store.py'],
+        'inputs': [manifest_path(FINAL_STORE)],
+        'outputs': [os.path.join(CUBE_STORE, SCHEMA_FILE)],
+    },
+]
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return {'stages': {}, 'files': {}}
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"WAARSCHUWING: '{STATE_FILE}' is corrupt, alle stappen worden opnieuw uitgevoerd.")
+        return {'stages': {}, 'files': {}}
+
+def save_state(state):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+
+def file_hash(path, state):
+    """
+    SHA-256 van de inhoud van een bestand.
+    De hash wordt hergebruikt zolang grootte en wijzigingstijd gelijk zijn,
+    zodat grote ongewijzigde bestanden niet elke run opnieuw gelezen worden.
+    """
+    stat = os.stat(path)
+    cached = state['files'].get(path)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    state['files'][path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return digest
+
+def stage_fingerprint(stage, state):
+    """Vingerafdruk van een stap: scriptversie, instellingen en de inhoud van alle invoerbestanden."""
+    h = hashlib.sha256()
+    for path in [stage['script']] + stage.get('code', []) + stage['inputs']:
+        h.update(path.encode('utf-8'))
+        h.update(file_hash(path, state).encode('utf-8') if os.path.exists(path) else b'missing')
+    if stage.get('settings'):
+        h.update(json.dumps(stage['settings'], sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+def stage_order(stages):
+    """Sorteert de stappen topologisch op basis van hun gedeclareerde in- en uitvoer."""
+    producers = {out: stage['name'] for stage in stages for out in stage['outputs']}
+    graph = {
+        stage['name']: {producers[inp] for inp in stage['inputs'] if inp in producers}
+        for stage in stages
+    }
+    by_name = {stage['name']: stage for stage in stages}
+    return [by_name[name] for name in TopologicalSorter(graph).static_order()]
+
+def path_size(path):
+    """Grootte in bytes van een bestand of (recursief) een map; 0 als het pad niet bestaat."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def stage_record(name, seconds, metrics=None, peak_rss=None, bytes_read=None, bytes_written=None, profile=None):
+    """Eén regel van het run-rapport: rijen, doorvoer, geheugen, bytes en de verdeling van de tijd."""
+    metrics = metrics or {}
+    phases = metrics.get('phases', {})
+    startup = phases.get('startup', 0.0)
+    io_time = phases.get('io', 0.0)
+    model_load = phases.get('model_load', 0.0)
+    rows_in = metrics.get('rows_in')
+    return {
+        'stage': name,
+        'status': 'ran',
+        'seconds': round(seconds, 3),
+        'rows_in': rows_in,
+        'rows_out': metrics.get('rows_out'),
+        'rows_per_sec': round(rows_in / seconds, 1) if rows_in and seconds > 0 else None,
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'bytes_read': bytes_read,
+        'bytes_written': bytes_written,
+        # Alles wat niet als opstarten, I/O of model laden gemarkeerd is, telt als
+        # rekentijd. Opstarten is bij een apart proces de tijd vanaf het starten van
+        # de interpreter (imports, modelpaden opzoeken) tot de eerste invoer.
+        'time_split': {
+            'startup': round(startup, 3),
+            'io': round(io_time, 3),
+            'model_load': round(model_load, 3),
+            'compute': round(max(seconds - startup - io_time - model_load, 0.0), 3),
+        },
+        'profile': profile,
+    }
+
+def print_record(record):
+    split = record['time_split']
+    parts = [f"startup {split['startup']:.1f}s", f"io {split['io']:.1f}s", f"model {split['model_load']:.1f}s", f"compute {split['compute']:.1f}s"]
+    if record['rows_in'] is not None:
+        parts.append(f"{record['rows_in']} -> {record['rows_out']} rijen")
+    if record['rows_per_sec']:
+        parts.append(f"{record['rows_per_sec']:.0f} rijen/s")
+    if record['peak_rss_mb'] is not None:
+        parts.append(f"piek {record['peak_rss_mb']:.0f} MB")
+    print("      " + ", ".join(parts))
+    if record['profile']:
+        print(f"      Profiel: {record['profile']} (bekijk met: python -m pstats {record['profile']})")
+
+def run_script(script_name, args=(), profile_path=None):
+    """
+    Voert een Python-script uit en stopt de pijplijn als er een fout optreedt.
+    Geeft de wandtijd, de metingen van het script (zie stage_metrics.py) en
+    de piek-RSS van het proces terug.
+    """
+    print(f"\n{'='*60}")
+    print(f"STARTING: {script_name}")
+    print(f"{'='*60}")
+
+    # Het script schrijft zijn metingen bij afsluiten naar dit bestand
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    metrics_file = os.path.join(CACHE_DIR, f"metrics_{os.getpid()}.json")
+    env = dict(os.environ, **{stage_metrics.METRICS_FILE_ENV: metrics_file,
+                              stage_metrics.STARTED_AT_ENV: repr(time.time())})
+
+    # Gebruik de huidige Python-interpreter om het script aan te roepen
+    command = [sys.executable, script_name, *args]
+    if profile_path:
+        command = [sys.executable, '-m', 'cProfile', '-o', profile_path, script_name, *args]
+
+    start_time = time.time()
+    peak_rss = None
+    if hasattr(os, 'wait4'):
+        # wait4 geeft het resourcegebruik van precies dit kindproces terug. Op Linux
+        # telt daarin ook de piek van dit proces bij het forken mee; het script meldt
+        # daarom zelf zijn piek (VmHWM) en deze waarde is alleen de terugvaloptie.
+        process = subprocess.Popen(command, env=env)
+        _, status, usage = os.wait4(process.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        peak_rss = stage_metrics.rusage_mb(usage.ru_maxrss)
+    else:
+        returncode = subprocess.run(command, env=env).returncode
+    elapsed = time.time() - start_time
+
+    if returncode != 0:
+        print(f"\nERROR: Er is iets misgegaan tijdens het uitvoeren van '{script_name}'.")
+        sys.exit(1)
+    print(f"DONE: {script_name} succesvol uitgevoerd in {elapsed:.1f} seconden.")
+
+    metrics = None
+    if os.path.exists(metrics_file):
+        with open(metrics_file, 'r', encoding='utf-8') as f:
+            metrics = json.load(f)
+        os.remove(metrics_file)
+        if metrics.get('peak_rss_mb') is not None:
+            peak_rss = metrics['peak_rss_mb']
+    return elapsed, metrics, peak_rss
+
+def run_stage(stage, state, force=False, args=(), profile=False):
+    """
+    Voert een stap uit, tenzij de invoer en scriptversie sinds de vorige run niet veranderd zijn.
+    Geeft de regel voor het run-rapport terug.
+    """
+    fingerprint = stage_fingerprint(stage, state)
+    outputs_present = all(os.path.exists(out) for out in stage['outputs'])
+
+    if not force and outputs_present and state['stages'].get(stage['name']) == fingerprint:
+        print(f"SKIP: {stage['script']} (invoer ongewijzigd)")
+        return {'stage': stage['name'], 'status': 'skipped'}
+
+    profile_path = None
+    if profile:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_path = os.path.join(PROFILE_DIR, f"{stage['name']}.prof")
+
+    bytes_read = sum(path_size(path) for path in stage['inputs'])
+    elapsed, metrics, peak_rss = run_script(stage['script'], args, profile_path)
+
+    missing = [out for out in stage['outputs'] if not os.path.exists(out)]
+    if missing:
+        print(f"\nERROR: '{stage['script']}' heeft {missing} niet aangemaakt.")
+        sys.exit(1)
+
+    state['stages'][stage['name']] = fingerprint
+    save_state(state)
+
+    record = stage_record(stage['name'], elapsed, metrics, peak_rss, bytes_read,
+                          sum(path_size(path) for path in stage['outputs']), profile_path)
+    print_record(record)
+    return record
+
+def run_in_process(report, write_intermediates=False, refit_topics=False, profile=False):
+    """
+    Voert alle stappen uit binnen dit proces en geeft DataFrames direct door.
+    Dit scheelt het opstarten van vijf interpreters en het (de)serialiseren
+    van de volledige dataset tussen elke stap. Alleen het eindresultaat wordt
+    weggeschreven, tenzij 'write_intermediates' aan staat.
+    De metingen per stap komen in 'report'.
+    """
+    # De imports van alle stappen tellen als opstarttijd van de run
+    start_time = time.time()
+    import cProfile
+    import clean_reviews
+    import analyse_sentiment
+    import analyse_topics
+    import merge_with_weather
+    import add_holidays
+    import analytics_cube
+    import term_index
+    from columnar_store import write_table
+    from dataset_store import write_dataset, dataset_lock
+    report['_startup'] = time.time() - start_time
+
+    def timed(name, func, *args, reads=(), writes=()):
+        print(f"\n{'='*60}")
+        print(f"STARTING: {name} (in-process)")
+        print(f"{'='*60}")
+        profiler = cProfile.Profile() if profile else None
+        stage_metrics.reset_peak_rss()
+        stage_metrics.begin(name)
+        start_time = time.time()
+        if profiler:
+            profiler.enable()
+        result = func(*args)
+        if profiler:
+            profiler.disable()
+        elapsed = time.time() - start_time
+        metrics = stage_metrics.end()
+        if result is None:
+            print(f"\nERROR: Er is iets misgegaan in stap '{name}'.")
+            sys.exit(1)
+        print(f"DONE: {name} uitgevoerd in {elapsed:.1f} seconden.")
+
+        profile_path = None
+        if profiler:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile_path = os.path.join(PROFILE_DIR, f"{name.replace(' ', '_')}.prof")
+            profiler.dump_stats(profile_path)
+        record = stage_record(name, elapsed, metrics, stage_metrics.peak_rss_mb(),
+                              sum(path_size(p) for p in reads) if reads else None,
+                              sum(path_size(p) for p in writes) if writes else None, profile_path)
+        print_record(record)
+        report['stages'].append(record)
+        return result
+
+    # Het inlezen gebeurt tijdens het opschonen (de export wordt gestreamd)
+    raw_reviews = clean_reviews.load_raw_reviews()
+    if raw_reviews is None:
+        sys.exit(1)
+    df = timed('clean', clean_reviews.clean_reviews, raw_reviews, reads=[REVIEWS_FILE, STREAM_REVIEWS_FILE])
+    if write_intermediates:
+        clean_reviews.save_cleaned(df, CLEANED_FILE)
+    # De scoring-service zoekt near duplicates tussen deze handtekeningen, ook zonder tussenbestanden
+    clean_reviews.save_signatures(df.to_dict('records'), COMMENT_SIGNATURES_FILE)
+
+    df = timed('sentiment', analyse_sentiment.add_sentiment, df)
+    if write_intermediates:
+        analyse_sentiment.save_sentences(df, SENTIMENT_FILE)
+
+    df = timed('topics', analyse_topics.add_topics, df, refit_topics)
+    if write_intermediates:
+        analyse_topics.save_topics(df, TOPICS_FILE)
+
+    weather = timed('load weather', merge_with_weather.load_weather, WEATHER_FILE,
+                    reads=[WEATHER_FILE, WEATHER_HOURLY_FILE, STATIONS_FILE, LOCATIONS_FILE])
+    df = timed('weather', merge_with_weather.add_weather, df, weather)
+    if write_intermediates:
+        merge_with_weather.save_merged(df, MERGED_FILE)
+    df = timed('holidays', add_holidays.add_holiday_labels, df)
+    cube = timed('cube', analytics_cube.build_cube, df)
+
+    def write_outputs():
+        # De woordtellingen worden per segment berekend terwijl de opslag geschreven wordt
+        with stage_metrics.phase('io'):
+            with dataset_lock(FINAL_STORE):
+                write_dataset(df, FINAL_STORE, on_segment=term_index.write_segment_terms,
+                              added_columns=add_holidays.HOLIDAY_COLUMNS)
+                write_table(cube, CUBE_STORE)
+            if EXPORT_JSON:
+                add_holidays.export_json(df, FINAL_FILE)
+        stage_metrics.set_rows(rows_in=len(df), rows_out=len(df))
+        return True
+
+    timed('write', write_outputs, writes=[FINAL_STORE, CUBE_STORE] + ([FINAL_FILE] if EXPORT_JSON else []))
+
+def write_report(report, path=RUN_REPORT_FILE):
+    """Schrijft het run-rapport (JSON) naast de eind-export."""
+    report['total_seconds'] = round(time.time() - report.pop('_start'), 3)
+    # Opstarttijd van de hele run: de imports (in-process) plus die van elke stap
+    report['startup_seconds'] = round(report.pop('_startup', 0.0) + sum(
+        stage['time_split']['startup'] for stage in report['stages'] if 'time_split' in stage), 3)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Run-rapport: '{path}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Voert de review-pijplijn uit.")
+    parser.add_argument('--force', action='store_true',
+                        help="Voer alle stappen opnieuw uit, ook als de invoer ongewijzigd is.")
+    parser.add_argument('--refit-topics', action='store_true',
+                        help="Train het topic model opnieuw (nieuwe topicnummers, zie models/topic_mapping.json).")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Voer alle stappen in dit proces uit en geef DataFrames direct door "
+                             "(slaat de vingerafdruk-cache over).")
+    parser.add_argument('--write-intermediates', action='store_true',
+                        help="Schrijf in --in-process modus ook de tussenbestanden weg.")
+    parser.add_argument('--profile', action='store_true',
+                        help=f"Profileer elke uitgevoerde stap met cProfile (bestanden in '{PROFILE_DIR}/').")
+    args = parser.parse_args()
+
+    print("--- STARTING AUTOMATIC DATA PIELINE (INCL. HISTORISCHE VAKANTIES) ---")
+
+    report = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'mode': 'in-process' if args.in_process else 'stages',
+        'status': 'failed',
+        'stages': [],
+        '_start': time.time(),
+    }
+    try:
+        if args.in_process:
+            run_in_process(report, write_intermediates=args.write_intermediates,
+                           refit_topics=args.refit_topics, profile=args.profile)
+            report['status'] = 'ok'
+            print("\n" + "="*60)
+            print("SUCCES! De volledige dataset inclusief weer en vakanties is klaar.")
+            print(f"Kolomopslag: '{FINAL_STORE}/', kubus: '{CUBE_STORE}/'" + (f", JSON-export: '{FINAL_FILE}'" if EXPORT_JSON else ""))
+            print("="*60)
+            return
+
+        # Stappen worden in afhankelijkheidsvolgorde uitgevoerd. Een stap wordt
+        # overgeslagen als zijn invoer en script niet veranderd zijn; tussenbestanden
+        # blijven in de cache-map staan zodat volgende runs ze kunnen hergebruiken.
+        state = load_state()
+        for stage in stage_order(STAGES):
+            if stage['name'] == 'topics' and args.refit_topics:
+                record = run_stage(stage, state, force=True, args=['--refit'], profile=args.profile)
+            else:
+                record = run_stage(stage, state, force=args.force, profile=args.profile)
+            report['stages'].append(record)
+        report['status'] = 'ok'
+
+        print("\n" + "="*60)
+        print("SUCCES! De volledige dataset inclusief weer en vakanties is klaar.")
+        print(f"Kolomopslag: '{FINAL_STORE}/', kubus: '{CUBE_STORE}/'" + (f", JSON-export: '{FINAL_FILE}'" if EXPORT_JSON else ""))
+        print(f"Tussenbestanden staan in '{CACHE_DIR}/'.")
+        print("="*60)
+    finally:
+        write_report(report)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+import time
+
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from pipeline_config import (FINAL_STORE, CUBE_STORE, STREAM_REVIEWS_FILE, COMMENT_SIGNATURES_FILE,
+                             SENTIMENT_BACKEND)
+from columnar_store import store_exists, read_table, write_table
+from dataset_store import dataset_exists, read_dataset, read_manifest, append_rows, dataset_lock, partition_keys
+from near_duplicates import StoredCommentIndex, decode_signatures
+
+# Scoring-service die blijft draaien: het sentiment model, het getrainde topic
+# model (met zijn embedding model), de WeatherStore en de vakantiekalender
+# worden één keer geladen. Nieuwe ruwe reviews (schema van terspegelt.json)
+# worden per verzoek verrijkt tot zinnen en als nieuwe segmenten aan de
+# betreffende maandpartities van de eindopslag toegevoegd (de kubus wordt
+# bijgeteld), zodat de dashboard ze bij de volgende rerun toont zonder dat de
+# hele pijplijn opnieuw hoeft te draaien.
+#
+#   POST /reviews  verrijken en aan de dataset toevoegen
+#   POST /score    alleen verrijken (niets opslaan)
+#   GET  /health   status en tellers
+#
+# De ruwe reviews komen ook in STREAM_REVIEWS_FILE; de volgende volledige run
+# van run_pipeline.py leest ze samen met de export en bouwt alles opnieuw op.
+#
+# Vóór elk verzoek kijkt de service of de pijplijn intussen de opslag (versie
+# in het manifest) of het topic model (model-id) heeft vervangen, en laadt dan
+# opnieuw wat daarvan afhangt. De service neemt dataset_lock (dezelfde lock als
+# de pijplijn) alleen kort: om bij te werken en de bekende reviews te bepalen,
+# en om toe te voegen. Het verrijken zelf gebeurt zonder lock, zodat de
+# pijplijn niet op de modellen hoeft te wachten. Is er intussen iets opnieuw
+# geladen, dan wordt het verzoek met de nieuwe stand nog eens verrijkt.
+#
+# Near duplicates worden binnen een verzoek en tegen de canonieke reviews in de
+# opslag gezocht. Een opgeslagen review blijft de canonieke kopie, ook als de
+# nieuwe review ouder is; de volgende volledige run past de gewone regel
+# (oudste createTime) weer op alles toe.
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Grotere verzoeken horen in de batch-pijplijn thuis
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Kolommen van een opgeslagen canonieke review die een nieuwe near duplicate overneemt
+STORED_COLUMNS = ['reviewId', 'zin_tekst', 'originele_rating', 'createTime', 'reviewerName', 'locationId',
+                  'duplicateOf', 'sentiment_label', 'sentiment_score', 'topic_nr', 'Name']
+
+
+def review_id(review):
+    """Korte reviewId zoals clean_reviews.py die maakt (laatste deel van 'name')."""
+    name = review.get('name')
+    return name.split('/')[-1] if isinstance(name, str) else ''
+
+
+def to_records(df):
+    """Zinnen als lijst van dicts voor JSON (NaN wordt None)."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def partition_year(create_time):
+    """Jaar van de partitie van een review, of None (partitie 'onbekend')."""
+    key = partition_keys([create_time])[0]
+    return int(key[:4]) if key[:4].isdigit() else None
+
+
+def current_model_id():
+    """Het model-id in het infobestand van het topic model (None als het er niet (heel) is)."""
+    from analyse_topics import TOPIC_MODEL_INFO_FILE
+    try:
+        with open(TOPIC_MODEL_INFO_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('model_id')
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+class ScoringService:
+    """Houdt alles wat nodig is om reviews te verrijken in het geheugen."""
+
+    def __init__(self, backend=SENTIMENT_BACKEND):
+        # Hier pas importeren: 'python scoring_service.py --help' hoeft geen modellen te laden
+        import analyse_sentiment
+        import analyse_topics
+
+        start = time.time()
+        if not dataset_exists(FINAL_STORE):
+            raise RuntimeError(f"{FINAL_STORE}/ niet gevonden. Run eerst 'run_pipeline.py'.")
+        with dataset_lock(FINAL_STORE):
+            self.load_topic_model()
+            self.load_dataset()
+
+        print(f"Sentiment model laden (backend: {backend})...")
+        self.backend = backend
+        self.sentiment_pipeline = analyse_sentiment.load_sentiment_pipeline(backend)
+        print("Embedding model laden...")
+        self.embedding_model = analyse_topics.load_embedding_model()
+
+        # Eén verzoek tegelijk: de modellen zijn niet thread-safe en de opslag wordt herschreven
+        self.lock = threading.Lock()
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.counts = {'verzoeken': 0, 'reviews': 0, 'zinnen': 0, 'herladen': 0}
+        print(f"Scoring-service klaar in {time.time() - start:.1f} seconden "
+              f"({len(self.known_ids)} reviews in '{FINAL_STORE}/').")
+
+    def load_topic_model(self):
+        import analyse_topics
+
+        topic_model, topic_info = analyse_topics.load_topic_model()
+        if topic_model is None:
+            raise RuntimeError(f"Geen topic model in '{analyse_topics.TOPIC_MODEL_FILE}'. Run eerst 'run_pipeline.py'.")
+        self.topic_model, self.topic_info = topic_model, topic_info
+
+    def load_dataset(self):
+        """
+        Laadt wat van de opslag en de invoer van de pijplijn afhangt: de bekende
+        reviews, de canonieke opgeslagen reviews (voor near duplicates), het weer
+        en de vakantiekalender. Aanroepen onder dataset_lock.
+        """
+        import add_holidays
+        from clean_reviews import read_jsonl
+        import merge_with_weather
+        from weather_store import load_locations
+
+        weather = merge_with_weather.load_weather()
+        if weather is None:
+            raise RuntimeError("Geen weersgegevens. Run eerst 'parse_weather.py'.")
+        self.weather = weather
+        self.locations = load_locations()
+        self.holidays = add_holidays.build_holiday_index(add_holidays.load_holiday_calendar())
+
+        self.dataset_version = read_manifest(FINAL_STORE)['version']
+        # Reviews die al in de dataset staan worden niet nog een keer toegevoegd
+        self.known_ids = set(read_dataset(FINAL_STORE, columns=['reviewId'])['reviewId'].astype(str))
+
+        # Handtekeningen van het oorspronkelijke commentaar van de canonieke reviews
+        # (geschreven door de schoonmaakstap en door deze service)
+        self.stored_comments = StoredCommentIndex()
+        if os.path.exists(COMMENT_SIGNATURES_FILE):
+            records = [r for r in read_jsonl(COMMENT_SIGNATURES_FILE) if r['reviewId'] in self.known_ids]
+            self.stored_comments.add_signatures(
+                [(r['reviewId'], partition_year(r['createTime'])) for r in records],
+                decode_signatures([r['signature'] for r in records]))
+        else:
+            print(f"WAARSCHUWING: '{COMMENT_SIGNATURES_FILE}' niet gevonden; near duplicates worden alleen binnen "
+                  f"een verzoek gezocht tot de volgende run van 'run_pipeline.py'.")
+
+    def refresh(self):
+        """
+        Laadt het topic model en/of de opslag opnieuw als de pijplijn ze sinds de
+        vorige keer heeft vervangen. Aanroepen onder dataset_lock.
+        """
+        model_id = current_model_id()
+        if model_id is not None and model_id != self.topic_info['model_id']:
+            print(f"Nieuw topic model ({model_id}), opnieuw laden...")
+            self.load_topic_model()
+            self.counts['herladen'] += 1
+        if read_manifest(FINAL_STORE)['version'] != self.dataset_version:
+            print(f"'{FINAL_STORE}/' is vervangen, opnieuw laden...")
+            self.load_dataset()
+            self.counts['herladen'] += 1
+
+    def match_stored(self, df_reviews):
+        """
+        Markeert nieuwe reviews die (bijna) gelijk zijn aan een canonieke review
+        in de opslag als near duplicate daarvan, samen met hun eigen duplicaten in
+        het verzoek. Geeft {reviewId van de opgeslagen review: partitiejaar} terug.
+        """
+        kandidaten = df_reviews['duplicateOf'].isna() & df_reviews['comment'].notna()
+        matches = self.stored_comments.match(df_reviews.loc[kandidaten, 'comment'].tolist())
+        gevonden = {rid: m for rid, m in zip(df_reviews.loc[kandidaten, 'reviewId'], matches) if m is not None}
+        if not gevonden:
+            return {}
+        df_reviews['duplicateOf'] = [
+            gevonden[rid][0] if rid in gevonden else gevonden[dup][0] if dup in gevonden else dup
+            for rid, dup in zip(df_reviews['reviewId'], df_reviews['duplicateOf'])
+        ]
+        return dict(gevonden.values())
+
+    def copy_stored(self, df_duplicates, canonicals):
+        """
+        Zinnen, sentiment en topic van opgeslagen canonieke reviews voor hun nieuwe
+        near duplicates (met de eigen metadata van de duplicaat, zie fan_out_duplicates).
+        """
+        from analyse_sentiment import fan_out_duplicates
+
+        years = None if None in canonicals.values() else sorted(set(canonicals.values()))
+        with dataset_lock(FINAL_STORE):
+            df = read_dataset(FINAL_STORE, columns=STORED_COLUMNS, years=years)
+        canoniek = df['duplicateOf'].isna().to_numpy() if 'duplicateOf' in df.columns else True
+        df = df[df['reviewId'].astype(str).isin(canonicals).to_numpy() & canoniek]
+        # Categoricals van de opslag worden gewone kolommen, zoals in de nieuwe zinnen
+        zinnen = df.astype({col: object for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+        zinnen = zinnen.assign(reviewId=zinnen['reviewId'].astype(str)).reset_index(drop=True)
+        return fan_out_duplicates(zinnen, df_duplicates).iloc[len(zinnen):].reset_index(drop=True)
+
+    def enrich(self, df_reviews, stored=None):
+        """
+        Verrijkt opgeschoonde reviews tot zinnen met sentiment, topic, weer en
+        vakantie: dezelfde stappen als de pijplijn, met de geladen modellen.
+        Het topic model wordt niet opnieuw getraind; nieuwe zinnen worden aan de
+        bestaande topics toegewezen. Near duplicates van opgeslagen reviews
+        ('stored', zie match_stored) nemen de zinnen van die reviews over.
+        """
+        from analyse_sentiment import add_sentiment
+        from analyse_topics import canonical_mask, assign_topics, attach_topics
+        from merge_with_weather import add_weather
+        from add_holidays import add_holiday_labels
+
+        uit_opslag = df_reviews['duplicateOf'].isin(list(stored or {})).to_numpy()
+        df_zinnen = pd.DataFrame()
+        if (df_reviews['comment'].notna().to_numpy() & ~uit_opslag).any():
+            df_zinnen = add_sentiment(df_reviews[~uit_opslag], self.backend, sentiment_pipeline=self.sentiment_pipeline)
+        if len(df_zinnen):
+            canoniek = canonical_mask(df_zinnen)
+            zinnen_lijst = df_zinnen.loc[canoniek, 'zin_tekst'].astype(str).tolist()
+            embeddings = self.embedding_model.encode(zinnen_lijst, show_progress_bar=False)
+            topics = assign_topics(self.topic_model, zinnen_lijst, embeddings, {})
+            df_zinnen = attach_topics(df_zinnen, canoniek, zinnen_lijst, topics, self.topic_model)
+        if uit_opslag.any():
+            kopieen = self.copy_stored(df_reviews[uit_opslag], stored)
+            df_zinnen = pd.concat([df_zinnen, kopieen], ignore_index=True) if len(df_zinnen) else kopieen
+        if not len(df_zinnen):
+            return df_zinnen
+
+        df_zinnen = add_weather(df_zinnen, self.weather, self.locations)
+        return add_holiday_labels(df_zinnen, self.holidays)
+
+    def append(self, df_zinnen):
+        """
+        Voegt verrijkte zinnen toe aan de dataset: één nieuw segment (met
+        woordtellingen) per geraakte maandpartitie. De kubus gaat eerst en het
+        manifest als laatste: de dashboard ziet de nieuwe rijen pas als het
+        manifest verandert, en dan klopt de kubus al. Aanroepen onder dataset_lock.
+        """
+        from analytics_cube import build_cube, merge_cubes
+        from term_index import write_segment_terms
+
+        if store_exists(CUBE_STORE):
+            write_table(merge_cubes(read_table(CUBE_STORE), build_cube(df_zinnen)), CUBE_STORE)
+        manifest = append_rows(df_zinnen, FINAL_STORE, on_segment=write_segment_terms)
+        # Een eigen toevoeging is geen reden om opnieuw te laden
+        self.dataset_version = manifest['version']
+        return manifest['num_rows']
+
+    def state(self):
+        """Stand van de geladen opslag en het topic model (verandert bij opnieuw laden)."""
+        return self.dataset_version, self.topic_info['model_id']
+
+    def unknown(self, raw_reviews):
+        """De reviews met een ID die nog niet in de dataset staat."""
+        # Zonder 'name' (ID) slaat het opschonen een review toch over
+        return [r for r in raw_reviews if isinstance(r, dict) and review_id(r) and review_id(r) not in self.known_ids]
+
+    def prepare(self, nieuw, metadata):
+        """Schoont nieuwe reviews op en verrijkt ze; geeft (reviews, zinnen) terug."""
+        from clean_reviews import clean_reviews
+
+        if not nieuw:
+            metadata['reviews'] = 0
+            return None, None
+        df_reviews = clean_reviews(nieuw)
+        metadata['reviews'] = len(df_reviews)
+        if not df_reviews['comment'].notna().any():
+            return df_reviews, None
+        stored = self.match_stored(df_reviews)
+        metadata['near_duplicates_in_opslag'] = int(df_reviews['duplicateOf'].isin(list(stored)).sum())
+        return df_reviews, self.enrich(df_reviews, stored)
+
+    def store(self, nieuw, df_reviews, df_zinnen, metadata):
+        """Slaat verrijkte reviews op. Aanroepen onder dataset_lock."""
+        from clean_reviews import iter_signature_records, write_jsonl
+
+        # Eerst de ruwe reviews: gaat het hierna mis, dan neemt de volgende run ze alsnog mee
+        write_jsonl(nieuw, STREAM_REVIEWS_FILE, mode='a')
+        if df_zinnen is not None and len(df_zinnen):
+            metadata['rijen_in_dataset'] = self.append(df_zinnen)
+            records = list(iter_signature_records(df_reviews.to_dict('records')))
+            write_jsonl(records, COMMENT_SIGNATURES_FILE, mode='a')
+            self.stored_comments.add_signatures(
+                [(r['reviewId'], partition_year(r['createTime'])) for r in records],
+                decode_signatures([r['signature'] for r in records]))
+        self.known_ids.update(review_id(r) for r in nieuw)
+
+    def process(self, raw_reviews, save=True):
+        """
+        Verwerkt een lijst ruwe reviews. Geeft de verrijkte zinnen en een
+        samenvatting terug; met 'save' komen de nieuwe reviews in de dataset.
+        """
+        with self.lock:
+            start = time.time()
+            while True:
+                with dataset_lock(FINAL_STORE):
+                    self.refresh()
+                    nieuw = self.unknown(raw_reviews)
+                    stand = self.state()
+                metadata = {'ontvangen': len(raw_reviews), 'al_bekend': len(raw_reviews) - len(nieuw)}
+                df_reviews, df_zinnen = self.prepare(nieuw, metadata)
+                if not (save and nieuw):
+                    break
+                with dataset_lock(FINAL_STORE):
+                    self.refresh()
+                    # Alleen als er intussen niets opnieuw geladen is, klopt de verrijking
+                    # nog en zijn dezelfde reviews nog nieuw
+                    if self.state() == stand and len(self.unknown(nieuw)) == len(nieuw):
+                        self.store(nieuw, df_reviews, df_zinnen, metadata)
+                        break
+                print("De opslag of het topic model is tijdens het verrijken vervangen, opnieuw verrijken...")
+
+            metadata['zinnen'] = 0 if df_zinnen is None else len(df_zinnen)
+            metadata['opgeslagen'] = bool(save)
+            metadata['seconds'] = round(time.time() - start, 3)
+            self.counts['verzoeken'] += 1
+            self.counts['reviews'] += metadata['reviews']
+            self.counts['zinnen'] += metadata['zinnen']
+            return {'metadata': metadata, 'zinnen': [] if df_zinnen is None else to_records(df_zinnen)}
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'gestart': self.started,
+            'backend': self.backend,
+            'topic_model_id': self.topic_info['model_id'],
+            'reviews_in_dataset': len(self.known_ids),
+            **self.counts,
+        }
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """HTTP-interface van de service (JSON in, JSON uit)."""
+
+    def address_string(self):
+        # Via een Unix-socket is er geen clientadres
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self.send_json(200, self.server.service.health())
+        else:
+            self.send_json(404, {'error': f"onbekend pad '{self.path}'"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path not in ('/reviews', '/score'):
+            self.send_json(404, {'error': f"onbekend pad '{self.path}'"})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.send_json(413, {'error': f"verzoek groter dan {MAX_REQUEST_BYTES} bytes; gebruik run_pipeline.py"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b'null')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self.send_json(400, {'error': f"geen geldige JSON: {e}"})
+            return
+
+        # Zelfde vorm als terspegelt.json ({"reviews": [...]}), een lijst of één review
+        reviews = body.get('reviews', body) if isinstance(body, dict) else body
+        if isinstance(reviews, dict) and 'name' in reviews:
+            reviews = [reviews]
+        if not isinstance(reviews, list):
+            self.send_json(400, {'error': "verwacht {\"reviews\": [...]}, een lijst reviews of één review"})
+            return
+        ongeldig = [i for i, r in enumerate(reviews)
+                    if isinstance(r, dict) and r.get('name') is not None and not isinstance(r['name'], str)]
+        if ongeldig:
+            self.send_json(400, {'error': f"'name' moet tekst zijn (reviews {ongeldig[:10]})"})
+            return
+
+        try:
+            result = self.server.service.process(reviews, save=(path == '/reviews'))
+        except Exception as e:
+            print(f"ERROR bij het verwerken van {len(reviews)} reviews: {e!r}")
+            self.send_json(500, {'error': str(e)})
+            return
+        self.send_json(200, result)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """Maakt de server (TCP op host:port, of een Unix-socket als 'socket_path' gegeven is)."""
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, ScoringHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ScoringHandler)
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Blijvende scoring-service: verrijkt nieuwe reviews met de geladen modellen "
+                    "en voegt ze toe aan de dataset.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Adres (standaard: {DEFAULT_HOST}).")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Poort (standaard: {DEFAULT_PORT}).")
+    parser.add_argument('--socket', help="Luister op deze Unix-socket in plaats van op een TCP-poort.")
+    parser.add_argument('--backend', default=SENTIMENT_BACKEND,
+                        help=f"Sentiment-backend: torch of onnx-int8 (standaard: {SENTIMENT_BACKEND}).")
+    args = parser.parse_args()
+
+    try:
+        service = ScoringService(args.backend)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        raise SystemExit(1)
+
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Luistert op {args.socket or f'http://{args.host}:{args.port}'} (stoppen met Ctrl+C).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
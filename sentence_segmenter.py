@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Aantal reviews per taak voor de process pool
+CHUNK_SIZE = 2000
+# Aantal worker-processen (standaard: alle cores)
+WORKERS = os.cpu_count() or 1
+# Zinnen met minder tekens dan dit (na strippen) worden weggefilterd
+MIN_SENTENCE_CHARS = 6
+
+# Met PIPELINE_PUNKT=untrained wordt het ongetrainde punkt-model gebruikt: er is
+# dan geen NLTK-data nodig (wel iets minder goed bij afkortingen). De benchmark
+# doet dit bij de stubs. De variabele wordt per aanroep gelezen, zodat ook
+# worker-processen hem volgen.
+PUNKT_ENV = 'PIPELINE_PUNKT'
+
+# Het punkt-model wordt per proces één keer geladen
+_punkt = None
+
+
+def _get_punkt():
+    global _punkt
+    if _punkt is None:
+        if os.environ.get(PUNKT_ENV) == 'untrained':
+            from nltk.tokenize.punkt import PunktSentenceTokenizer
+            _punkt = PunktSentenceTokenizer()
+            return _punkt
+        # Ook in worker-processen: NLTK moet de punkt-data in de lokale modelcache vinden
+        from model_store import ensure_nltk_data
+        ensure_nltk_data()
+        try:
+            from nltk.tokenize import PunktTokenizer
+            _punkt = PunktTokenizer('english')
+        except ImportError:
+            # Oudere NLTK-versies zonder PunktTokenizer
+            import nltk
+            _punkt = nltk.data.load('tokenizers/punkt/english.pickle')
+    return _punkt
+
+
+def _segment_chunk(args):
+    """
+    Segmenteert een blok reviews. Geeft kolommen terug in plaats van een dict
+    per zin: review-index (t.o.v. de volledige invoer) en begin-/eindpositie
+    van elke zin in de reviewtekst.
+    """
+    offset, texts = args
+    punkt = _get_punkt()
+    review_idx, starts, ends = [], [], []
+    for i, text in enumerate(texts):
+        for start, end in punkt.span_tokenize(text):
+            if len(text[start:end].strip()) >= MIN_SENTENCE_CHARS:
+                review_idx.append(offset + i)
+                starts.append(start)
+                ends.append(end)
+    return (
+        np.array(review_idx, dtype=np.int64),
+        np.array(starts, dtype=np.int64),
+        np.array(ends, dtype=np.int64),
+    )
+
+
+def segment_texts(texts, workers=WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Splitst een lijst teksten op in zinnen, verdeeld over een process pool.
+    Geeft drie numpy-arrays terug (review_idx, start, end), in de volgorde van de invoer.
+    Kleine invoer wordt in het huidige proces afgehandeld om pool-overhead te vermijden.
+    """
+    chunks = [(start, texts[start:start + chunk_size]) for start in range(0, len(texts), chunk_size)]
+    if not chunks:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    if workers <= 1 or len(chunks) == 1:
+        results = [_segment_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            results = list(pool.map(_segment_chunk, chunks))
+
+    review_idx, starts, ends = (np.concatenate(parts) for parts in zip(*results))
+    return review_idx, starts, ends
\ No newline at end of file
@@ -0,0 +1,147 @@
+import hashlib
+import math
+import os
+import sqlite3
+import time
+import unicodedata
+from pipeline_config import CACHE_DIR
+
+CACHE_FILE = os.path.join(CACHE_DIR, 'sentiment_cache.sqlite')
+
+# Maximale grootte van het cachebestand in bytes. Bij overschrijding worden de
+# minst recent gebruikte zinnen verwijderd tot het bestand onder EVICT_TARGET
+# van de limiet zit, zodat niet elke run opnieuw hoeft op te ruimen.
+MAX_BYTES = 512 * 1024 * 1024
+EVICT_TARGET = 0.9
+
+
+def normalize_sentence(text):
+    """Normaliseert een zin zodat kleine witruimte-/unicodeverschillen dezelfde sleutel geven."""
+    text = unicodedata.normalize('NFC', str(text))
+    return ' '.join(text.split())
+
+
+def sentence_key(text, model_name, model_revision):
+    """Content-adres van een zin: hash van de genormaliseerde tekst plus modelnaam en -versie."""
+    payload = f"{model_name}\x00{model_revision}\x00{normalize_sentence(text)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """
+    Persistente cache (SQLite) met sentimentresultaten per zin.
+    Houdt hit/miss-statistieken bij zodat het script ze aan het eind kan tonen.
+    """
+
+    def __init__(self, model_name, model_revision, path=CACHE_FILE, max_bytes=MAX_BYTES):
+        self.model_name = model_name
+        self.model_revision = model_revision
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        # Met incremental auto_vacuum kan het bestand na het verwijderen weer
+        # krimpen. Een bestaande cache zonder deze instelling wordt één keer omgezet.
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.conn.execute("VACUUM")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment ("
+            " key TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON sentiment(last_used)")
+
+    def lookup(self, zinnen):
+        """
+        Zoekt alle zinnen op. Geeft een lijst terug met per zin een resultaat-dict
+        ({'label', 'score'}) of None als de zin nog niet gescoord is.
+        """
+        keys = [sentence_key(z, self.model_name, self.model_revision) for z in zinnen]
+        found = {}
+        unique_keys = list(set(keys))
+        # SQLite heeft een limiet op het aantal parameters per query
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, label, score FROM sentiment WHERE key IN ({placeholders})", chunk
+            )
+            for key, label, score in rows:
+                found[key] = {'label': label, 'score': score}
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE sentiment SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.conn.commit()
+
+        results = [found.get(key) for key in keys]
+        hits = sum(r is not None for r in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def store(self, zinnen, sentiments):
+        """Slaat nieuw gescoorde zinnen op en past daarna zo nodig eviction toe."""
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sentiment (key, label, score, last_used) VALUES (?, ?, ?, ?)",
+            [
+                (sentence_key(z, self.model_name, self.model_revision), s['label'], float(s['score']), now)
+                for z, s in zip(zinnen, sentiments)
+            ]
+        )
+        self.conn.commit()
+        self.evict()
+
+    def size_bytes(self):
+        """Grootte van het cachebestand (page_count * page_size)."""
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def evict(self):
+        """Verwijdert de minst recent gebruikte zinnen zodra het cachebestand te groot wordt."""
+        size = self.size_bytes()
+        if size <= self.max_bytes:
+            return
+        target = self.max_bytes * EVICT_TARGET
+        while size > target:
+            count = self.conn.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0]
+            if not count:
+                break
+            # Evenredig met de overschrijding; daarna wordt opnieuw gemeten
+            overflow = max(1, math.ceil(count * (1 - target / size)))
+            self.conn.execute(
+                "DELETE FROM sentiment WHERE key IN "
+                "(SELECT key FROM sentiment ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.conn.commit()
+            self.evicted += min(overflow, count)
+            # Lege pagina's teruggeven aan het bestandssysteem. Een execute() geeft
+            # maar één pagina vrij, executescript() loopt de hele vrije lijst af.
+            self.conn.executescript("PRAGMA incremental_vacuum;")
+            new_size = self.size_bytes()
+            if new_size > target:
+                # De sleutels zijn hashes, dus verwijderde rijen laten vooral halfvolle
+                # pagina's achter. VACUUM maakt die compact voordat er meer weg moet.
+                self.conn.execute("VACUUM")
+                new_size = self.size_bytes()
+            size = new_size
+
+    def print_stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total else 0.0
+        size = self.conn.execute("SELECT COUNT(*) FROM sentiment").fetchone()[0]
+        print(f"Sentiment cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+              f"{self.evicted} verwijderd, {size} zinnen in cache ({self.size_bytes() / 1e6:.1f} MB).")
+
+    def close(self):
+        self.conn.close()
\ No newline at end of file
@@ -0,0 +1,163 @@
+import atexit
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Meetgegevens per pijplijnstap. Een stap meldt hier het aantal rijen en
+# markeert welke tijd naar opstarten, I/O en het laden van modellen gaat; de
+# rest telt als rekentijd. Zonder actieve meting doen alle functies niets,
+# zodat de scripts ook los gedraaid kunnen worden.
+#
+# Fasen tellen exclusief: binnen een geneste fase staat de buitenste stil,
+# zodat geen tijd dubbel telt.
+#
+# Als een stap als apart proces draait, geeft run_pipeline.py via deze
+# omgevingsvariabele een bestand mee waarin de metingen bij afsluiten komen.
+METRICS_FILE_ENV = 'PIPELINE_METRICS_FILE'
+# Tijdstip (time.time()) waarop run_pipeline.py het proces van de stap startte.
+# De fase 'startup' loopt dan vanaf dat moment (interpreter en imports) tot de
+# eerste invoer gelezen wordt (de eerste fase 'io', of input_started()).
+STARTED_AT_ENV = 'PIPELINE_STAGE_STARTED_AT'
+
+PHASES = ('startup', 'io', 'model_load')
+
+_current = None
+
+
+class StageMetrics:
+    def __init__(self, name, started_at=None):
+        self.name = name
+        self.started = time.perf_counter()
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.rows_in = None
+        self.rows_out = None
+        # Open fasen, de binnenste achteraan; de tijd gaat naar de binnenste
+        self.active = []
+        self.mark = self.started
+        if started_at is not None:
+            self.started -= max(time.time() - started_at, 0.0)
+            self.mark = self.started
+            self.active.append('startup')
+
+    def switch(self):
+        """Telt de tijd sinds de vorige wissel bij de binnenste open fase."""
+        now = time.perf_counter()
+        if self.active:
+            self.phases[self.active[-1]] += now - self.mark
+        self.mark = now
+
+    def end_startup(self):
+        """Sluit de fase 'startup' van het proces (de eerste invoer wordt gelezen)."""
+        if self.active[:1] == ['startup']:
+            self.switch()
+            del self.active[0]
+
+    def to_dict(self):
+        self.switch()
+        return {
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'seconds': time.perf_counter() - self.started,
+            'phases': dict(self.phases),
+        }
+
+
+def begin(name, started_at=None):
+    """
+    Start de meting van een stap (in dit proces). Met 'started_at' (time.time()
+    bij het starten van het proces) telt alles tot de eerste invoer als 'startup'.
+    """
+    global _current
+    _current = StageMetrics(name, started_at)
+    return _current
+
+
+def end():
+    """Beëindigt de meting en geeft de gegevens terug (of None zonder actieve meting)."""
+    global _current
+    metrics, _current = _current, None
+    return metrics.to_dict() if metrics else None
+
+
+@contextmanager
+def phase(name):
+    """Telt de tijd binnen dit blok bij de fase 'startup', 'io' of 'model_load'."""
+    metrics = _current
+    if metrics is None:
+        yield
+        return
+    if name == 'io':
+        metrics.end_startup()
+    metrics.switch()
+    metrics.active.append(name)
+    try:
+        yield
+    finally:
+        metrics.switch()
+        metrics.active.pop()
+
+
+def input_started():
+    """Markeert dat de stap zijn eerste invoer leest (voor stappen die hun invoer streamen)."""
+    if _current is not None:
+        _current.end_startup()
+
+
+def set_rows(rows_in=None, rows_out=None):
+    if _current is not None:
+        if rows_in is not None:
+            _current.rows_in = int(rows_in)
+        if rows_out is not None:
+            _current.rows_out = int(rows_out)
+
+
+def reset_peak_rss():
+    """Zet de piek-RSS van dit proces terug (alleen Linux); False als dat niet kan."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Piek-RSS van dit proces in MB (sinds de laatste reset, anders sinds de start); None als onbekend."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return rusage_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def rusage_mb(maxrss):
+    """ru_maxrss naar MB (KB op Linux, bytes op macOS)."""
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def _write_on_exit(path):
+    metrics = end()
+    if metrics is not None:
+        metrics['peak_rss_mb'] = peak_rss_mb()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f)
+
+
+if os.environ.get(METRICS_FILE_ENV):
+    # Dit proces is een stap die door run_pipeline.py is gestart. De variabele wordt
+    # verwijderd zodat worker-processen van de stap het bestand niet overschrijven.
+    started_at = os.environ.pop(STARTED_AT_ENV, None)
+    begin(os.path.basename(sys.argv[0]), float(started_at) if started_at else None)
+    atexit.register(_write_on_exit, os.environ.pop(METRICS_FILE_ENV))
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+from wordcloud import STOPWORDS as WORDCLOUD_STOPWORDS
+from pipeline_config import FINAL_STORE
+from columnar_store import read_table
+from dataset_store import dataset_exists, segment_paths, dataset_lock
+from stage_metrics import phase, set_rows
+
+# Per zin worden de woordtellingen (na het filteren van stopwoorden) opgeslagen
+# in een sparse matrix (zinnen x woorden), één per segment van de eindopslag
+# (zie dataset_store.py) en in dezelfde rijvolgorde. De dashboard telt voor de
+# woordwolk alleen de rijen van de geselecteerde zinnen op, in plaats van alle
+# tekst opnieuw te tokenizen.
+INPUT_STORE = FINAL_STORE
+SEGMENT_TERMS_FILE = '_terms.npz'
+
+# Stopwoorden (EN uit wordcloud, aangevuld met NL/DE en ruis uit vertaalde reviews)
+STOPWORDS = set(WORDCLOUD_STOPWORDS)
+STOPWORDS.update([
+    "the", "in", "fur", "and", "sehr", "wir", "für", "mit", "und", "die", "een", "ist",
+    "google", "translated", "by", "original", "review", "zo'n", "beetje",
+    "de", "het", "en", "is", "dat", "op", "met", "voor", "niet", "ook", "om", "als", "dan", "te", "zijn",
+    "was", "we", "er", "maar", "ik", "je", "deze", "die", "dit", "aan", "bij", "door", "naar", "over",
+    "der", "das", "ein", "eine", "von", "zu", "was", "aber", "im", "dem", "nicht", "auch", "waren", "sind"
+])
+
+# Zelfde woordpatroon als wordcloud gebruikt
+TOKEN_PATTERN = re.compile(r"\w[\w']*")
+
+
+def tokenize(text):
+    """Kleine letters, zonder bezits-'s, getallen en stopwoorden."""
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if word.endswith("'s"):
+            word = word[:-2]
+        if word and not word.isdigit() and word not in STOPWORDS:
+            yield word
+
+
+def build_term_matrix(texts):
+    """
+    Telt de woorden per tekst. Geeft een CSR-matrix (teksten x woorden, int32)
+    en de woordenlijst (kolomvolgorde) terug.
+    """
+    vocab = {}
+    indptr, indices, data = [0], [], []
+    for text in texts:
+        if isinstance(text, str):
+            counts = Counter(vocab.setdefault(word, len(vocab)) for word in tokenize(text))
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.array(data, dtype=np.int32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(vocab)),
+    )
+    return matrix, np.array(list(vocab), dtype=str)
+
+
+def save_term_matrix(matrix, vocab, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                 shape=np.array(matrix.shape), vocab=vocab)
+    os.replace(tmp_path, path)
+
+
+def load_term_matrix(path):
+    with np.load(path) as f:
+        matrix = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+        return matrix, f['vocab']
+
+
+def write_segment_terms(segment_path, df_segment):
+    """Schrijft de woordtellingen van één segment naast zijn kolommen (als 'on_segment' van dataset_store)."""
+    matrix, vocab = build_term_matrix(df_segment['zin_tekst'])
+    save_term_matrix(matrix, vocab, os.path.join(segment_path, SEGMENT_TERMS_FILE))
+
+
+def load_segment_terms(segments):
+    """
+    Woordtellingen van de gegeven segmenten, onder elkaar in dezelfde volgorde.
+    Geeft None terug als een segment geen woordtellingen heeft.
+    """
+    paths = [os.path.join(segment, SEGMENT_TERMS_FILE) for segment in segments]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return stack_term_matrices([load_term_matrix(path) for path in paths])
+
+
+def stack_term_matrices(parts):
+    """
+    Zet matrices met elk een eigen woordenlijst onder elkaar, met één
+    gezamenlijke woordenlijst. Geeft (matrix, vocab) terug.
+    """
+    if not parts:
+        return sparse.csr_matrix((0, 0), dtype=np.int32), np.array([], dtype=str)
+    vocab, inverse = np.unique(np.concatenate([v for _, v in parts]), return_inverse=True)
+    blocks, offset = [], 0
+    for matrix, part_vocab in parts:
+        columns = inverse[offset:offset + len(part_vocab)].astype(np.int32)
+        offset += len(part_vocab)
+        blocks.append(sparse.csr_matrix((matrix.data, columns[matrix.indices], matrix.indptr),
+                                        shape=(matrix.shape[0], len(vocab))))
+    return sparse.vstack(blocks, format='csr'), vocab
+
+
+def term_frequencies(matrix, vocab, rows, max_words=200):
+    """Woordfrequenties over de gegeven rijen, als dict van de 'max_words' meest voorkomende woorden."""
+    counts = np.asarray(matrix[rows].sum(axis=0)).ravel()
+    top = np.argsort(counts)[::-1][:max_words]
+    return {str(vocab[i]): int(counts[i]) for i in top if counts[i] > 0}
+
+
+def build_term_index():
+    """Schrijft de woordtellingen van alle segmenten opnieuw (normaal doet add_holidays.py dat bij het schrijven)."""
+    print("Woordtellingen per zin bepalen...")
+    if not dataset_exists(INPUT_STORE):
+        print(f"ERROR: {INPUT_STORE}/ niet gevonden. Run eerst 'add_holidays.py'.")
+        sys.exit(1)
+
+    rows = 0
+    with dataset_lock(INPUT_STORE):
+        segments = segment_paths(INPUT_STORE)
+        for segment in segments:
+            with phase('io'):
+                df_segment = read_table(segment, columns=['zin_tekst'])
+            write_segment_terms(segment, df_segment)
+            rows += len(df_segment)
+    set_rows(rows_in=rows, rows_out=rows)
+    print(f"Woordtellingen opgeslagen voor {len(segments)} segmenten van '{INPUT_STORE}/'.")
+
+
+if __name__ == "__main__":
+    build_term_index()
\ No newline at end of file
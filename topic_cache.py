@@ -0,0 +1,55 @@
+import os
+import sqlite3
+from pipeline_config import CACHE_DIR
+from sentiment_cache import sentence_key
+
+CACHE_FILE = os.path.join(CACHE_DIR, 'topic_assignments.sqlite')
+
+
+class TopicAssignmentCache:
+    """
+    Persistente opslag (SQLite) van het topic per zin, per topic model (model-id).
+    Staat los van de tussenbestanden, zodat ook een run zonder tussenbestanden
+    (--in-process) alleen nieuwe zinnen door 'transform' hoeft te halen.
+    """
+
+    def __init__(self, model_id, path=CACHE_FILE):
+        self.model_id = model_id
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS topics ("
+            " key TEXT PRIMARY KEY, model_id TEXT NOT NULL, topic_nr INTEGER NOT NULL)"
+        )
+
+    def key(self, zin):
+        return sentence_key(zin, 'topics', self.model_id)
+
+    def lookup(self, zinnen):
+        """Topics van de zinnen die met dit model al zijn toegewezen, als {zin: topic_nr}."""
+        by_key = {self.key(z): z for z in zinnen}
+        keys = list(by_key)
+        found = {}
+        # SQLite heeft een limiet op het aantal parameters per query
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(f"SELECT key, topic_nr FROM topics WHERE key IN ({placeholders})", chunk)
+            for key, topic_nr in rows:
+                found[by_key[key]] = topic_nr
+        return found
+
+    def store(self, zinnen, topics):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO topics (key, model_id, topic_nr) VALUES (?, ?, ?)",
+            [(self.key(z), self.model_id, int(t)) for z, t in zip(zinnen, topics)]
+        )
+        self.conn.commit()
+
+    def remove_other_models(self):
+        """Verwijdert de toewijzingen van eerdere modellen (na een refit zijn die niet meer bruikbaar)."""
+        self.conn.execute("DELETE FROM topics WHERE model_id != ?", (self.model_id,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
\ No newline at end of file
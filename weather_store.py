@@ -0,0 +1,175 @@
+import os
+import numpy as np
+import pandas as pd
+from pipeline_config import WEATHER_FILE, WEATHER_HOURLY_FILE, STATIONS_FILE, LOCATIONS_FILE
+
+# Weerkolommen die aan elke zin worden gekoppeld
+WEATHER_COLUMNS = ['temp_max_c', 'precip_amount_mm', 'temp_avg_c']
+
+# Locaties zonder coördinaten in LOCATIONS_FILE krijgen het weer bij TerSpegelt (Eersel)
+DEFAULT_LOCATION = (51.35, 5.30)
+
+EARTH_RADIUS_KM = 6371.0
+
+# Vensters (in uren vóór het moment van de review) voor het uurweer
+HOURLY_WINDOWS = [3, 6, 24]
+
+
+class WeatherStore:
+    """
+    Daggegevens van het weer voor één of meer KNMI-stations.
+    Per weerkolom is er een dichte array (stations x dagen), geïndexeerd op
+    de dag sinds de eerste meetdag. Een opzoeking per zin is daardoor gewoon
+    array-indexering, zonder merge op datum-strings.
+    """
+
+    def __init__(self, df_weather, stations=None, hourly=None):
+        days = pd.to_datetime(df_weather['datum'].astype(str).str[:10], format='%Y-%m-%d', errors='coerce')
+        days = days.values.astype('datetime64[D]')
+        # Oude weerbestanden zonder stationskolom bevatten één station
+        codes = df_weather['STN'].to_numpy(dtype=np.int64) if 'STN' in df_weather.columns else np.zeros(len(df_weather), dtype=np.int64)
+        valid = ~np.isnat(days)
+
+        self.station_codes = np.unique(codes[valid])
+        self.first_day = days[valid].min() if valid.any() else np.datetime64('1970-01-01', 'D')
+        self.n_days = int((days[valid].max() - self.first_day).astype(np.int64)) + 1 if valid.any() else 0
+
+        rows = np.searchsorted(self.station_codes, codes[valid])
+        offsets = (days[valid] - self.first_day).astype(np.int64)
+        self.values = {}
+        for col in WEATHER_COLUMNS:
+            if col in df_weather.columns:
+                grid = np.full((len(self.station_codes), self.n_days), np.nan)
+                grid[rows, offsets] = df_weather[col].to_numpy(dtype=np.float64)[valid]
+                self.values[col] = grid
+
+        # Optioneel: uurwaarden voor het weer in de uren vóór een review
+        self.hourly = hourly
+
+        # Coördinaten van de stations waarvoor we metingen hebben
+        self.stations = None
+        if stations is not None and len(stations):
+            self.stations = stations[stations['STN'].isin(self.station_codes)].reset_index(drop=True)
+
+    def nearest_station(self, lat, lon):
+        """Stationscode van het dichtstbijzijnde station met metingen (grootcirkelafstand)."""
+        if self.stations is None or not len(self.stations):
+            return int(self.station_codes[0])
+        lat1, lon1 = np.radians(lat), np.radians(lon)
+        lat2, lon2 = np.radians(self.stations['lat'].to_numpy()), np.radians(self.stations['lon'].to_numpy())
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        return int(self.stations['STN'].iloc[int(np.argmin(distance))])
+
+    def lookup(self, station_codes, days):
+        """
+        Zoekt voor elke (station, dag) de weerwaarden op.
+        Geeft een dict kolom -> array terug; onbekende stations of dagen worden NaN.
+        """
+        station_codes = np.asarray(station_codes, dtype=np.int64)
+        rows = np.searchsorted(self.station_codes, station_codes)
+        rows = np.minimum(rows, len(self.station_codes) - 1)
+        offsets = (days - self.first_day).astype(np.int64)
+        found = (~np.isnat(days) & (offsets >= 0) & (offsets < self.n_days)
+                 & (self.station_codes[rows] == station_codes))
+
+        result = {}
+        for col, grid in self.values.items():
+            values = np.full(len(days), np.nan)
+            values[found] = grid[rows[found], offsets[found]]
+            result[col] = values
+        return result
+
+
+class HourlyWeather:
+    """
+    Uurwaarden per station als gesorteerde tijdreeks (seconden sinds 1970, UT)
+    met cumulatieve sommen. De neerslag- en temperatuurstatistiek over elk
+    venster vóór een tijdstip volgt dan uit twee binaire zoekacties
+    ('searchsorted') en een verschil van twee cumulatieve sommen.
+    Een uurwaarde op tijdstip T geldt voor het uur (T - 1 uur, T].
+    """
+
+    def __init__(self, df_hourly):
+        times = pd.to_datetime(df_hourly['time']).values.astype('datetime64[s]').astype(np.int64)
+        codes = df_hourly['STN'].to_numpy(dtype=np.int64)
+        rain = df_hourly['precip_amount_mm'].to_numpy(dtype=np.float64)
+        temp = df_hourly['temp_c'].to_numpy(dtype=np.float64)
+
+        self.series = {}
+        for code in np.unique(codes):
+            sel = codes == code
+            order = np.argsort(times[sel], kind='stable')
+            series = {'times': times[sel][order]}
+            for name, values in (('rain', rain[sel][order]), ('temp', temp[sel][order])):
+                known = ~np.isnan(values)
+                # Voorloop-0 zodat som over (start, eind] = cum[eind] - cum[start]
+                series[name] = np.concatenate([[0.0], np.cumsum(np.where(known, values, 0.0))])
+                series[name + '_n'] = np.concatenate([[0], np.cumsum(known)])
+            self.series[int(code)] = series
+
+    def window_stats(self, station_codes, timestamps, windows=HOURLY_WINDOWS):
+        """
+        Neerslagsom en gemiddelde temperatuur over de laatste 'h' uur vóór elk tijdstip.
+        'timestamps' zijn seconden sinds 1970 (UT) als int64; onbekende tijden (NaT)
+        blijven leeg. Geeft kolommen 'precip_last_<h>h_mm' en 'temp_last_<h>h_c' terug.
+        """
+        station_codes = np.asarray(station_codes, dtype=np.int64)
+        result = {}
+        for h in windows:
+            result[f'precip_last_{h}h_mm'] = np.full(len(timestamps), np.nan)
+            result[f'temp_last_{h}h_c'] = np.full(len(timestamps), np.nan)
+
+        valid = timestamps != np.iinfo(np.int64).min
+        for code, series in self.series.items():
+            rows = np.flatnonzero(valid & (station_codes == code))
+            t = timestamps[rows]
+            end = np.searchsorted(series['times'], t, side='right')
+            for h in windows:
+                start = np.searchsorted(series['times'], t - h * 3600, side='right')
+                for name, column in (('rain', f'precip_last_{h}h_mm'), ('temp', f'temp_last_{h}h_c')):
+                    total = series[name][end] - series[name][start]
+                    count = series[name + '_n'][end] - series[name + '_n'][start]
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        value = total if name == 'rain' else total / count
+                    # Zonder metingen in het venster blijft de waarde leeg
+                    result[column][rows] = np.where(count > 0, value, np.nan)
+        return result
+
+
+def load_locations(path=LOCATIONS_FILE):
+    """Coördinaten per review-locatie (kolommen: locationId, naam, lat, lon) als dict."""
+    if not os.path.exists(path):
+        return {}
+    locations = pd.read_csv(path, dtype={'locationId': str})
+    return {row.locationId: (row.lat, row.lon) for row in locations.itertuples()}
+
+
+def location_stations(store, location_ids, locations):
+    """
+    Bepaalt per rij het KNMI-station bij de locatie van de review.
+    Het dichtstbijzijnde station wordt maar één keer per unieke locatie uitgerekend.
+    """
+    default = store.nearest_station(*DEFAULT_LOCATION)
+    codes, uniques = pd.factorize(pd.Series(location_ids, dtype=object))
+    per_location = [store.nearest_station(*locations[loc]) if loc in locations else default for loc in uniques]
+    # Code -1 (geen locatie) valt op het laatste element: het standaardstation
+    return np.array(per_location + [default], dtype=np.int64)[codes]
+
+
+def load_weather_store(weather_path=WEATHER_FILE, stations_path=STATIONS_FILE, hourly_path=WEATHER_HOURLY_FILE):
+    """Laadt het weerbestand (en de stationstabel en uurwaarden, als die er zijn) als WeatherStore."""
+    df_weather = pd.read_csv(weather_path)
+
+    # Kolomnaam in weer-bestand uniform maken
+    if 'date' in df_weather.columns:
+        df_weather = df_weather.rename(columns={'date': 'datum'})
+    elif 'Date' in df_weather.columns:
+        df_weather = df_weather.rename(columns={'Date': 'datum'})
+
+    if 'datum' not in df_weather.columns:
+        raise ValueError("kon geen datum-kolom vinden in het weerbestand")
+
+    stations = pd.read_csv(stations_path) if os.path.exists(stations_path) else None
+    hourly = HourlyWeather(pd.read_csv(hourly_path)) if os.path.exists(hourly_path) else None
+    return WeatherStore(df_weather, stations, hourly)
\ No newline at end of file